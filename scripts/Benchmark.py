@@ -1,13 +1,18 @@
 import os
 import csv
 import TsplibNwxUtils as util
-import networkx as nx
 import datetime
-import time
+import json
+from Timing import measure, DEFAULT_WARMUP, DEFAULT_REPEATS
+from TourEvaluation import check_tour, open_tour, path_length
+from BenchmarkRunner import load_solver_instance, extract_path, solver_name
 from NearestNeighbor import all_nearest_neighbor  # Import the heuristic function
 from BruteForce import brute_force  # Import the brute-force function
 from BranchAndBound import branch_and_bound_tsp_optimized  # Import the branch-and-bound function
 
+# Flat timing columns of the CSV export (seconds); the JSON export keeps the full summaries
+TIMING_FIELDS = ["repeats"] + [f"{stage}_{clock}_{statistic}" for stage, clock in (("load", "wall"), ("solve", "wall"), ("solve", "cpu")) for statistic in ("median", "p95", "stddev")]
+
 def export_results(results, base_folder="./benchmark_results", base_name="benchmark_results"):
     """
     Exports the benchmark results to a new CSV file with a unique timestamp on every execution.
@@ -25,26 +30,62 @@ def export_results(results, base_folder="./benchmark_results", base_name="benchm
     os.makedirs(base_folder, exist_ok=True)
     csv_filename = os.path.join(base_folder, f"{base_name}{timestamp}.csv")
     
-    fieldnames = ["tsp_name", "optimal_tour", "optimal_length", "heuristic_tour", "heuristic_length", "deviation", "execution_time", "error"]
+    fieldnames = ["tsp_name", "solver", "optimal_tour", "optimal_length", "heuristic_tour", "heuristic_length", "deviation", "execution_time", "error"] + TIMING_FIELDS
     with open(csv_filename, "w", newline="") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction="ignore")
         writer.writeheader()
         writer.writerows(results)
     print(f"Benchmark results exported to {csv_filename}")
 
-def benchmark_heuristic(heuristic):
+def export_results_json(results, base_folder="./benchmark_results", base_name="benchmark_results"):
+    """
+    Exports the benchmark results with the full timing summaries to a new JSON file with a unique timestamp.
+
+    Args:
+        results (list): The benchmark results to be exported.
+        base_folder (str): The folder to save the JSON file.
+        base_name (str): The base name for the JSON file.
+
+    Returns:
+        The name of the written file.
+    """
+    timestamp = datetime.datetime.now().strftime("_%Y-%m-%d_%H-%M-%S")
+    os.makedirs(base_folder, exist_ok=True)
+    json_filename = os.path.join(base_folder, f"{base_name}{timestamp}.json")
+    with open(json_filename, "w") as jsonfile:
+        json.dump(results, jsonfile, indent=2)
+    print(f"Benchmark results exported to {json_filename}")
+    return json_filename
+
+def timing_fields(timings) -> dict:
+    """
+    Flattens the load and solve timing summaries into the CSV columns of TIMING_FIELDS.
+    """
+    fields = {"repeats": timings["solve"]["wall"].get("count", "")}
+    for stage, clock in (("load", "wall"), ("solve", "wall"), ("solve", "cpu")):
+        for statistic in ("median", "p95", "stddev"):
+            fields[f"{stage}_{clock}_{statistic}"] = timings[stage][clock].get(statistic, "")
+    return fields
+
+def benchmark_heuristic(heuristic, warmup=DEFAULT_WARMUP, repeats=DEFAULT_REPEATS, tsp_files_folder="../networkx_tsp_files"):
     """
     Benchmarks a heuristic for solving TSPs by comparing the generated path to the optimal solution.
+    Loading the instance and solving it are timed separately, each over warmup + repeats runs.
 
     Args:
         heuristic (function): The heuristic function to benchmark.
+        warmup (int): The number of unrecorded runs before the measurement.
+        repeats (int): The number of recorded runs; the result reports their median, p95 and stddev.
+        tsp_files_folder (str): The folder with the .edges files. Defaults to the output folder of
+            TspFileParser.py, where --cache writes the binary matrix caches.
 
     Returns:
-        None
+        The list of results, one dict per instance. execution_time is the median wall time of the solver.
     """
     results = []
-    tsp_files_folder = "./benchmark_tsp_files"
+    solver = solver_name(heuristic)  # The SOLVERS key, like in the records of BenchmarkRunner
     tour_files_folder = "../tour_files"
+    tsp_source_folder = "../tsp_files"
 
     for filename in os.listdir(tsp_files_folder):
         if filename.endswith(".edges"):
@@ -53,58 +94,72 @@ def benchmark_heuristic(heuristic):
             print(f"Benchmarking {filename}...")
 
             try:
-                edges = util.parse_edges_file(current_tsp_filename)
-                G = nx.Graph()
-                G.add_weighted_edges_from(edges)
-
-                start_time = time.time()
-                heuristic_path = heuristic(G)  # Perform the heuristic
-                end_time = time.time()
-                execution_time = end_time - start_time
+                source_filename = os.path.join(tsp_source_folder, filename.replace(".edges", ".tsp"))
+                # Heuristics that need node coordinates get a CoordinateInstance from the .tsp source
+                G, load_timing = measure(load_solver_instance, heuristic, current_tsp_filename, source_filename, warmup=warmup, repeats=repeats)
+                # Every run starts without the candidate lists of the previous one, like the first run would
+                solution, solve_timing = measure(heuristic, G, warmup=warmup, repeats=repeats, setup=G.clear_cache)  # Perform the heuristic
+                # Solvers return a (start, path, weight) tuple, a result dict or the path, open or closed;
+                # the tour is normalized to its open form like in BenchmarkRunner and scored with closed=True
+                heuristic_order = open_tour(G.to_indices(extract_path(solution)))
+                heuristic_tour = G.to_labels(heuristic_order)
+                timings = {"load": load_timing, "solve": solve_timing}
+                execution_time = solve_timing["wall"]["median"]
 
                 if os.path.exists(opt_tour_filename):
                     optimal_path = util.parse_opt_tour_file(opt_tour_filename)
 
                     try:
-                        closed_optimal_path = list(util.close_path(G, optimal_path))
-                        closed_optimal_path_length = util.calculate_path_length(G, closed_optimal_path)
+                        check_tour(heuristic_order, G.dimension)
+                        optimal_tour = open_tour(optimal_path)
+                        closed_optimal_path = list(util.close_path(G, optimal_tour))
+                        closed_optimal_path_length = path_length(G, optimal_tour, closed=True)
 
-                        closed_heuristic_path = list(util.close_path(G, heuristic_path[1]))
-                        closed_heuristic_path_length = util.calculate_path_length(G, closed_heuristic_path)
+                        closed_heuristic_path = list(util.close_path(G, heuristic_tour))
+                        closed_heuristic_path_length = path_length(G, heuristic_tour, closed=True)
 
                         deviation = (closed_heuristic_path_length - closed_optimal_path_length) / closed_optimal_path_length
 
                         result = {
                             "tsp_name": filename,
+                            "solver": solver,
                             "optimal_tour": closed_optimal_path,
                             "optimal_length": closed_optimal_path_length,
                             "heuristic_tour": closed_heuristic_path,
                             "heuristic_length": closed_heuristic_path_length,
                             "deviation": deviation,
                             "execution_time": execution_time,
-                            "error": ""
+                            "error": "",
+                            "timings": timings,
+                            **timing_fields(timings)
                         }
                     except Exception as e:
                         result = {
                             "tsp_name": filename,
+                            "solver": solver,
                             "optimal_tour": optimal_path,
                             "optimal_length": "",
-                            "heuristic_tour": heuristic_path[1],
+                            "heuristic_tour": heuristic_tour,
                             "heuristic_length": "",
                             "deviation": "",
                             "execution_time": execution_time,
-                            "error": str(e)
+                            "error": str(e),
+                            "timings": timings,
+                            **timing_fields(timings)
                         }
                 else:
                     result = {
                         "tsp_name": filename,
+                        "solver": solver,
                         "optimal_tour": "",
                         "optimal_length": "",
-                        "heuristic_tour": heuristic_path[1],
-                        "heuristic_length": heuristic_path[2],
+                        "heuristic_tour": heuristic_tour,
+                        "heuristic_length": path_length(G, heuristic_tour, closed=True),
                         "deviation": "",
                         "execution_time": execution_time,
-                        "error": f"Optimal tour file not found: {opt_tour_filename}"
+                        "error": f"Optimal tour file not found: {opt_tour_filename}",
+                        "timings": timings,
+                        **timing_fields(timings)
                     }
 
                 results.append(result)
@@ -112,6 +167,7 @@ def benchmark_heuristic(heuristic):
             except Exception as e:
                 result = {
                     "tsp_name": filename,
+                    "solver": solver,
                     "optimal_tour": "",
                     "optimal_length": "",
                     "heuristic_tour": "",
@@ -124,6 +180,9 @@ def benchmark_heuristic(heuristic):
                 
     return results
 
-# Example usage
-results = benchmark_heuristic(branch_and_bound_tsp_optimized)
-export_results(results)
\ No newline at end of file
+if __name__ == "__main__":
+    # Example usage; BenchmarkRunner.py runs solvers in isolated processes with time and memory limits
+    # The exact solver only runs on the small instances of the benchmark folder
+    results = benchmark_heuristic(branch_and_bound_tsp_optimized, tsp_files_folder="./benchmark_tsp_files")
+    export_results(results)
+    export_results_json(results)
\ No newline at end of file
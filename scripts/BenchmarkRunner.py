@@ -0,0 +1,309 @@
+import argparse
+import datetime
+import importlib
+import inspect
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import time
+import TsplibNwxUtils as util
+from CoordinateInstance import CoordinateInstance
+from Timing import measure, DEFAULT_WARMUP, DEFAULT_REPEATS
+from TourEvaluation import check_tour, open_tour
+
+# Runs benchmark jobs, one (solver, instance, seed) combination each, in isolated worker processes.
+# Every job gets its own process (and process group, so solvers with their own pools are stopped as a
+# whole), a wall-clock limit enforced by the parent and an address-space limit set inside the child.
+# Finished jobs are appended to a JSONL store, one line per job, flushed and synced right away; a new
+# run reads the store first and skips every job that already has a record, so an interrupted suite
+# continues where it stopped.
+
+# Solvers by name, resolved inside the worker so the parent never imports them
+SOLVERS = {
+    "nearest_neighbor": ("NearestNeighbor", "all_nearest_neighbor"),
+    "greedy_edge": ("Construction", "greedy_edge"),
+    "space_filling_curve": ("Construction", "space_filling_curve"),
+    "christofides": ("Construction", "christofides"),
+    "local_search": ("LocalSearch", "nearest_neighbor_local_search"),
+    "lin_kernighan": ("LinKernighan", "nearest_neighbor_lin_kernighan"),
+    "iterated_local_search": ("IteratedLocalSearch", "iterated_local_search_tsp"),
+    "branch_and_bound": ("BranchAndBound", "branch_and_bound_tsp"),
+    "held_karp": ("HeldKarp", "held_karp"),
+    "brute_force": ("BruteForce", "brute_force_tsp"),
+}
+
+# Older names of solvers in result sets, e.g. the headless wrappers Benchmark.py used to export
+SOLVER_ALIASES = {"branch_and_bound_tsp_optimized": "branch_and_bound", "BranchAndBound:branch_and_bound_tsp_optimized": "branch_and_bound"}
+
+INSTANCE_SUFFIXES = (".edges", ".edges.gz", ".edges.bz2")
+
+# Seconds between checks of the running jobs
+POLL_INTERVAL = 0.1
+
+
+def resolve_solver(name):
+    """
+    Returns the solver function for a name from SOLVERS or a "Module:function" reference.
+    """
+    module_name, function_name = SOLVERS[name] if name in SOLVERS else name.split(":", 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+def solver_name(solver) -> str:
+    """
+    Returns the SOLVERS key of a solver given as a function, a function name or a "Module:function"
+    reference, so results of both harnesses name a solver alike. Unknown solvers keep their (function) name.
+    """
+    candidates = (f"{solver.__module__}:{solver.__name__}", solver.__name__) if callable(solver) else (solver,)
+    names = dict(SOLVER_ALIASES)
+    for key, (module_name, function_name) in SOLVERS.items():
+        names.update({key: key, function_name: key, f"{module_name}:{function_name}": key})
+    return next((names[name] for name in candidates if name in names), candidates[-1])
+
+def solver_kwargs(solver, seed=None, time_budget=None) -> dict:
+    """
+    Returns the keyword arguments a solver accepts out of a seed and a time budget (passed as time_budget or
+    time_limit). Solvers with a progress bar get progress=False, the harnesses run them headless.
+    """
+    parameters = inspect.signature(solver).parameters
+    kwargs = {"progress": False} if "progress" in parameters else {}
+    if seed is not None and "seed" in parameters:
+        kwargs["seed"] = seed
+    if time_budget is not None:
+        budget_parameter = next((key for key in ("time_budget", "time_limit") if key in parameters), None)
+        if budget_parameter is not None:
+            kwargs[budget_parameter] = time_budget
+    return kwargs
+
+def load_solver_instance(solver, filename, source_filename):
+    """
+    Loads the instance a solver runs on: the .edges file (memory-mapping its binary cache when there is a
+    fresh one), or a CoordinateInstance read from the .tsp source for solvers marked with needs_coordinates.
+    """
+    if getattr(solver, "needs_coordinates", False):
+        return CoordinateInstance.from_tsp_file(source_filename)
+    return util.load_instance(filename, source_filename)
+
+def extract_path(result) -> list:
+    """
+    Returns the path of a solver result: the path of a (start, path, weight) tuple, the "path" of a
+    result dict, or the result itself if the solver returns the path directly.
+    """
+    if isinstance(result, dict):
+        return list(result["path"])
+    if isinstance(result, tuple) and len(result) == 3:
+        return list(result[1])
+    return list(result)
+
+def instance_name(filename) -> str:
+    name = os.path.basename(filename)
+    for suffix in INSTANCE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def job_key(record) -> tuple:
+    return record["solver"], record["tsp_name"], record["seed"]
+
+def _peak_memory_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _run_job(job, memory_limit, connection, warmup=DEFAULT_WARMUP, repeats=DEFAULT_REPEATS):
+    """
+    Runs one job in the worker process and sends its record through the connection.
+    """
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()  # Own process group, so a timeout also stops the solver's own worker processes
+    if memory_limit is not None:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    record = {"status": "ok", "error": ""}
+    try:
+        solver = resolve_solver(job["solver"])
+        instance, load_timing = measure(load_solver_instance, solver, job["filename"], job["source_filename"], warmup=warmup, repeats=repeats)
+        kwargs = solver_kwargs(solver, job["seed"])
+        result, solve_timing = measure(solver, instance, warmup=warmup, repeats=repeats, setup=instance.clear_cache, **kwargs)
+        path = extract_path(result)
+        record["timings"] = {"load": load_timing, "solve": solve_timing}
+        record["load_time"] = load_timing["wall"]["median"]
+        record["solve_time"] = solve_timing["wall"]["median"]
+
+        order = open_tour(instance.to_indices(path))
+        check_tour(order, instance.dimension)
+        record["tour"] = instance.to_labels(order)
+        record["length"] = instance.path_weight(order, closed=True)
+        if job["tour_filename"] is not None and os.path.exists(job["tour_filename"]):
+            optimal = instance.to_indices(util.parse_opt_tour_file(job["tour_filename"]))
+            record["optimal_length"] = instance.path_weight(optimal, closed=True)
+            record["deviation"] = (record["length"] - record["optimal_length"]) / record["optimal_length"]
+    except MemoryError:
+        record.update(status="memory", error="Memory limit exceeded")
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["peak_memory"] = _peak_memory_bytes()
+    connection.send(record)
+    connection.close()
+
+def _stop(process):
+    """
+    Kills a worker process together with every process it started.
+    """
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.join()
+
+def load_store(store_filename) -> list:
+    """
+    Reads all records of a JSONL result store. A line cut off by a crash is ignored.
+    """
+    records = []
+    if not os.path.exists(store_filename):
+        return records
+    with open(store_filename, "r") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def append_record(store_filename, record) -> None:
+    """
+    Appends one record to the JSONL store and syncs it to disk.
+    """
+    with open(store_filename, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def make_jobs(solvers, instance_filenames, seeds, tour_folder="../tour_files", source_folder="../tsp_files") -> list:
+    """
+    Builds one job per (solver, instance, seed) combination, instances in the order given.
+    """
+    jobs = []
+    for filename in instance_filenames:
+        name = instance_name(filename)
+        for solver in solvers:
+            for seed in seeds:
+                jobs.append({
+                    "solver": solver_name(solver),
+                    "tsp_name": name,
+                    "seed": seed,
+                    "filename": filename,
+                    "source_filename": os.path.join(source_folder, name + ".tsp"),
+                    "tour_filename": os.path.join(tour_folder, name + ".opt.tour"),
+                })
+    return jobs
+
+def run_jobs(jobs, store_filename, workers=None, time_limit=None, memory_limit=None, retry_failed=False,
+             warmup=DEFAULT_WARMUP, repeats=DEFAULT_REPEATS) -> list:
+    """
+    Runs benchmark jobs in isolated worker processes and appends their records to the store.
+
+    Parameters:
+    - jobs: The jobs from make_jobs.
+    - store_filename: The JSONL store; jobs that already have a record in it are skipped.
+    - workers (optional): The number of jobs that run at the same time, defaults to the number of CPUs.
+    - time_limit (optional): Wall-clock seconds per job, after which its processes are killed.
+    - memory_limit (optional): Address space limit per job in bytes (Unix only).
+    - retry_failed (optional): Also runs the jobs whose stored record is not "ok" again.
+    - warmup, repeats (optional): Unrecorded and recorded runs of every job; the time limit covers all of them.
+
+    Returns:
+    - The records of the jobs run in this call.
+    """
+    workers = workers or os.cpu_count()
+    done = {job_key(record) for record in load_store(store_filename) if record["status"] == "ok" or not retry_failed}
+    pending = [job for job in jobs if job_key(job) not in done]
+    if len(pending) < len(jobs):
+        print(f"Resuming: {len(jobs) - len(pending)} of {len(jobs)} jobs already in {store_filename}")
+    os.makedirs(os.path.dirname(os.path.abspath(store_filename)), exist_ok=True)
+
+    context = multiprocessing.get_context("spawn")  # Fresh interpreters, nothing inherited from the parent
+    running = {}
+    records = []
+
+    def finish(job, record):
+        record = {key: job[key] for key in ("solver", "tsp_name", "seed")} | record
+        record["finished_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        append_record(store_filename, record)
+        records.append(record)
+        print(f"{record['tsp_name']} / {record['solver']} / seed {record['seed']}: {record['status']}"
+              + (f", length {record['length']} in {record['solve_time']:.3f}s (median)" if record["status"] == "ok" else f" ({record['error']})"))
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                job = pending.pop(0)
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_run_job, args=(job, memory_limit, sender, warmup, repeats), daemon=False)
+                process.start()
+                sender.close()
+                running[receiver] = (process, job, time.perf_counter())
+            ready = multiprocessing.connection.wait(list(running), timeout=POLL_INTERVAL)
+            for receiver in list(running):
+                process, job, started = running[receiver]
+                if receiver in ready:
+                    try:
+                        record = receiver.recv()
+                    except EOFError:
+                        # The process died without a record, e.g. killed by the OS for its memory use
+                        process.join()
+                        record = {"status": "crashed", "error": f"Worker exited with code {process.exitcode}"}
+                    else:
+                        process.join()
+                        _stop(process)  # Leftover processes of the solver
+                elif time_limit is not None and time.perf_counter() - started > time_limit:
+                    _stop(process)
+                    record = {"status": "timeout", "error": f"No result within {time_limit}s"}
+                else:
+                    continue
+                receiver.close()
+                del running[receiver]
+                finish(job, record)
+    finally:
+        for process, _, _ in running.values():
+            _stop(process)
+    return records
+
+def main(argv=None):
+    """
+    Runs a benchmark suite from the command line, e.g.
+    python BenchmarkRunner.py --solvers nearest_neighbor greedy_edge --seeds 0 1 --time-limit 60 --workers 4
+    """
+    parser = argparse.ArgumentParser(description="Run TSP solvers on benchmark instances in isolated processes.")
+    parser.add_argument("--solvers", nargs="+", default=["nearest_neighbor"], help=f"Solver names ({', '.join(SOLVERS)}) or Module:function")
+    parser.add_argument("--instances", default="../networkx_tsp_files", help="Folder with the .edges files (TspFileParser.py output)")
+    parser.add_argument("--tours", default="../tour_files", help="Folder with the .opt.tour files")
+    parser.add_argument("--sources", default="../tsp_files", help="Folder with the .tsp files (for the matrix cache)")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0], help="Seeds; every solver runs once per seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of jobs that run at the same time")
+    parser.add_argument("--time-limit", type=float, default=None, help="Wall-clock seconds per job")
+    parser.add_argument("--memory-limit", type=int, default=None, help="Memory limit per job in MB")
+    parser.add_argument("--store", default="./benchmark_results/runs.jsonl", help="Append-only JSONL result store")
+    parser.add_argument("--retry-failed", action="store_true", help="Run failed and timed out jobs again")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="Unrecorded runs per job before timing")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Timed runs per job (median, p95 and stddev are reported)")
+    args = parser.parse_args(argv)
+
+    filenames = sorted(os.path.join(args.instances, f) for f in os.listdir(args.instances) if f.endswith(INSTANCE_SUFFIXES))
+    jobs = make_jobs(args.solvers, filenames, args.seeds, args.tours, args.sources)
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit is not None else None
+    records = run_jobs(jobs, args.store, args.workers, args.time_limit, memory_limit, args.retry_failed, args.warmup, args.repeats)
+    return 1 if any(record["status"] != "ok" for record in records) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
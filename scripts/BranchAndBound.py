@@ -1,74 +1,230 @@
-import networkx as nx
+import numpy as np
 import heapq
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tqdm import tqdm
-
-def calculate_lower_bound(G, path, unvisited):
-    if not unvisited:
-        return 0  # Return 0 if there are no unvisited nodes to avoid min() error
-   
-    # Original lower bound calculation code remains unchanged
-    H = G.subgraph(unvisited)
-    mst_weight = sum(edge[2]['weight'] for edge in nx.minimum_spanning_edges(H, data=True))
-    last_in_path = path[-1]
-    min_edge_to_unvisited = min(G.edges[last_in_path, v]['weight'] for v in unvisited)
-    min_edge_from_start = min(G.edges[path[0], v]['weight'] for v in unvisited)
-    return mst_weight + min_edge_to_unvisited + min_edge_from_start
-
-def branch_and_bound_worker(G, queue_item):
-    cost, path, unvisited = queue_item
-    if not unvisited:
-        total_cost = cost + G[path[-1]][path[0]]['weight']
-        return total_cost, path
-    else:
-        best_cost = float('inf')
-        best_path = None
-        for v in unvisited:
-            next_path = path + [v]
-            next_unvisited = unvisited - {v}
-            next_cost = cost + G[path[-1]][v]['weight']
-            lower_bound = next_cost + calculate_lower_bound(G, next_path, next_unvisited)
-            if lower_bound < best_cost:
-                best_cost, best_path = branch_and_bound_worker(G, (lower_bound, next_path, next_unvisited))
-        return best_cost, best_path
-
-def branch_and_bound_tsp_optimized(G, max_workers=4):
-    nodes = list(G.nodes())
-    Q = [(0, [nodes[0]], set(nodes[1:]))]
-    best_cost = float('inf')
-    best_path = None
-    total_queue_items = len(Q)
-    processed_items = 0
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        with tqdm(total=total_queue_items, desc="Processing queue", unit="item", dynamic_ncols=True) as progress_bar:
-            while Q:
-                queue_item = heapq.heappop(Q)
-                futures.append(executor.submit(branch_and_bound_worker, G, queue_item))
-                processed_items += 1
-                progress_bar.set_postfix(best_cost=best_cost, processed=processed_items, total=total_queue_items)
-                progress_bar.update(1)
-
-                if len(futures) >= max_workers:
-                    for future in as_completed(futures):
-                        cost, path = future.result()
-                        if cost < best_cost:
-                            best_cost = cost
-                            best_path = path
-                            progress_bar.set_postfix(best_cost=best_cost, processed=processed_items, total=total_queue_items)
-                    futures = []
-
-                # Add new queue items to the total count
-                total_queue_items += len(futures)
-                progress_bar.total = total_queue_items
-
-            for future in as_completed(futures):
-                cost, path = future.result()
-                if cost < best_cost:
-                    best_cost = cost
-                    best_path = path
-                    progress_bar.set_postfix(best_cost=best_cost, processed=processed_items, total=total_queue_items)
-
-    # also available: return best_path, best_cost
-    return best_path
\ No newline at end of file
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from TspInstance import as_instance
+from NearestNeighbor import all_nearest_neighbor
+from LowerBounds import calculate_lower_bound, make_bound, minimum_spanning_tree_weight
+from SolverObserver import make_observer
+
+# Seconds between two reads of the shared incumbent in a worker; the deadline is checked before every node
+INCUMBENT_SYNC_SECONDS = 0.05
+
+# State of a worker process, set up once by the pool initializer instead of being pickled with every task
+_worker_matrix = None
+_worker_incumbent = None
+_worker_bound = None
+
+def expand(D, queue_item, best_cost, bound):
+    """
+    Creates the children of a search node whose lower bound is below the incumbent.
+    A child that completes the tour gets its exact cost (including the edge back to the start) as bound.
+
+    Parameters:
+    - D: The distance matrix.
+    - queue_item: A search node (lower_bound, cost, path, unvisited, bound_state).
+    - best_cost: The cost of the incumbent tour.
+    - bound: The lower bound (see LowerBounds) that derives a child's bound from the parent's bound state.
+
+    Returns:
+    - The surviving children and the number of pruned ones.
+    """
+    _, cost, path, unvisited, bound_state = queue_item
+    children, pruned = [], 0
+    for v in unvisited:
+        next_cost = cost + D.item(path[-1], v)
+        next_unvisited = unvisited - {v}
+        if next_unvisited:
+            remaining, state = bound.child(path + [v], next_unvisited, bound_state, best_cost - next_cost)
+            lower_bound = next_cost + remaining
+        else:
+            lower_bound, state = next_cost + D.item(v, path[0]), None
+        if lower_bound < best_cost:
+            children.append((lower_bound, next_cost, path + [v], next_unvisited, state))
+        else:
+            pruned += 1
+    return children, pruned
+
+def branch_and_bound_worker(D, queue_item, bound, best_cost=float('inf'), incumbent=None, deadline=None):
+    """
+    Depth-first search below one frontier node. Children are visited best bound first, and every node is
+    pruned against the best cost known to any worker, which is read from the shared incumbent.
+
+    Parameters:
+    - D: The distance matrix.
+    - queue_item: The frontier node (lower_bound, cost, path, unvisited, bound_state) to search below.
+    - bound: The lower bound used for the children.
+    - best_cost (optional): The cost of the best known tour.
+    - incumbent (optional): A shared multiprocessing.Value with the best cost of all workers.
+    - deadline (optional): A time.time() value after which the search stops.
+
+    Returns:
+    - The cost and path of the best tour found below the node (None if nothing beat best_cost), and a dict of counters.
+    """
+    stats = {"explored": 0, "pruned": 0, "complete": True}
+    best_path, best_path_cost = None, float('inf')
+    stack = [queue_item]
+    next_sync = time.monotonic()
+    while stack:
+        if deadline is not None and time.time() > deadline:
+            stats["complete"] = False
+            break
+        if incumbent is not None and time.monotonic() >= next_sync:
+            best_cost = min(best_cost, incumbent.value)
+            next_sync = time.monotonic() + INCUMBENT_SYNC_SECONDS
+        item = stack.pop()
+        stats["explored"] += 1
+        if item[0] >= best_cost:
+            stats["pruned"] += 1
+            continue
+        if not item[3]:
+            # A complete tour: its bound is its exact cost
+            best_cost, best_path, best_path_cost = item[0], item[2], item[0]
+            if incumbent is not None:
+                with incumbent.get_lock():
+                    if best_cost < incumbent.value:
+                        incumbent.value = best_cost
+            continue
+        children, pruned = expand(D, item, best_cost, bound)
+        stats["pruned"] += pruned
+        children.sort(key=lambda child: child[0], reverse=True)  # The stack pops the most promising child first
+        stack.extend(children)
+    return best_path_cost, best_path, stats
+
+def _init_worker(D, incumbent, bound_name, bound_options):
+    global _worker_matrix, _worker_incumbent, _worker_bound
+    _worker_matrix, _worker_incumbent = D, incumbent
+    _worker_bound = make_bound(bound_name, D, **bound_options)
+
+def _solve_subtree(queue_item, deadline):
+    return branch_and_bound_worker(_worker_matrix, queue_item, _worker_bound, _worker_incumbent.value, _worker_incumbent, deadline)
+
+def branch_and_bound_tsp(G, max_workers=None, frontier_size=None, time_limit=None, progress=True, bound="one_tree", bound_options=None,
+                         observer=None) -> dict:
+    """
+    Solves a TSP instance to optimality with a best-first / depth-first branch-and-bound hybrid.
+
+    The incumbent is seeded with the multi-start nearest neighbor tour. The search tree is expanded
+    best-first in this process until the frontier holds frontier_size nodes; the frontier nodes are then
+    searched depth-first in a process pool, all workers pruning against one shared incumbent.
+
+    Parameters:
+    - G: A NetworkX graph or TspInstance.
+    - max_workers (optional): The number of worker processes, defaults to the number of CPUs.
+    - frontier_size (optional): The number of frontier nodes to distribute, defaults to 16 per worker.
+    - time_limit (optional): Seconds after which the search stops and returns the incumbent.
+    - progress (optional): If True and no observer is given, show a progress bar over the distributed frontier nodes.
+    - bound (optional): The lower bound, "one_tree" (Held-Karp, default) or "mst", see LowerBounds.
+    - bound_options (optional): Keyword arguments for the lower bound, e.g. {"child_iterations": 10}.
+    - observer (optional): A SolverObserver that gets the nodes expanded and pruned, every new incumbent,
+      the progress over the frontier nodes and the time of the seed, frontier and search phases.
+
+    Returns:
+    - A dict with the best path (node labels) and its cost, whether it is proven optimal, the final lower
+      bound and optimality gap, the number of nodes explored and pruned, and a trace of
+      (elapsed seconds, best cost, lower bound, gap) tuples recorded over time.
+    """
+    instance = as_instance(G)
+    D = instance.matrix
+    max_workers = max_workers or os.cpu_count()
+    frontier_size = frontier_size or 16 * max_workers
+    bound_options = bound_options or {}
+    lower_bound_function = make_bound(bound, D, **bound_options)
+    start_time = time.time()
+    deadline = start_time + time_limit if time_limit is not None else None
+    stats = {"explored": 0, "pruned": 0}
+    trace = []
+    observer = make_observer(observer, progress, desc="Branch and bound", unit="subtree")
+    observer.start("branch_and_bound", dimension=instance.dimension, workers=max_workers, frontier_size=frontier_size, bound=bound)
+
+    def record(lower_bound):
+        gap = (best_cost - lower_bound) / best_cost if best_cost else 0.0
+        trace.append((time.time() - start_time, best_cost, lower_bound, max(gap, 0.0)))
+
+    # Seed the incumbent with the best nearest neighbor tour, rotated to start at index 0
+    with observer.section("seed"):
+        _, heuristic_path, _ = all_nearest_neighbor(instance)
+        best_path = instance.to_indices(heuristic_path)
+        best_path = best_path[best_path.index(0):] + best_path[:best_path.index(0)]
+        best_cost = instance.path_weight(best_path, closed=True)
+    observer.improvement(best_cost, source="nearest_neighbor")
+
+    with observer.section("frontier"):
+        root_unvisited = set(range(1, instance.dimension))
+        root_bound, root_state = lower_bound_function.root(0, root_unvisited)
+        root = (root_bound, 0, [0], root_unvisited, root_state)
+        record(min(root[0], best_cost))
+
+        # Best-first expansion until the frontier is wide enough to keep every worker busy
+        counter = itertools.count()
+        queue = [(root[0], next(counter), root)]
+        timed_out = False
+        while queue and len(queue) < frontier_size:
+            if deadline is not None and time.time() > deadline:
+                timed_out = True
+                record(min(queue[0][0], best_cost))
+                break
+            lower_bound, _, item = heapq.heappop(queue)
+            stats["explored"] += 1
+            if lower_bound >= best_cost:
+                stats["pruned"] += 1
+                continue
+            if not item[3]:
+                best_cost, best_path = lower_bound, item[2]
+                record(min(queue[0][0], best_cost) if queue else best_cost)
+                observer.improvement(best_cost)
+                continue
+            with observer.section("expand", sampled=True):
+                children, pruned = expand(D, item, best_cost, lower_bound_function)
+            stats["pruned"] += pruned
+            for child in children:
+                heapq.heappush(queue, (child[0], next(counter), child))
+
+        frontier = [item for lower_bound, _, item in sorted(queue) if lower_bound < best_cost]
+        stats["pruned"] += len(queue) - len(frontier)
+    observer.count("nodes_expanded", stats["explored"])
+    observer.count("nodes_pruned", stats["pruned"])
+    complete = not timed_out
+    if frontier and not timed_out:
+        incumbent = multiprocessing.Value('d', best_cost)
+        observer.progress(0, len(frontier))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(D, incumbent, bound, bound_options)) as executor, observer.section("search"):
+            pending = {executor.submit(_solve_subtree, item, deadline): item[0] for item in frontier}
+            for done, future in enumerate(as_completed(list(pending)), start=1):
+                cost, path, worker_stats = future.result()
+                del pending[future]
+                stats["explored"] += worker_stats["explored"]
+                stats["pruned"] += worker_stats["pruned"]
+                complete = complete and worker_stats["complete"]
+                observer.count("nodes_expanded", worker_stats["explored"])
+                observer.count("nodes_pruned", worker_stats["pruned"])
+                if path is not None and cost < best_cost:
+                    best_cost, best_path = cost, path
+                    observer.improvement(best_cost)
+                record(min(min(pending.values(), default=best_cost), best_cost) if complete else trace[-1][2])
+                observer.progress(done)
+    elif not timed_out:
+        record(best_cost)
+
+    lower_bound = best_cost if complete else trace[-1][2]
+    observer.finish(cost=best_cost, optimal=complete, lower_bound=lower_bound, gap=trace[-1][3] if not complete else 0.0,
+                    nodes_explored=stats["explored"], nodes_pruned=stats["pruned"])
+    return {
+        "path": instance.to_labels(best_path),
+        "cost": best_cost,
+        "optimal": complete,
+        "lower_bound": lower_bound,
+        "gap": trace[-1][3] if not complete else 0.0,
+        "nodes_explored": stats["explored"],
+        "nodes_pruned": stats["pruned"],
+        "time": time.time() - start_time,
+        "trace": trace,
+    }
+
+def branch_and_bound_tsp_optimized(G, max_workers=4, observer=None):
+    # also available: branch_and_bound_tsp(G) returns the cost and search statistics
+    # Used headless by the benchmarks, so there is no progress bar unless an observer is given
+    return branch_and_bound_tsp(G, max_workers=max_workers, progress=False, observer=observer)["path"]
@@ -1,52 +1,273 @@
 import itertools
+import hashlib
+import json
 import math
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tqdm import tqdm
+import multiprocessing
+import os
+import signal
+import time
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from TspInstance import as_instance
+from TourEvaluation import evaluate_tours
+from SolverObserver import make_observer
 
 # Authors note: This is a brute-force solution to the TSP problem. It is not efficient and should not be used for large instances.
 # A large instance is already around 10 nodes...
 # It is included here for educational purposes only.
 
+# The first node is fixed and the permutations of the others are split into shards by their first nodes
+# (the prefix). Every shard is enumerated depth-first in a worker process: the cost of the prefix is carried
+# along, prefixes that already cost more than the best tour known to any worker are cut off, and the last
+# nodes of every path are scored all at once: every permutation of them from a precomputed table, framed by
+# the last prefix node and the start, is one open path of a batch for TourEvaluation.evaluate_tours.
+
+# Number of trailing nodes whose permutations are scored together (7! = 5040 tours per gather)
+VECTOR_TAIL = 7
+
+# Largest number of tours in one shard: a checkpoint only records whole shards, so this bounds the work an
+# interrupt or time limit discards (a few seconds per worker)
+MAX_SHARD_TOURS = 10 ** 7
+
+# Shards queued per worker; the others are only generated when a worker needs them
+QUEUED_SHARDS = 4
+
+# Seconds between two writes of the checkpoint file
+CHECKPOINT_INTERVAL = 10
+CHECKPOINT_VERSION = 1
+
+# State of a worker process, set up once by the pool initializer
+_worker_matrix = None
+_worker_incumbent = None
+_worker_stop = None
+_permutation_tables = {}
+
+
+def permutation_table(size):
+    """
+    Returns all permutations of range(size) as a (size!, size) array, built once per process.
+    """
+    if size not in _permutation_tables:
+        _permutation_tables[size] = np.array(list(itertools.permutations(range(size))), dtype=np.intp).reshape(-1, size)
+    return _permutation_tables[size]
+
+def brute_force_shard(D, prefix, best_cost=float('inf'), incumbent=None, stop=None):
+    """
+    Enumerates every tour that starts with index 0 followed by the given prefix.
+
+    Parameters:
+    - D: The distance matrix.
+    - prefix: The matrix indices that follow the start node in every tour of the shard.
+    - best_cost (optional): The cost of the best known tour; more expensive prefixes are cut off.
+    - incumbent (optional): A shared multiprocessing.Value with the best cost of all workers.
+    - stop (optional): A shared multiprocessing.Value; the shard is abandoned as soon as it is set.
+
+    Returns:
+    - The cost and path (indices) of the best tour in the shard that beats best_cost (None otherwise),
+      the number of tours evaluated and whether the shard was enumerated completely.
+    """
+    prune = D.min(initial=0) >= 0  # Cutting off prefixes is only sound without negative weights
+    path = [0] + list(prefix)
+    remaining = [v for v in range(len(D)) if v not in set(path)]
+    cost = sum(D.item(u, v) for u, v in zip(path, path[1:]))
+    result = {"cost": float('inf'), "path": None, "tours": 0, "complete": True}
+
+    def score_tail(path, cost, remaining):
+        nonlocal best_cost
+        if stop is not None and stop.value:
+            result["complete"] = False
+            return
+        if incumbent is not None:
+            best_cost = min(best_cost, incumbent.value)
+        nodes = np.asarray(remaining, dtype=np.intp)[permutation_table(len(remaining))]
+        # Every tail as an open path from the last prefix node back to the start
+        tails = np.empty((len(nodes), len(remaining) + 2), dtype=np.intp)
+        tails[:, 0], tails[:, 1:-1], tails[:, -1] = path[-1], nodes, 0
+        costs = cost + evaluate_tours(D, tails, closed=False, validate=False)[0]
+        best = int(np.argmin(costs))
+        result["tours"] += len(costs)
+        if costs[best] < best_cost:
+            best_cost = costs[best].item()
+            result["cost"], result["path"] = best_cost, path + nodes[best].tolist()
+            if incumbent is not None:
+                with incumbent.get_lock():
+                    if best_cost < incumbent.value:
+                        incumbent.value = best_cost
+
+    def search(path, cost, remaining):
+        if prune and cost >= best_cost or not result["complete"]:
+            return
+        if len(remaining) <= VECTOR_TAIL:
+            score_tail(path, cost, remaining)
+            return
+        for v in remaining:
+            search(path + [v], cost + D.item(path[-1], v), [w for w in remaining if w != v])
+
+    if remaining:
+        search(path, cost, remaining)
+    elif cost + D.item(path[-1], 0) < best_cost:
+        result["cost"], result["path"], result["tours"] = cost + D.item(path[-1], 0), path, 1
+    return result["cost"], result["path"], result["tours"], result["complete"]
+
+def _init_worker(D, incumbent, stop):
+    global _worker_matrix, _worker_incumbent, _worker_stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Interrupts are handled by the parent, which stops the workers
+    _worker_matrix, _worker_incumbent, _worker_stop = D, incumbent, stop
+
+def _solve_shard(prefix):
+    return brute_force_shard(_worker_matrix, prefix, _worker_incumbent.value, _worker_incumbent, _worker_stop)
+
+def default_prefix_length(dimension, max_workers):
+    """
+    Picks the shortest prefix that yields at least 8 shards per worker, so the workers stay balanced, and
+    at most MAX_SHARD_TOURS tours per shard, so a checkpoint never lags far behind the search.
+    """
+    shards, length = 1, 0
+    while (shards < 8 * max_workers or math.factorial(dimension - 1 - length) > MAX_SHARD_TOURS) and length < dimension - 1 - 1:
+        shards *= dimension - 1 - length
+        length += 1
+    return length
+
+def instance_fingerprint(instance) -> str:
+    """
+    Returns the SHA-256 of the distance matrix, which ties a checkpoint to its instance.
+    """
+    return hashlib.sha256(np.ascontiguousarray(instance.matrix).tobytes()).hexdigest()
+
+def load_checkpoint(filename, instance):
+    """
+    Reads a brute-force checkpoint, or returns None if the file does not exist.
+    Raises a ValueError if the checkpoint was written for a different instance.
+    """
+    if filename is None or not os.path.exists(filename):
+        return None
+    with open(filename, 'r') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("instance") != instance_fingerprint(instance):
+        raise ValueError(f"Checkpoint {filename} belongs to a different instance")
+    return checkpoint
+
+def save_checkpoint(filename, checkpoint) -> None:
+    """
+    Writes a brute-force checkpoint atomically, so an interrupt never leaves a half-written file.
+    """
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_filename, filename)
+
+def brute_force_tsp(G, max_workers=None, prefix_length=None, checkpoint=None, time_limit=None, progress=True, observer=None) -> dict:
+    """
+    Enumerates all tours with a fixed start node in parallel worker processes and returns the shortest one.
+
+    Parameters:
+    - G: A NetworkX graph or TspInstance.
+    - max_workers (optional): The number of worker processes, defaults to the number of CPUs.
+    - prefix_length (optional): The number of nodes after the start that define a shard. Defaults to the
+      shortest prefix with at least 8 shards per worker and at most MAX_SHARD_TOURS tours per shard (a
+      resumed run keeps the prefix of its checkpoint).
+    - checkpoint (optional): A JSON file to which finished shards and the best tour are saved regularly.
+      If it exists, the search resumes from it and skips the finished shards.
+    - time_limit (optional): Seconds after which the search stops and returns the best tour so far.
+    - progress (optional): If True and no observer is given, show a progress bar over the shards.
+    - observer (optional): A SolverObserver that gets the shard progress, the tours evaluated and every new best tour.
+
+    Returns:
+    - A dict with the best path (node labels) and its closed cost, whether all shards were enumerated,
+      the number of finished and total shards, the number of tours evaluated in this run and the runtime.
+    """
+    instance = as_instance(G)
+    D = instance.matrix
+    n = instance.dimension
+    max_workers = max_workers or os.cpu_count()
+    start_time = time.time()
+    observer = make_observer(observer, progress, desc="Brute force", unit="shard")
+
+    state = load_checkpoint(checkpoint, instance)
+    if state is None:
+        if prefix_length is None:
+            prefix_length = default_prefix_length(n, max_workers)
+        state = {"version": CHECKPOINT_VERSION, "instance": instance_fingerprint(instance), "prefix_length": prefix_length,
+                 "done": [], "best_cost": None, "best_path": None}
+    done = {tuple(prefix) for prefix in state["done"]}
+    shards = (prefix for prefix in itertools.permutations(range(1, n), state["prefix_length"]) if prefix not in done)
+    best_cost = state["best_cost"] if state["best_cost"] is not None else float('inf')
+    best_path = state["best_path"]
+    tours = 0
+    last_save = time.time()
+
+    def save():
+        state.update(done=[list(prefix) for prefix in done], best_cost=best_cost if best_path is not None else None, best_path=best_path)
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, state)
+
+    total = math.perm(n - 1, state["prefix_length"])
+    observer.start("brute_force", dimension=n, workers=max_workers, prefix_length=state["prefix_length"], resumed_shards=len(done))
+    observer.progress(len(done), total)
+    if best_path is not None:
+        observer.improvement(best_cost)
+    incumbent = multiprocessing.Value('d', best_cost)
+    stop = multiprocessing.Value('b', 0)
+    executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(D, incumbent, stop))
+    pending = {}
+
+    def submit_shards():
+        # Keeps every worker supplied without creating a future for each of the (many) shards up front
+        while len(pending) < QUEUED_SHARDS * max_workers and not stop.value:
+            prefix = next(shards, None)
+            if prefix is None:
+                return
+            pending[executor.submit(_solve_shard, prefix)] = prefix
 
-def calculate_path_weight(G, path):
-    weight = 0
-    for i in range(len(path) - 1):
-        weight += G[path[i]][path[i + 1]]['weight']
-    weight += G[path[-1]][path[0]]['weight']  # Complete the tour
-    return weight
-
-def brute_force_path_worker(G, path):
-    return path, calculate_path_weight(G, path)
-
-def brute_force(G, max_workers=12, batch_size=1000000):
-    nodes = list(G.nodes)
-    # Fix the first node and generate permutations of the rest
-    permutations = itertools.permutations(nodes[1:])
-   
-    optimal_path = None
-    optimal_weight = float('inf')
-   
     try:
-        total_permutations = math.factorial(len(nodes) - 1)
-        with tqdm(total=total_permutations, desc="Calculating paths", unit="path") as progress_bar:
-            while True:
-                batch = list(itertools.islice(permutations, batch_size))
-                if not batch:
-                    break
-               
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    futures = [executor.submit(brute_force_path_worker, G, (nodes[0],) + path) for path in batch]
-                   
-                    for future in as_completed(futures):
-                        path, weight = future.result()
-                        if weight < optimal_weight:
-                            optimal_path = path
-                            optimal_weight = weight
-                            print(f"\rCurrent shortest path: {optimal_path}, Weight: {optimal_weight}", end="", flush=True)
-               
-                progress_bar.update(len(batch))
+        submit_shards()
+        with observer.section("search"):
+            while pending:
+                # Wake up at the deadline even if no shard finishes before it
+                timeout = None
+                if time_limit is not None and not stop.value:
+                    timeout = max(0.0, start_time + time_limit - time.time())
+                finished, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if time_limit is not None and time.time() - start_time >= time_limit and not stop.value:
+                    # Running shards stop at their next tail, queued ones return as soon as they start
+                    stop.value = 1
+                    observer.event("time_limit", seconds=time_limit)
+                for future in finished:
+                    cost, path, shard_tours, complete = future.result()
+                    tours += shard_tours
+                    observer.count("tours_evaluated", shard_tours)
+                    if path is not None and cost < best_cost:
+                        best_cost, best_path = cost, path
+                        observer.improvement(best_cost)
+                    if complete:
+                        done.add(pending[future])
+                    del pending[future]
+                submit_shards()
+                observer.progress(len(done), total)
+                if time.time() - last_save > CHECKPOINT_INTERVAL:
+                    with observer.section("checkpoint"):
+                        save()
+                    last_save = time.time()
     except KeyboardInterrupt:
-        print("\nInterrupted by user. Stopping the brute-force search.")
-   
-    print(f"\nFinal shortest path: {optimal_path}, Weight: {optimal_weight}")
-    return list(optimal_path) if optimal_path else None
\ No newline at end of file
+        # Keep what the finished shards found; the running shards are abandoned and redone on resume
+        observer.event("interrupted", shards_done=len(done))
+        stop.value = 1
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        save()
+
+    observer.finish(cost=best_cost if best_path is not None else None, complete=len(done) == total, tours_evaluated=tours)
+    return {
+        "path": instance.to_labels(best_path) if best_path is not None else None,
+        "cost": best_cost if best_path is not None else None,
+        "complete": len(done) == total,
+        "shards_done": len(done),
+        "shards_total": total,
+        "tours_evaluated": tours,
+        "time": time.time() - start_time,
+    }
+
+def brute_force(G, max_workers=None, checkpoint=None, observer=None):
+    # also available: brute_force_tsp(G) returns the cost and whether the enumeration finished
+    # Used headless by the benchmarks, so there is no progress bar unless an observer is given
+    return brute_force_tsp(G, max_workers=max_workers, checkpoint=checkpoint, progress=False, observer=observer)["path"]
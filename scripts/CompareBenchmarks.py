@@ -0,0 +1,223 @@
+import argparse
+import csv
+import json
+import math
+import statistics
+import sys
+from BenchmarkRunner import instance_name, solver_name
+
+# Compares benchmark result sets: CSV exports of Benchmark.py and JSONL stores of BenchmarkRunner.py.
+# Results are aligned by instance and solver (several seeds or runs of the same pair are pooled). Solvers
+# are named by their BenchmarkRunner.SOLVERS key in every format, and the rows of older CSV exports without
+# a solver column match the only solver of the other result set (or the one given with --solver). The
+# first result set is the baseline, every later one is compared against it:
+# - execution time: a change counts when it exceeds the relative threshold, the absolute minimum
+#   (sub-millisecond differences are clock noise) and z standard errors of the difference, where the
+#   standard errors come from the repeat statistics (stddev, count) of both sides when they are known
+# - deviation from the optimum: a change counts when it exceeds the absolute threshold
+# - status: a pair whose runs all succeeded in the baseline and that failed (timeout, crash, error) in any
+#   run of the candidate, or that the candidate lacks entirely, is a regression; failed runs never
+#   contribute times or deviations
+# The command exits with 1 if any pair got worse, so it can gate a solver change on a performance budget.
+
+DEFAULT_TIME_THRESHOLD = 0.10
+DEFAULT_MIN_TIME_CHANGE = 0.001
+DEFAULT_DEVIATION_THRESHOLD = 0.001
+DEFAULT_Z = 3.0
+
+# Benchmark.py notes a missing optimal tour in the error column; such a run still has a valid time
+MISSING_TOUR_ERROR = "Optimal tour file not found"
+
+
+def _number(value):
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def load_results(filename, solver=None) -> list:
+    """
+    Loads one result set as a list of rows with tsp_name, solver, status, time, time_stddev, time_count and
+    deviation. The status is "ok" or the failure ("timeout", "error", ...); failed rows have no time and
+    deviation. Solver names are normalized to SOLVERS keys; CSV rows without a solver column (older
+    exports) get the given solver, or an empty name that compare matches to the other result set.
+    """
+    rows = []
+    if filename.endswith(".jsonl"):
+        with open(filename, "r") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        for record in records:
+            status = record.get("status", "ok")
+            if status != "ok":
+                rows.append(_failed_row(instance_name(record["tsp_name"]), solver_name(record["solver"]), status))
+                continue
+            wall = (record.get("timings") or {}).get("solve", {}).get("wall", {})
+            rows.append({
+                "tsp_name": instance_name(record["tsp_name"]),
+                "solver": solver_name(record["solver"]),
+                "status": "ok",
+                "time": _number(wall.get("median", record.get("solve_time"))),
+                "time_stddev": _number(wall.get("stddev")),
+                "time_count": wall.get("count", 1),
+                "deviation": _number(record.get("deviation")),
+            })
+        return rows
+    with open(filename, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            name = solver_name(row.get("solver") or solver or "")
+            if row.get("error") and not row["error"].startswith(MISSING_TOUR_ERROR):
+                rows.append(_failed_row(instance_name(row["tsp_name"]), name, "error"))
+                continue
+            rows.append({
+                "tsp_name": instance_name(row["tsp_name"]),
+                "solver": name,
+                "status": "ok",
+                "time": _number(row.get("solve_wall_median") or row.get("execution_time")),
+                "time_stddev": _number(row.get("solve_wall_stddev")),
+                "time_count": int(_number(row.get("repeats")) or 1),
+                "deviation": _number(row.get("deviation")),
+            })
+    return rows
+
+def _failed_row(tsp_name, solver, status):
+    return {"tsp_name": tsp_name, "solver": solver, "status": status, "time": None, "time_stddev": None, "time_count": 0, "deviation": None}
+
+def aggregate(rows) -> dict:
+    """
+    Pools the rows of every (tsp_name, solver) pair.
+
+    Returns:
+    - A dict from (tsp_name, solver) to the pooled time (median), its standard error (None if unknown),
+      the mean deviation, the number of runs and the statuses of the failed runs.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["tsp_name"], row["solver"]), []).append(row)
+    pooled = {}
+    for key, group in groups.items():
+        times = [row for row in group if row["time"] is not None]
+        deviations = [row["deviation"] for row in group if row["deviation"] is not None]
+        entry = {"time": None, "time_error": None, "deviation": statistics.fmean(deviations) if deviations else None,
+                 "runs": len(group), "failures": [row["status"] for row in group if row["status"] != "ok"]}
+        if len(times) == 1:
+            row = times[0]
+            entry["time"] = row["time"]
+            if row["time_stddev"] is not None and row["time_count"] > 1:
+                entry["time_error"] = row["time_stddev"] / math.sqrt(row["time_count"])
+        elif len(times) > 1:
+            # Every run (seed) is one sample
+            values = [row["time"] for row in times]
+            entry["time"] = statistics.median(values)
+            entry["time_error"] = statistics.stdev(values) / math.sqrt(len(values))
+        pooled[key] = entry
+    return pooled
+
+def match_unnamed(pooled, other) -> dict:
+    """
+    Gives the pairs without a solver name the name of the only solver in the other result set.
+    """
+    solvers = {solver for _, solver in other} - {""}
+    if len(solvers) != 1:
+        return pooled
+    solver = solvers.pop()
+    return {(tsp_name, name or solver): entry for (tsp_name, name), entry in pooled.items()}
+
+def compare(baseline, candidate, time_threshold=DEFAULT_TIME_THRESHOLD, min_time_change=DEFAULT_MIN_TIME_CHANGE,
+            deviation_threshold=DEFAULT_DEVIATION_THRESHOLD, z=DEFAULT_Z) -> list:
+    """
+    Compares two aggregated result sets pair by pair, after match_unnamed on both sides.
+
+    Returns:
+    - One finding per compared metric: tsp_name, solver, metric, baseline and candidate value, relative
+      change and status ("regression", "improvement" or "unchanged"). A pair that succeeded in the baseline
+      and failed or is missing in the candidate is a "status" regression (the values are status texts),
+      a failed pair that succeeds now a "status" improvement; a pair only the candidate has is "missing in baseline".
+    """
+    baseline, candidate = match_unnamed(baseline, candidate), match_unnamed(candidate, baseline)
+    findings = []
+    for key in sorted(set(baseline) | set(candidate)):
+        tsp_name, solver = key
+        if key not in baseline:
+            findings.append({"tsp_name": tsp_name, "solver": solver, "metric": "", "baseline": None, "candidate": None,
+                             "change": None, "status": "missing in baseline"})
+            continue
+        old, new = baseline[key], candidate.get(key)
+        old_status = _status_text(old)
+        new_status = _status_text(new) if new is not None else "missing"
+        if new is None or (new["failures"] and not old["failures"]):
+            findings.append({"tsp_name": tsp_name, "solver": solver, "metric": "status", "baseline": old_status,
+                             "candidate": new_status, "change": None, "status": "regression"})
+            continue
+        if old["failures"] and not new["failures"]:
+            findings.append({"tsp_name": tsp_name, "solver": solver, "metric": "status", "baseline": old_status,
+                             "candidate": new_status, "change": None, "status": "improvement"})
+        if old["time"] is not None and new["time"] is not None:
+            difference = new["time"] - old["time"]
+            significant = abs(difference) > max(min_time_change, time_threshold * old["time"])
+            if old["time_error"] is not None and new["time_error"] is not None:
+                significant = significant and abs(difference) > z * math.hypot(old["time_error"], new["time_error"])
+            findings.append(_finding(tsp_name, solver, "execution_time", old["time"], new["time"], significant))
+        if old["deviation"] is not None and new["deviation"] is not None:
+            significant = abs(new["deviation"] - old["deviation"]) > deviation_threshold
+            findings.append(_finding(tsp_name, solver, "deviation", old["deviation"], new["deviation"], significant))
+    return findings
+
+def _finding(tsp_name, solver, metric, old, new, significant):
+    status = "unchanged"
+    if significant:
+        status = "regression" if new > old else "improvement"
+    change = (new - old) / abs(old) if old else None
+    return {"tsp_name": tsp_name, "solver": solver, "metric": metric, "baseline": old, "candidate": new, "change": change, "status": status}
+
+def _status_text(entry):
+    if not entry["failures"]:
+        return "ok"
+    statuses = "/".join(sorted(set(entry["failures"])))
+    return statuses if len(entry["failures"]) == entry["runs"] else f"{statuses} ({len(entry['failures'])} of {entry['runs']} runs)"
+
+def print_findings(findings, show_all=False) -> None:
+    for finding in findings:
+        if not show_all and finding["status"] == "unchanged":
+            continue
+        change = f"{finding['change']:+.1%}" if finding["change"] is not None else ""
+        values = ""
+        if finding["metric"] == "status":
+            values = f"{finding['baseline']} -> {finding['candidate']}"
+        elif finding["baseline"] is not None:
+            values = f"{finding['baseline']:.6g} -> {finding['candidate']:.6g}"
+        print(f"{finding['tsp_name']:<16} {finding['solver'] or '-':<24} {finding['metric']:<15} {values:<28} {change:>8}  {finding['status']}")
+
+def main(argv=None):
+    """
+    Compares result sets from the command line, e.g.
+    python CompareBenchmarks.py benchmark_results/old.csv benchmark_results/new.csv --time-threshold 0.05
+    """
+    parser = argparse.ArgumentParser(description="Compare benchmark results and fail on regressions.")
+    parser.add_argument("results", nargs="+", help="Result sets (.csv or .jsonl); the first one is the baseline")
+    parser.add_argument("--time-threshold", type=float, default=DEFAULT_TIME_THRESHOLD, help="Relative execution time change that counts")
+    parser.add_argument("--min-time-change", type=float, default=DEFAULT_MIN_TIME_CHANGE, help="Smallest execution time change in seconds that counts")
+    parser.add_argument("--deviation-threshold", type=float, default=DEFAULT_DEVIATION_THRESHOLD, help="Absolute change of the deviation from the optimum that counts")
+    parser.add_argument("--z", type=float, default=DEFAULT_Z, help="Standard errors a time change must exceed, when repeat statistics are known")
+    parser.add_argument("--solver", default=None, help="Solver of the result sets without a solver column (older CSV exports)")
+    parser.add_argument("--all", action="store_true", help="Also list unchanged pairs")
+    args = parser.parse_args(argv)
+    if len(args.results) < 2:
+        parser.error("At least two result sets are needed")
+
+    baseline = aggregate(load_results(args.results[0], args.solver))
+    regressions = 0
+    for filename in args.results[1:]:
+        print(f"{args.results[0]} -> {filename}")
+        findings = compare(baseline, aggregate(load_results(filename, args.solver)), args.time_threshold, args.min_time_change, args.deviation_threshold, args.z)
+        print_findings(findings, args.all)
+        count = sum(finding["status"] == "regression" for finding in findings)
+        print(f"{count} regressions, {sum(finding['status'] == 'improvement' for finding in findings)} improvements, "
+              f"{sum(finding['status'].startswith('missing') for finding in findings)} new")
+        regressions += count
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import numpy as np
+from TspInstance import as_instance
+from NearestNeighbor import DEFAULT_CANDIDATES
+from LowerBounds import prim_mst
+
+# Construction heuristics that build a tour from scratch, all on the array-backed instance and with the
+# same return contract as all_nearest_neighbor (start node, path, weight of the open path):
+# - greedy edge: adds the shortest candidate edges that keep every node at degree <= 2 without closing a
+#   cycle (union-find), then joins the resulting fragments through the edges between their ends
+# - space-filling curve: visits the nodes in the order of a Hilbert curve over their coordinates,
+#   O(n log n) and without any distance computation, for coordinate instances
+# - Christofides: minimum spanning tree + minimum weight perfect matching of its odd-degree nodes +
+#   Euler tour with shortcuts; at most 1.5 times the optimum when the distances are metric
+
+# Up to this many fragment ends, the fragments are joined by greedy selection over all edges between their
+# ends (like the classic greedy on the complete graph); beyond it, nearest free end first
+MAX_GREEDY_ENDS = 4000
+
+# Bits per axis of the Hilbert curve grid
+HILBERT_ORDER = 16
+
+
+def _find(parent, v):
+    while parent[v] != v:
+        parent[v] = parent[parent[v]]  # Path halving
+        v = parent[v]
+    return v
+
+def _join_fragments(D, adjacency):
+    """
+    Joins path fragments (every node has at most two neighbors, there is no cycle) into one tour: from the
+    free end of the current fragment, the walk continues at the nearest free end of an unused fragment.
+
+    Parameters:
+    - D: The distance matrix.
+    - adjacency: The neighbors of every node in its fragment, as lists.
+
+    Returns:
+    - The tour as a list of matrix indices.
+    """
+    n = len(adjacency)
+    # Walk every fragment once to pair up its two ends (a single node is both ends of its fragment)
+    ends = [v for v in range(n) if len(adjacency[v]) < 2]
+    other_end = {}
+    fragments = {}
+    for v in ends:
+        if v in other_end:
+            continue
+        nodes, previous, current = [v], None, v
+        while True:
+            following = [u for u in adjacency[current] if u != previous]
+            if not following:
+                break
+            previous, current = current, following[0]
+            nodes.append(current)
+        other_end[v], other_end[current] = current, v
+        fragments[v], fragments[current] = nodes, nodes[::-1]
+
+    ends = np.array(ends, dtype=np.intp)
+    free = np.ones(len(ends), dtype=bool)
+    slot = {v: i for i, v in enumerate(ends.tolist())}
+    order = []
+    current = ends[0].item()
+    while True:
+        order.extend(fragments[current])
+        free[slot[current]] = free[slot[other_end[current]]] = False
+        remaining = ends[free]
+        if not len(remaining):
+            return order
+        tail = other_end[current]
+        current = remaining[np.argmin(D[tail, remaining])].item()  # Ends are ascending, ties go to the lower index
+
+def _add_greedy_edges(pairs, parent, adjacency, added):
+    """
+    Adds the sorted edges that keep every node at degree <= 2 and close no cycle, until the tour is a path.
+
+    Returns:
+    - The number of edges in the fragments.
+    """
+    n = len(adjacency)
+    for u, v in pairs.tolist():
+        if added == n - 1:
+            break
+        if len(adjacency[u]) == 2 or len(adjacency[v]) == 2:
+            continue
+        root_u, root_v = _find(parent, u), _find(parent, v)
+        if root_u == root_v:
+            continue  # Would close a cycle before all nodes are joined
+        parent[root_u] = root_v
+        adjacency[u].append(v)
+        adjacency[v].append(u)
+        added += 1
+    return added
+
+def greedy_edge_indices(instance, k=DEFAULT_CANDIDATES) -> list:
+    """
+    Builds a tour with the greedy edge heuristic on the k-nearest candidate edges.
+
+    Returns:
+    - The tour as a list of matrix indices.
+    """
+    n = instance.dimension
+    if n <= 3:
+        return list(range(n))
+    D = instance.matrix
+    candidates = instance.candidate_lists(k)
+    first = np.repeat(np.arange(n), candidates.shape[1])
+    second = candidates.ravel()
+    pairs = np.unique(np.column_stack((np.minimum(first, second), np.maximum(first, second))), axis=0)
+    weights = D[pairs[:, 0], pairs[:, 1]]
+    pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0], weights))]
+
+    parent = list(range(n))
+    adjacency = [[] for _ in range(n)]
+    added = _add_greedy_edges(pairs, parent, adjacency, 0)
+    ends = np.array([v for v in range(n) if len(adjacency[v]) < 2], dtype=np.intp)
+    if added < n - 1 and len(ends) <= MAX_GREEDY_ENDS:
+        # The candidate lists missed the edges that would join the fragments: continue the greedy
+        # selection on all edges between fragment ends
+        first, second = np.triu_indices(len(ends), 1)
+        pairs = np.column_stack((ends[first], ends[second]))
+        weights = D[pairs[:, 0], pairs[:, 1]]
+        pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0], weights))]
+        _add_greedy_edges(pairs, parent, adjacency, added)
+    return _join_fragments(D, adjacency)
+
+def hilbert_index(x, y, order=HILBERT_ORDER) -> np.ndarray:
+    """
+    Returns the position of every grid point (x, y) along a Hilbert curve over a 2^order x 2^order grid.
+    """
+    x, y = np.array(x, dtype=np.int64), np.array(y, dtype=np.int64)
+    side = 1 << order
+    index = np.zeros(x.shape, dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        index += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve continues in the right orientation
+        flip = ~ry & rx
+        x = np.where(flip, side - 1 - x, x)
+        y = np.where(flip, side - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    return index
+
+def space_filling_curve_indices(instance, order=HILBERT_ORDER) -> list:
+    """
+    Orders the nodes of a coordinate instance along a Hilbert curve over their bounding box.
+
+    Returns:
+    - The tour as a list of matrix indices.
+    """
+    coords = getattr(instance, "coords", None)
+    if coords is None:
+        raise ValueError("The space-filling curve needs node coordinates; load the instance with CoordinateInstance")
+    low = coords.min(axis=0)
+    extent = float((coords.max(axis=0) - low).max()) or 1.0
+    # One common scale for both axes keeps the curve cells square
+    grid = np.minimum(((coords - low) / extent * (1 << order)).astype(np.int64), (1 << order) - 1)
+    return np.argsort(hilbert_index(grid[:, 0], grid[:, 1], order), kind='stable').tolist()
+
+def christofides_indices(instance) -> list:
+    """
+    Builds a tour with the Christofides heuristic. The perfect matching is solved exactly (blossom
+    algorithm from NetworkX), which takes O(m^3) for m odd-degree nodes, so this is meant for instances
+    up to a few hundred nodes.
+
+    Returns:
+    - The tour as a list of matrix indices.
+    """
+    import networkx as nx  # The matching and the Euler tour come from NetworkX, the other heuristics do not need it
+    n = instance.dimension
+    if n <= 3:
+        return list(range(n))
+    D = instance.matrix
+    _, degrees, parents = prim_mst(D, return_parents=True)
+    tree = [(v, parents[v].item()) for v in range(1, n)]
+    odd = np.flatnonzero(degrees % 2 == 1)
+    odd_weights = D[odd[:, None], odd[None, :]]
+    H = nx.Graph()
+    for i in range(len(odd)):
+        H.add_weighted_edges_from((odd[i].item(), odd[j].item(), odd_weights[i, j].item()) for j in range(i + 1, len(odd)))
+    matching = nx.min_weight_matching(H)
+
+    M = nx.MultiGraph()
+    M.add_edges_from(tree)
+    M.add_edges_from(matching)
+    order, seen = [], set()
+    for u, _ in nx.eulerian_circuit(M, source=0):
+        if u not in seen:  # Shortcut nodes that the Euler tour visits again
+            seen.add(u)
+            order.append(u)
+    return order
+
+def _heuristic_result(instance, order):
+    path = instance.to_labels(order)
+    return (path[0] if path else None), path, instance.path_weight(order)
+
+def greedy_edge(G, k=DEFAULT_CANDIDATES):
+    """
+    Greedy edge construction, with the same return contract as all_nearest_neighbor.
+
+    Parameters:
+    - G: A NetworkX graph or TspInstance.
+    - k (optional): The length of the candidate lists the edges are taken from.
+
+    Returns:
+    - A tuple with the start node, the path (node labels) and the weight of the (open) path.
+    """
+    instance = as_instance(G)
+    return _heuristic_result(instance, greedy_edge_indices(instance, k))
+
+def space_filling_curve(G, order=HILBERT_ORDER):
+    """
+    Hilbert curve construction for a CoordinateInstance, with the same return contract as all_nearest_neighbor.
+
+    Returns:
+    - A tuple with the start node, the path (node labels) and the weight of the (open) path.
+    """
+    instance = as_instance(G)
+    return _heuristic_result(instance, space_filling_curve_indices(instance, order))
+
+# The benchmark harnesses load the instance of this heuristic from its .tsp source as a CoordinateInstance
+space_filling_curve.needs_coordinates = True
+
+def christofides(G):
+    """
+    Christofides construction, with the same return contract as all_nearest_neighbor.
+
+    Returns:
+    - A tuple with the start node, the path (node labels) and the weight of the (open) path.
+    """
+    instance = as_instance(G)
+    return _heuristic_result(instance, christofides_indices(instance))
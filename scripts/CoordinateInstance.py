@@ -0,0 +1,248 @@
+import math
+import numpy as np
+from TspInstance import TspInstance
+from TspFileParser import parse_tsp_file, paired_distances, _geo_radians, format_edge_block, open_tsplib_file, EDGE_BLOCK_SIZE
+from SpatialIndex import GridIndex
+
+# Coordinate-backed instances for large coordinate .tsp files: only the n coordinates are kept and every
+# distance is computed when it is needed, with the same TSPLIB rounding as the dense matrix. Candidate
+# lists come from a grid index, so building an instance and its k-nearest lists takes O(n k) memory.
+# Single distances (the local search and LK moves) are computed in plain Python, which costs a fraction
+# of a NumPy call per pair; everything else is computed in batches.
+
+# The norm under which the TSPLIB distances of every coordinate type grow monotonically
+INDEX_NORMS = {"EUC_2D": 2, "CEIL_2D": 2, "ATT": 2, "GEO": 2, "MAN_2D": 1, "MAX_2D": np.inf}
+
+# Up to this many nodes, the nearest unvisited node is found by scanning whole rows (exact, and cheaper
+# than a grid search at this size); beyond it, the grid index is searched
+ROW_SCAN_NODES = 16384
+
+# Bounds the number of distances computed at once by the row scans
+BATCH_ELEMENTS = 1 << 22
+
+# Scalar TSPLIB distances of two coordinate pairs, the same rounding as TspFileParser.paired_distances
+# (round() and np.rint both round half to even). GEO is left to NumPy, whose cosines may differ from math's in the last bit.
+_SCALAR_DISTANCES = {
+    "EUC_2D": lambda dx, dy: round(math.sqrt(dx * dx + dy * dy)),
+    "CEIL_2D": lambda dx, dy: math.ceil(math.sqrt(dx * dx + dy * dy)),
+    "ATT": lambda dx, dy: round(math.sqrt((dx * dx + dy * dy) / 10.0) + 0.5),
+    "MAN_2D": lambda dx, dy: round(abs(dx) + abs(dy)),
+    "MAX_2D": lambda dx, dy: max(round(abs(dx)), round(abs(dy))),
+}
+
+
+class LazyDistanceMatrix:
+    """
+    Stands in for the dense distance matrix of a coordinate instance. Supports the access patterns the
+    solvers use: item(i, j), whole rows, index arrays (element by element) and slices, each computed on demand.
+    """
+
+    def __init__(self, coords, edge_weight_type, dtype=np.int32):
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.edge_weight_type = edge_weight_type
+        self.dtype = np.dtype(dtype)
+        self.shape = (len(self.coords), len(self.coords))
+        self.ndim = 2
+        self._scalar = _SCALAR_DISTANCES.get(edge_weight_type)
+        self._x, self._y = self.coords[:, 0].tolist(), self.coords[:, 1].tolist()
+
+    def __len__(self):
+        return len(self.coords)
+
+    def item(self, i, j):
+        if i == j:
+            return 0
+        if self._scalar is not None:
+            return self._scalar(self._x[i] - self._x[j], self._y[i] - self._y[j])
+        return int(paired_distances(self.coords[i], self.coords[j], self.edge_weight_type))
+
+    def _distances(self, rows, cols):
+        distances = paired_distances(self.coords[rows], self.coords[cols], self.edge_weight_type)
+        distances[np.asarray(rows == cols)] = 0
+        return distances.astype(self.dtype)
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        n = len(self.coords)
+        if isinstance(rows, slice) or isinstance(cols, slice):
+            # Slices span an outer product, like in NumPy
+            rows = np.arange(n)[rows] if isinstance(rows, slice) else np.asarray(rows, dtype=np.intp)
+            cols = np.arange(n)[cols] if isinstance(cols, slice) else np.asarray(cols, dtype=np.intp)
+            return self._distances(rows[..., None], cols.reshape((1,) * rows.ndim + cols.shape))
+        rows, cols = np.broadcast_arrays(np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp))
+        return self._distances(rows, cols)
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:, :].astype(dtype or self.dtype)
+
+    def row_blocks(self):
+        """
+        Yields (rows, distances) for blocks of whole rows, bounded by BATCH_ELEMENTS distances each.
+        """
+        n = len(self.coords)
+        block_size = max(1, BATCH_ELEMENTS // max(n, 1))
+        for start in range(0, n, block_size):
+            rows = np.arange(start, min(start + block_size, n))
+            yield rows, self[rows, :]
+
+    def min(self, axis=None, initial=None):
+        # TSPLIB distances are never negative and every row holds its zero diagonal
+        if axis is None:
+            return 0 if initial is None else min(0, initial)
+        return np.zeros(len(self.coords), dtype=self.dtype)
+
+    def max(self, axis=None, initial=None):
+        """
+        Computes the largest distance (axis=None) or the largest distance of every row (axis 0 or 1, the
+        matrix is symmetric) block by block, in O(n^2) time but without the dense matrix.
+        """
+        if axis not in (None, 0, 1, -1, -2):
+            raise ValueError(f"axis {axis} is out of bounds for a 2-dimensional distance matrix")
+        maxima = np.zeros(len(self.coords), dtype=self.dtype)
+        for rows, distances in self.row_blocks():
+            maxima[rows] = distances.max(axis=1)
+        if axis is not None:
+            return maxima
+        largest = maxima.max(initial=0).item()
+        return largest if initial is None else max(largest, initial)
+
+
+class CoordinateInstance(TspInstance):
+    """
+    A TspInstance that keeps only the node coordinates and computes distances on demand.
+    Heuristics and local search use it like a dense instance; the multi-start nearest neighbor only tries
+    NearestNeighbor.COORDINATE_MAX_STARTS start nodes on it by default, and the exact solvers need to_dense().
+    """
+
+    def __init__(self, coords, edge_weight_type, labels=None):
+        """
+        Parameters:
+        - coords: An (n, 2) array with the node coordinates, in node order.
+        - edge_weight_type: One of EUC_2D, CEIL_2D, MAN_2D, MAX_2D, GEO or ATT.
+        - labels (optional): The node label for every index. Defaults to 1..n like TSPLIB.
+        """
+        if edge_weight_type not in INDEX_NORMS:
+            raise ValueError(f"Unsupported edge weight type for a coordinate instance: {edge_weight_type}")
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.edge_weight_type = edge_weight_type
+        self.matrix = LazyDistanceMatrix(self.coords, edge_weight_type)
+        self.labels = list(labels) if labels is not None else list(range(1, len(self.coords) + 1))
+        if len(self.labels) != len(self.coords):
+            raise ValueError(f"Got {len(self.labels)} labels for {len(self.coords)} coordinates")
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self._candidates = {}
+        self._spatial_index = None
+
+    def __repr__(self) -> str:
+        return f"CoordinateInstance(dimension={self.dimension}, edge_weight_type={self.edge_weight_type})"
+
+    @classmethod
+    def from_tsp_file(cls, filename):
+        """
+        Reads a coordinate .tsp file (plain, .gz or .bz2) without building its distance matrix.
+        """
+        node_coords, edge_weight_type, _, _, _ = parse_tsp_file(filename)
+        labels = sorted(node_coords)
+        return cls([node_coords[label] for label in labels], edge_weight_type, labels)
+
+    def spatial_index(self) -> GridIndex:
+        """
+        Returns the grid index of the nodes, built on first use. GEO nodes are indexed as points on the
+        unit sphere, where the straight-line distance grows with the great-circle distance.
+        """
+        if self._spatial_index is None:
+            points = self.coords
+            if self.edge_weight_type == "GEO":
+                latitude, longitude = _geo_radians(self.coords[:, 0]), _geo_radians(self.coords[:, 1])
+                points = np.column_stack((np.cos(latitude) * np.cos(longitude), np.cos(latitude) * np.sin(longitude), np.sin(latitude)))
+            self._spatial_index = GridIndex(points)
+        return self._spatial_index
+
+    def clear_cache(self) -> None:
+        super().clear_cache()
+        self._spatial_index = None
+
+    def memory_bytes(self) -> int:
+        # The distance matrix is never stored, only the coordinates; the grid index is not counted
+        return self.coords.nbytes + sum(candidates.nbytes for candidates in self._candidates.values())
+
+    def candidate_lists(self, k) -> np.ndarray:
+        """
+        Returns the k nearest neighbors of every node from the grid index, cached per k.
+        Rows are sorted by TSPLIB distance, ties by index, like TspInstance.candidate_lists.
+        """
+        k = max(0, min(k, self.dimension - 1))
+        if k not in self._candidates:
+            nearest = self.spatial_index().k_nearest(k, INDEX_NORMS[self.edge_weight_type])
+            distances = self.matrix[np.arange(self.dimension)[:, None], nearest]
+            order = np.lexsort((nearest, distances), axis=1)
+            self._candidates[k] = np.take_along_axis(nearest, order, axis=1)
+        return self._candidates[k]
+
+    def nearest_unvisited(self, rows, visited) -> np.ndarray:
+        """
+        Returns the closest unvisited node of every given node. Up to ROW_SCAN_NODES nodes, the rows are
+        computed and scanned in batches, exactly like TspInstance.nearest_unvisited. Larger instances search
+        the grid index instead of a full row: among nodes at the same TSPLIB distance the lowest index found in
+        the search radius is taken, which is almost always the lowest index overall (a tie just outside the
+        radius can make the choice differ).
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        if self.dimension <= ROW_SCAN_NODES:
+            nearest = np.empty(len(rows), dtype=np.intp)
+            block_size = max(1, BATCH_ELEMENTS // max(self.dimension, 1))
+            for start in range(0, len(rows), block_size):
+                block = self.matrix[rows[start:start + block_size], :].astype(np.float64)
+                block[visited[start:start + block_size]] = np.inf
+                nearest[start:start + block_size] = block.argmin(axis=1)
+            return nearest
+        index = self.spatial_index()
+        norm = INDEX_NORMS[self.edge_weight_type]
+        nearest = np.empty(len(rows), dtype=np.intp)
+        for i, row in enumerate(rows.tolist()):
+            candidates = index.nearest(row, visited[i], norm)
+            distances = self.matrix[row, candidates]
+            nearest[i] = candidates[np.lexsort((candidates, distances))[0]]
+        return nearest
+
+    def candidate_edges(self, k) -> np.ndarray:
+        """
+        Returns the sparse candidate graph as an (m, 3) array of unique (index, index, weight) rows with index1 < index2.
+        """
+        candidates = self.candidate_lists(k)
+        first = np.repeat(np.arange(self.dimension), candidates.shape[1])
+        second = candidates.ravel()
+        pairs = np.unique(np.column_stack((np.minimum(first, second), np.maximum(first, second))), axis=0)
+        return np.column_stack((pairs, self.matrix[pairs[:, 0], pairs[:, 1]]))
+
+    def candidate_graph(self, k) -> "nx.Graph":
+        """
+        Returns the sparse candidate graph (every node joined to its k nearest neighbors) as a NetworkX graph.
+        """
+        import networkx as nx  # Only the graph conversions need NetworkX
+        G = nx.Graph()
+        G.add_nodes_from(self.labels)
+        edges = self.candidate_edges(k)
+        labels = np.asarray(self.labels, dtype=object)
+        G.add_weighted_edges_from(zip(labels[edges[:, 0]], labels[edges[:, 1]], edges[:, 2].tolist()))
+        return G
+
+    def save_candidate_edges(self, output_filename, k) -> None:
+        """
+        Saves the sparse candidate graph as an .edges file ([Node1 Node2 Weight] lines, .gz/.bz2 compressed by name).
+        """
+        edges = self.candidate_edges(k)
+        labels = np.asarray(self.labels, dtype=np.int64)
+        with open_tsplib_file(output_filename, 'wb') as f:
+            for start in range(0, len(edges), EDGE_BLOCK_SIZE):
+                block = edges[start:start + EDGE_BLOCK_SIZE]
+                f.write(format_edge_block(labels[block[:, 0]], labels[block[:, 1]], block[:, 2]))
+
+    def to_dense(self) -> TspInstance:
+        """
+        Materializes the full distance matrix, for solvers that need one (exact solvers, lower bounds).
+        """
+        return TspInstance(np.asarray(self.matrix), self.labels)
+
+    def to_graph(self) -> "nx.Graph":
+        return self.to_dense().to_graph()
@@ -0,0 +1,210 @@
+import os
+import time
+import tempfile
+import numpy as np
+from TspInstance import as_instance
+
+# Exact Held-Karp dynamic program. Node 0 is the fixed start; for every subset S of the other nodes
+# (a bitmask over indices 1..n-1) and every j in S, table[S, j] is the cheapest path that leaves node 0,
+# visits exactly S and ends in j. Subsets are processed by size, and all subsets of one size that contain j
+# are updated with a single vectorized gather + min. The table needs 2^(n-1) * (n-1) entries, so the
+# practical limit is around 25 nodes; when it does not fit into memory it is kept in a memory-mapped file.
+# For symmetric instances only subsets up to half the size are computed and the tour is joined in the middle;
+# the table then only holds those subsets, in size order, and a mask -> row index finds them.
+
+# Largest instance the dynamic program accepts (2^31 * 31 entries already need hundreds of GB)
+MAX_DIMENSION = 32
+
+# Number of subsets that are updated together, bounds the size of the temporary arrays
+SUBSET_BLOCK_SIZE = 1 << 16
+JOIN_BLOCK_SIZE = 1 << 12
+
+def available_memory():
+    """
+    Returns the available physical memory in bytes, or None if the platform does not report it.
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def subsets_by_size(m):
+    """
+    Groups all bitmasks over m bits by their number of set bits.
+
+    Returns:
+    - The masks sorted by size and the offsets of every size in it (masks of size k are masks[offsets[k]:offsets[k + 1]]).
+    """
+    popcount = np.zeros(1, dtype=np.uint8)
+    for _ in range(m):
+        popcount = np.concatenate((popcount, popcount + 1))
+    masks = np.argsort(popcount, kind='stable').astype(np.int64)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(popcount, minlength=m + 1))))
+    return masks, offsets
+
+def table_dtype(D):
+    """
+    Picks the dtype of the DP table and the value marking unreachable entries: int32 when every tour
+    (and the sentinel plus any edge) is guaranteed to fit, float64 otherwise.
+    """
+    if np.issubdtype(D.dtype, np.integer) and D.min(initial=0) >= 0:
+        sentinel = np.iinfo(np.int32).max // 2
+        if int(D.max(axis=1).astype(np.int64).sum()) < sentinel:
+            return np.dtype(np.int32), sentinel
+    return np.dtype(np.float64), np.inf
+
+def table_rows(rows, subsets):
+    """
+    Returns the table rows of subset bitmasks: the masks themselves for a full table, rows[subsets] for a compact one.
+    """
+    return subsets if rows is None else rows[subsets]
+
+def fill_table(table, W, masks, offsets, max_size, sentinel, rows=None):
+    """
+    Fills the DP table for all subsets with up to max_size nodes; the single-node subsets must be set already.
+
+    Parameters:
+    - table: The DP table with one row per subset and one column per last node.
+    - W: The (m, m) weights between the nodes 1..n-1, in the table dtype.
+    - masks, offsets: The subsets grouped by size, see subsets_by_size.
+    - max_size: The largest subset size to compute.
+    - sentinel: The value of unreachable entries.
+    - rows (optional): The table row of every subset bitmask. Defaults to the bitmask itself (a (2^m, m) table).
+    """
+    m = len(W)
+    for size in range(2, max_size + 1):
+        sized = masks[offsets[size]:offsets[size + 1]]
+        for block_start in range(0, len(sized), SUBSET_BLOCK_SIZE):
+            block = sized[block_start:block_start + SUBSET_BLOCK_SIZE]
+            values = np.full((len(block), m), sentinel, dtype=table.dtype)
+            for j in range(m):
+                contains = (block >> j) & 1 == 1
+                previous = block[contains] ^ (1 << j)
+                # Entries of nodes outside a subset hold the sentinel, so they never win the min
+                values[contains, j] = np.minimum((table[table_rows(rows, previous)] + W[:, j]).min(axis=1), sentinel)
+            table[table_rows(rows, block)] = values
+
+def backtrack(table, W, subset, last, rows=None) -> list:
+    """
+    Walks back through a filled DP table (rows as in fill_table).
+
+    Returns:
+    - The path (indices into W) that visits the subset and ends in last, in visiting order.
+    """
+    path = [last]
+    while subset != 1 << last:
+        subset ^= 1 << last
+        last = int(np.argmin(table[table_rows(rows, subset)] + W[:, last]))
+        path.append(last)
+    return path[::-1]
+
+def held_karp_tsp(G, memory_limit=None, mmap_dir=None) -> dict:
+    """
+    Solves a TSP instance to optimality with the Held-Karp dynamic program, O(2^n * n^2) time.
+
+    Parameters:
+    - G: A NetworkX graph or TspInstance.
+    - memory_limit (optional): Largest DP table in bytes that is kept in RAM. Defaults to half of the available memory.
+      Symmetric instances only need the rows of the subsets with up to half of the nodes.
+    - mmap_dir (optional): Folder for the memory-mapped table of larger instances. Defaults to the system temp folder.
+
+    Returns:
+    - A dict with the optimal path (node labels, starting at the first node), its closed cost,
+      the size of the DP table in bytes, whether the table was memory-mapped and the runtime.
+    """
+    instance = as_instance(G)
+    n = instance.dimension
+    if n > MAX_DIMENSION:
+        raise ValueError(f"Held-Karp supports at most {MAX_DIMENSION} nodes, got {n}")
+    start_time = time.time()
+    if n <= 2:
+        path = list(range(n))
+        return {"path": instance.to_labels(path), "cost": instance.path_weight(path, closed=True) if n > 1 else 0,
+                "table_bytes": 0, "memory_mapped": False, "time": time.time() - start_time}
+
+    D = np.asarray(instance.matrix)
+    m = n - 1
+    dtype, sentinel = table_dtype(D)
+    # Weights between the nodes 1..n-1, in the table type (no sum can exceed twice the sentinel)
+    W = D[1:, 1:].astype(dtype)
+    symmetric = bool(np.array_equal(D, D.T))
+    masks, offsets = subsets_by_size(m)
+    if symmetric:
+        # Only the subsets up to half the size are computed; they are the first masks in size order and
+        # take the table rows in that order
+        half = m - m // 2
+        masks = masks[:offsets[half + 1]].copy()
+        rows = np.zeros(1 << m, dtype=np.int32)
+        rows[masks] = np.arange(len(masks), dtype=np.int32)
+    else:
+        rows = None
+    table_shape = (len(masks), m)
+    table_bytes = table_shape[0] * m * dtype.itemsize
+
+    if memory_limit is None:
+        available = available_memory()
+        memory_limit = available // 2 if available else float('inf')
+    memory_mapped = table_bytes > memory_limit
+    if memory_mapped:
+        table_file = tempfile.NamedTemporaryFile(dir=mmap_dir, prefix="held_karp_", suffix=".dat")
+        table = np.memmap(table_file, dtype=dtype, mode='w+', shape=table_shape)
+    else:
+        table = np.empty(table_shape, dtype=dtype)
+
+    try:
+        singles = table_rows(rows, np.left_shift(1, np.arange(m, dtype=np.int64)))
+        table[singles] = sentinel
+        table[singles, np.arange(m)] = D[0, 1:]
+        full = (1 << m) - 1
+
+        if symmetric:
+            # Meet in the middle: a tour is a path over a subset S ending in j, the edge j-i and the
+            # reversed path over the complement of S ending in i, so subsets up to half the size suffice
+            fill_table(table, W, masks, offsets, half, sentinel, rows)
+            sized = masks[offsets[half]:offsets[half + 1]]
+            cost, best = None, None
+            for block_start in range(0, len(sized), JOIN_BLOCK_SIZE):
+                block = sized[block_start:block_start + JOIN_BLOCK_SIZE]
+                # Cheapest way to step from the end of S to every node i outside of it
+                crossing = np.minimum((table[rows[block]][:, :, None] + W[None, :, :]).min(axis=1), sentinel)
+                totals = (crossing + table[rows[block ^ full]]).min(axis=1)
+                row = int(np.argmin(totals))
+                if cost is None or totals[row] < cost:
+                    cost, best = totals[row].item(), int(block[row])
+            first_half, second_half = best, best ^ full
+            first_row, second_row = table[rows[first_half]], table[rows[second_half]]
+            inner = int(np.argmin(np.minimum((first_row[:, None] + W).min(axis=0), sentinel) + second_row))
+            outer = int(np.argmin(first_row + W[:, inner]))
+            path = backtrack(table, W, first_half, outer, rows) + backtrack(table, W, second_half, inner, rows)[::-1]
+        else:
+            fill_table(table, W, masks, offsets, m, sentinel)
+            # Close the tour and walk back through the table to recover the path
+            closing = table[full] + D[1:, 0]
+            last = int(np.argmin(closing))
+            cost = closing[last].item()
+            path = backtrack(table, W, full, last)
+    finally:
+        if memory_mapped:
+            del table
+            table_file.close()
+
+    path = [0] + [i + 1 for i in path]
+    return {
+        "path": instance.to_labels(path),
+        "cost": cost,
+        "table_bytes": table_bytes,
+        "memory_mapped": memory_mapped,
+        "time": time.time() - start_time,
+    }
+
+def held_karp(G, memory_limit=None):
+    """
+    Held-Karp with the same return contract as all_nearest_neighbor, so it can be benchmarked directly.
+
+    Returns:
+    - A tuple with the start node, the optimal path and the weight of the (open) path.
+    """
+    instance = as_instance(G)
+    result = held_karp_tsp(instance, memory_limit=memory_limit)
+    path = result["path"]
+    return path[0], path, instance.path_weight(instance.to_indices(path))
@@ -0,0 +1,132 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+from Timing import summarize
+from CompareBenchmarks import aggregate, compare, load_results, print_findings
+
+# Startup latency of the core modules. Every measurement imports one module in a fresh interpreter
+# (cwd = this folder, like the benchmark workers), so nothing is cached in sys.modules; it records the
+# import time inside the interpreter and the wall time of the whole process. The core must not load
+# plotting, progress bar or graph libraries on import (they are imported where they are used), so a
+# module that pulls in one of LAZY_MODULES fails the check. Results are written in the CSV format of
+# Benchmark.py, with the module as instance and "import" as solver, so CompareBenchmarks.py (or the
+# --baseline option) can flag startup regressions against an earlier run.
+
+# Modules the solver workers import
+CORE_MODULES = (
+    "TspFileParser", "TspInstance", "CoordinateInstance", "InstanceCache", "TsplibNwxUtils", "TourEvaluation",
+    "SolverObserver", "LowerBounds", "NearestNeighbor", "Construction", "LocalSearch", "LinKernighan",
+    "IteratedLocalSearch", "BranchAndBound", "BruteForce", "HeldKarp", "BenchmarkRunner",
+)
+
+# Libraries the core may only import inside the functions that use them
+LAZY_MODULES = ("matplotlib", "tqdm", "networkx")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter_ns()
+import {module}
+elapsed = time.perf_counter_ns() - start
+print(json.dumps({{"ns": elapsed, "loaded": sorted(name for name in {lazy!r} if name in sys.modules)}}))
+"""
+
+
+def measure_import(module, repeats=5, python=sys.executable) -> dict:
+    """
+    Imports a module in repeats fresh interpreters.
+
+    Parameters:
+    - module: The module name.
+    - repeats (optional): The number of interpreters.
+    - python (optional): The interpreter to run.
+
+    Returns:
+    - A dict with the module, the summaries (see Timing.summarize) of the import and the process wall
+      time, and the lazy modules that the import loaded.
+    """
+    import_ns, process_ns, loaded = [], [], set()
+    probe = _PROBE.format(module=module, lazy=LAZY_MODULES)
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter_ns()
+        completed = subprocess.run([python, "-c", probe], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   capture_output=True, text=True)
+        process_ns.append(time.perf_counter_ns() - start)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed: {completed.stderr.strip().splitlines()[-1:]}")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        import_ns.append(result["ns"])
+        loaded.update(result["loaded"])
+    return {"module": module, "import": summarize(import_ns), "process": summarize(process_ns), "loaded": sorted(loaded)}
+
+def export_results(measurements, base_folder="./benchmark_results", base_name="import_times") -> str:
+    """
+    Writes the measurements as a CSV in the format of Benchmark.py and returns its file name.
+    """
+    timestamp = datetime.datetime.now().strftime("_%Y-%m-%d_%H-%M-%S")
+    os.makedirs(base_folder, exist_ok=True)
+    csv_filename = os.path.join(base_folder, f"{base_name}{timestamp}.csv")
+    fieldnames = ["tsp_name", "solver", "execution_time", "solve_wall_median", "solve_wall_p95", "solve_wall_stddev",
+                  "process_wall_median", "repeats", "loaded", "error"]
+    with open(csv_filename, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for measurement in measurements:
+            timing = measurement["import"]
+            writer.writerow({
+                "tsp_name": measurement["module"],
+                "solver": "import",
+                "execution_time": timing["median"],
+                "solve_wall_median": timing["median"],
+                "solve_wall_p95": timing["p95"],
+                "solve_wall_stddev": timing["stddev"],
+                "process_wall_median": measurement["process"]["median"],
+                "repeats": timing["count"],
+                "loaded": " ".join(measurement["loaded"]),
+                "error": "",
+            })
+    return csv_filename
+
+def main(argv=None):
+    """
+    Measures the import time of the core modules from the command line, e.g.
+    python ImportTime.py --repeats 10 --max-seconds 0.5 --baseline benchmark_results/import_times_old.csv
+    """
+    parser = argparse.ArgumentParser(description="Measure and check the import time of the core modules.")
+    parser.add_argument("--modules", nargs="+", default=list(CORE_MODULES), help="Modules to import")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Exit with 1 if a median import takes longer")
+    parser.add_argument("--baseline", default=None, help="Earlier import time CSV; exit with 1 on a regression against it")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="Relative import time change that counts as regression")
+    parser.add_argument("--output", default="./benchmark_results", help="Folder for the CSV results")
+    args = parser.parse_args(argv)
+
+    measurements, failures = [], []
+    for module in args.modules:
+        measurement = measure_import(module, args.repeats)
+        measurements.append(measurement)
+        timing = measurement["import"]
+        print(f"{module:<22} import {timing['median'] * 1e3:8.1f} ms (p95 {timing['p95'] * 1e3:.1f} ms), "
+              f"process {measurement['process']['median'] * 1e3:8.1f} ms" + (f", loads {', '.join(measurement['loaded'])}" if measurement["loaded"] else ""))
+        if measurement["loaded"]:
+            failures.append(f"{module} loads {', '.join(measurement['loaded'])} on import")
+        if args.max_seconds is not None and timing["median"] > args.max_seconds:
+            failures.append(f"{module} takes {timing['median']:.3f}s to import (budget {args.max_seconds}s)")
+    filename = export_results(measurements, args.output)
+    print(f"Results exported to {filename}")
+
+    if args.baseline is not None:
+        baseline = {key: value for key, value in aggregate(load_results(args.baseline)).items() if key[0] in args.modules}
+        findings = compare(baseline, aggregate(load_results(filename)), args.time_threshold)
+        print_findings(findings)
+        failures += [f"{finding['tsp_name']} imports slower than in {args.baseline}" for finding in findings if finding["status"] == "regression"]
+    for failure in failures:
+        print(failure)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+import numpy as np
+from TspInstance import TspInstance
+
+# Binary instance cache: the distance matrix is stored as a plain .npy file next to the .edges file, so it
+# can be memory-mapped zero-copy and shared through the page cache by every process that loads it.
+# A small JSON header next to it holds the dimension, the node labels and the fingerprint of the source.
+
+CACHE_VERSION = 1
+
+def cache_paths(edges_filename) -> tuple:
+    """
+    Returns the paths of the matrix file and the header file belonging to an .edges file.
+    """
+    base = edges_filename
+    for suffix in (".edges", ".edges.gz", ".edges.bz2"):
+        if edges_filename.endswith(suffix):
+            base = edges_filename[:-len(suffix)]
+    return base + ".npy", base + ".json"
+
+def file_fingerprint(filename, with_hash=False) -> dict:
+    """
+    Describes the state of a file by its size and modification time, and optionally its SHA-256 hash.
+    """
+    stat = os.stat(filename)
+    fingerprint = {"path": os.path.abspath(filename), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        sha256 = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(block)
+        fingerprint["sha256"] = sha256.hexdigest()
+    return fingerprint
+
+def save_instance_cache(instance, edges_filename, source_filename=None) -> None:
+    """
+    Writes the binary cache of an instance next to its .edges file.
+
+    Parameters:
+    - instance: The TspInstance to cache.
+    - edges_filename: The .edges file the cache belongs to.
+    - source_filename (optional): The .tsp file the instance was converted from, used for freshness checks.
+    """
+    matrix_filename, header_filename = cache_paths(edges_filename)
+    np.save(matrix_filename, np.ascontiguousarray(instance.matrix))
+    header = {
+        "version": CACHE_VERSION,
+        "dimension": instance.dimension,
+        "dtype": instance.matrix.dtype.str,
+        "labels": list(instance.labels),
+        "source": file_fingerprint(source_filename, with_hash=True) if source_filename else None,
+    }
+    # The header is written last, so a cache without a header is never picked up half-written
+    _write_header(header, header_filename)
+
+def _write_header(header, header_filename):
+    tmp_filename = header_filename + ".tmp"
+    with open(tmp_filename, 'w') as f:
+        json.dump(header, f)
+    os.replace(tmp_filename, header_filename)
+
+def load_cache_header(edges_filename):
+    """
+    Returns the parsed cache header of an .edges file, or None if there is no complete cache.
+    """
+    matrix_filename, header_filename = cache_paths(edges_filename)
+    if not (os.path.exists(matrix_filename) and os.path.exists(header_filename)):
+        return None
+    with open(header_filename, 'r') as f:
+        return json.load(f)
+
+def update_cache_source(edges_filename, source) -> bool:
+    """
+    Records a new fingerprint of an unchanged source (same SHA-256, new size or modification time, e.g.
+    after a checkout or touch) in the cache header, so the mtime check of is_cache_fresh passes again
+    without rewriting the matrix.
+
+    Parameters:
+    - edges_filename: The .edges file the cache belongs to.
+    - source: The current fingerprint of the source, with its hash (see file_fingerprint).
+
+    Returns:
+    - True if the header was updated, False if there is no cache or it was built from different content.
+    """
+    header = load_cache_header(edges_filename)
+    if header is None or not header.get("source") or header["source"].get("sha256") != source["sha256"]:
+        return False
+    header["source"] = source
+    _write_header(header, cache_paths(edges_filename)[1])
+    return True
+
+def is_cache_fresh(header, edges_filename, source_filename=None, check="mtime", allow_missing_source=False) -> bool:
+    """
+    Checks a cache header against the .edges file and the .tsp source.
+
+    Parameters:
+    - header: The parsed cache header.
+    - edges_filename: The .edges file the cache belongs to.
+    - source_filename (optional): The .tsp source. Defaults to the source recorded in the header.
+    - check (optional): "mtime" compares size and modification time, "hash" compares the SHA-256 of the source.
+    - allow_missing_source (optional): If True, a cache whose source no longer exists is trusted (e.g. a
+      cache copied without its .tsp file); by default it is treated as stale.
+
+    Returns:
+    - True if the cache can be used.
+    """
+    if header.get("version") != CACHE_VERSION:
+        return False
+    matrix_filename, header_filename = cache_paths(edges_filename)
+    if os.path.exists(edges_filename) and os.stat(edges_filename).st_mtime_ns > os.stat(header_filename).st_mtime_ns:
+        return False
+    recorded = header.get("source")
+    if recorded is None:
+        return source_filename is None
+    source_filename = source_filename or recorded["path"]
+    if not os.path.exists(source_filename):
+        return allow_missing_source  # Nothing to compare against
+    current = file_fingerprint(source_filename, with_hash=(check == "hash"))
+    if check == "hash":
+        return current["sha256"] == recorded["sha256"]
+    return current["size"] == recorded["size"] and current["mtime_ns"] == recorded["mtime_ns"]
+
+def load_instance_cache(edges_filename, source_filename=None, check="mtime", allow_missing_source=False):
+    """
+    Memory-maps the binary cache of an .edges file, without copying the matrix.
+
+    Parameters:
+    - edges_filename: The .edges file the cache belongs to.
+    - source_filename (optional): The .tsp source to check freshness against.
+    - check (optional): "mtime" or "hash", see is_cache_fresh.
+    - allow_missing_source (optional): If True, also use a cache whose source is gone, see is_cache_fresh.
+
+    Returns:
+    - A read-only TspInstance, or None if there is no fresh cache.
+    """
+    header = load_cache_header(edges_filename)
+    if header is None or not is_cache_fresh(header, edges_filename, source_filename, check, allow_missing_source):
+        return None
+    matrix = np.load(cache_paths(edges_filename)[0], mmap_mode='r')
+    if matrix.shape != (header["dimension"], header["dimension"]) or matrix.dtype.str != header["dtype"]:
+        return None
+    return TspInstance(matrix, header["labels"])
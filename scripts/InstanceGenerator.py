@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+import numpy as np
+from TspFileParser import open_tsplib_file
+
+# Seeded generator for synthetic EUC_2D instances beyond the bundled TSPLIB files, in the style of the
+# DIMACS TSP challenge: integer coordinates in a square of side COORDINATE_RANGE,
+# - uniform: every point uniformly distributed over the square
+# - clustered: n / CLUSTER_SIZE centers uniformly distributed, every point normally distributed around
+#   a random center with a standard deviation of COORDINATE_RANGE / sqrt(n)
+# - grid: the points of a square lattice, in a random node order
+# The same kind, n and seed always give the same file (NumPy's PCG64 stream).
+
+KINDS = ("uniform", "clustered", "grid")
+
+COORDINATE_RANGE = 1_000_000
+
+# Average number of points per cluster of a clustered instance
+CLUSTER_SIZE = 100
+
+
+def generate_points(kind, n, seed=0, coordinate_range=COORDINATE_RANGE) -> np.ndarray:
+    """
+    Generates the node coordinates of a synthetic instance.
+
+    Parameters:
+    - kind: One of "uniform", "clustered" or "grid".
+    - n: The number of nodes.
+    - seed (optional): The seed of the random generator.
+    - coordinate_range (optional): The side length of the square that holds the points.
+
+    Returns:
+    - An (n, 2) integer array of coordinates.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown instance kind: {kind}, choose from {KINDS}")
+    rng = np.random.default_rng(seed)
+    if kind == "uniform":
+        return rng.integers(0, coordinate_range, size=(n, 2), dtype=np.int64)
+    if kind == "clustered":
+        centers = rng.integers(0, coordinate_range, size=(max(1, n // CLUSTER_SIZE), 2))
+        points = centers[rng.integers(0, len(centers), size=n)] + rng.normal(0.0, coordinate_range / np.sqrt(max(n, 1)), size=(n, 2))
+        return np.clip(np.rint(points), 0, coordinate_range - 1).astype(np.int64)
+    side = int(np.ceil(np.sqrt(n)))
+    spacing = max(1, coordinate_range // max(side, 1))
+    cells = np.arange(n)
+    points = np.column_stack((cells % side, cells // side)) * spacing
+    return points[rng.permutation(n)]
+
+def instance_name(kind, n, seed=0) -> str:
+    return f"{kind}{n}_s{seed}"
+
+def write_tsp_file(filename, points, name, comment="") -> None:
+    """
+    Writes coordinates as a TSPLIB EUC_2D .tsp file (gzip or bzip2 compressed by name), nodes numbered from 1.
+    """
+    lines = [f"NAME : {name}", f"COMMENT : {comment}", "TYPE : TSP", f"DIMENSION : {len(points)}",
+             "EDGE_WEIGHT_TYPE : EUC_2D", "NODE_COORD_SECTION"]
+    with open_tsplib_file(filename, 'wt') as f:
+        f.write("\n".join(lines) + "\n")
+        f.write("".join(f"{i} {x} {y}\n" for i, (x, y) in enumerate(points.tolist(), start=1)))
+        f.write("EOF\n")
+
+def generate_tsp_file(kind, n, seed=0, output_folder="../generated_tsp_files", compress=False) -> str:
+    """
+    Generates a synthetic instance and writes it into the output folder.
+
+    Returns:
+    - The name of the written file.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    name = instance_name(kind, n, seed)
+    filename = os.path.join(output_folder, name + (".tsp.gz" if compress else ".tsp"))
+    write_tsp_file(filename, generate_points(kind, n, seed), name, f"Synthetic {kind} instance, seed {seed}")
+    return filename
+
+def main(argv=None):
+    """
+    Generates instances from the command line, e.g.
+    python InstanceGenerator.py --kind uniform clustered --n 1000 10000 --seed 0 1
+    """
+    parser = argparse.ArgumentParser(description="Generate synthetic EUC_2D .tsp files.")
+    parser.add_argument("--kind", nargs="+", choices=KINDS, default=["uniform"], help="Kinds of instances")
+    parser.add_argument("--n", nargs="+", type=int, required=True, help="Numbers of nodes")
+    parser.add_argument("--seed", nargs="+", type=int, default=[0], help="Seeds; one instance per seed")
+    parser.add_argument("--output", default="../generated_tsp_files", help="Folder for the .tsp files")
+    parser.add_argument("--compress", action="store_true", help="Write gzip-compressed .tsp.gz files")
+    args = parser.parse_args(argv)
+    for kind in args.kind:
+        for n in args.n:
+            for seed in args.seed:
+                print(generate_tsp_file(kind, n, seed, args.output, args.compress))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from TspInstance import as_instance
+from NearestNeighbor import all_nearest_neighbor, DEFAULT_CANDIDATES
+from LinKernighan import MAX_DEPTH, _descend, double_bridge, make_tour
+from SolverObserver import NULL_OBSERVER
+
+# Parallel iterated local search. The run is divided into epochs: in every epoch each worker starts from
+# the best tour found so far, applies a fixed number of double-bridge kicks (each repaired with the LK
+# improver and kept if it does not make the tour worse), and writes its best tour into its slot of a
+# shared array. Between epochs the parent picks the best slot (ties go to the lowest worker) and
+# publishes it as the new start tour. Only worker and epoch numbers are pickled per task, and every
+# worker draws its kicks from a random stream derived from (seed, worker, epoch), so a run with the
+# same seed, number of workers and number of epochs always produces the same tour.
+
+# Kicks per worker and epoch
+DEFAULT_KICKS_PER_EPOCH = 100
+
+# State of a worker process, set up once by the pool initializer
+_worker_matrix = None
+_worker_candidates = None
+_worker_tours = None
+_worker_costs = None
+
+
+def tour_cost(D, order) -> float:
+    """
+    Returns the cost of a closed tour given as an array of matrix indices.
+    """
+    order = np.asarray(order, dtype=np.intp)
+    return D[order, np.roll(order, -1)].sum(dtype=np.float64).item()
+
+def iterated_local_search_indices(D, candidates, order, kicks, rng, max_depth=MAX_DEPTH):
+    """
+    Runs a number of double-bridge kicks on a locally optimal tour.
+
+    Parameters:
+    - D: The distance matrix.
+    - candidates: The candidate neighbor lists as nested Python lists.
+    - order: The start tour as a list of matrix indices.
+    - kicks: The number of kicks.
+    - rng: A random.Random instance that chooses the kicks.
+
+    Returns:
+    - The best tour (matrix indices) and its cost.
+    """
+    best_order, best_cost = list(order), tour_cost(D, order)
+    for _ in range(kicks):
+        kicked, touched = double_bridge(best_order, rng)
+        tour = make_tour(kicked)
+        for _ in _descend(D, candidates, tour, deque(touched), max_depth=max_depth):
+            pass
+        kicked = tour.tour()
+        cost = tour_cost(D, kicked)
+        if cost <= best_cost:  # Accepting equal tours lets the search drift across plateaus
+            best_order, best_cost = kicked, cost
+    return best_order, best_cost
+
+def _init_worker(D, candidates, tours, costs):
+    global _worker_matrix, _worker_candidates, _worker_tours, _worker_costs
+    _worker_matrix, _worker_candidates = D, candidates
+    _worker_tours, _worker_costs = tours, costs
+
+def _shared_views(tours, costs, n):
+    return np.frombuffer(tours, dtype=np.int32).reshape(-1, n), np.frombuffer(costs, dtype=np.float64)
+
+def _run_epoch(worker, epoch, seed, kicks, max_depth):
+    n = len(_worker_matrix)
+    tours, costs = _shared_views(_worker_tours, _worker_costs, n)
+    start = tours[-1].tolist()  # The last slot holds the best tour of the previous epochs
+    rng = random.Random(f"{seed}-{worker}-{epoch}")
+    order, cost = iterated_local_search_indices(_worker_matrix, _worker_candidates, start, kicks, rng, max_depth)
+    tours[worker] = order
+    costs[worker] = cost
+    return cost
+
+def iterated_local_search(G, time_budget=10.0, workers=None, seed=0, kicks_per_epoch=DEFAULT_KICKS_PER_EPOCH,
+                          max_epochs=None, k=DEFAULT_CANDIDATES, initial_path=None, max_depth=MAX_DEPTH, observer=NULL_OBSERVER) -> dict:
+    """
+    Improves a tour with iterated local search (double-bridge kicks + LK) on several worker processes.
+
+    Parameters:
+    - G: A NetworkX graph or TspInstance.
+    - time_budget (optional): Seconds after which no new epoch is started. None runs max_epochs epochs.
+    - workers (optional): The number of worker processes, defaults to the number of CPUs.
+    - seed (optional): The seed of all random kicks.
+    - kicks_per_epoch (optional): The number of kicks every worker applies between two exchanges of the best tour.
+    - max_epochs (optional): Stops after this many epochs. Runs with the same seed, workers and epochs are identical.
+    - k (optional): The length of the candidate neighbor lists.
+    - initial_path (optional): The start tour as node labels. Defaults to the multi-start nearest neighbor tour.
+    - max_depth (optional): The deepest chain of 2-opt moves in one LK move.
+    - observer (optional): A SolverObserver that gets the epochs and kicks, every new best tour and the
+      time of the start tour, the first descent and the epochs.
+
+    Returns:
+    - A dict with the best path (node labels, open, starting at the first node of the start tour), its closed cost,
+      the number of epochs and kicks, the runtime and a trace of (elapsed seconds, best cost) after every epoch.
+    """
+    if time_budget is None and max_epochs is None:
+        raise ValueError("Either time_budget or max_epochs is needed")
+    instance = as_instance(G)
+    start_time = time.time()
+    workers = workers or os.cpu_count()
+    n = instance.dimension
+    observer.start("iterated_local_search", dimension=n, workers=workers, seed=seed, kicks_per_epoch=kicks_per_epoch, time_budget=time_budget)
+    if initial_path is None:
+        with observer.section("start_tour"):
+            _, initial_path, _ = all_nearest_neighbor(instance, k)
+    order = instance.to_indices(initial_path)
+    if len(order) > 1 and order[0] == order[-1]:
+        order = order[:-1]
+    start = order[0]
+    if n < 8:
+        cost = instance.path_weight(order, closed=True)
+        observer.finish(cost=cost, epochs=0, kicks=0)
+        return {"path": instance.to_labels(order), "cost": cost,
+                "epochs": 0, "kicks": 0, "time": time.time() - start_time, "trace": []}
+
+    D = instance.matrix
+    with observer.section("descent"):
+        candidates = instance.candidate_lists(k).tolist()
+        tour = make_tour(order)
+        for _ in _descend(D, candidates, tour, deque(tour.tour()), max_depth=max_depth):
+            pass
+        best_order = tour.tour()
+        best_cost = tour_cost(D, best_order)
+    observer.improvement(best_cost, epoch=0)
+
+    # One slot per worker plus the published best tour in the last slot
+    shared_tours = multiprocessing.RawArray('i', (workers + 1) * n)
+    shared_costs = multiprocessing.RawArray('d', workers + 1)
+    tours, costs = _shared_views(shared_tours, shared_costs, n)
+    tours[-1], costs[-1] = best_order, best_cost
+    trace = [(time.time() - start_time, best_cost)]
+
+    epoch = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(D, candidates, shared_tours, shared_costs)) as executor:
+        while (max_epochs is None or epoch < max_epochs) and (time_budget is None or time.time() - start_time < time_budget):
+            with observer.section("epoch"):
+                futures = [executor.submit(_run_epoch, worker, epoch, seed, kicks_per_epoch, max_depth) for worker in range(workers)]
+                results = [future.result() for future in futures]
+            winner = min(range(workers), key=lambda worker: (results[worker], worker))
+            epoch += 1
+            observer.count("epochs")
+            observer.count("kicks", workers * kicks_per_epoch)
+            if results[winner] < best_cost:
+                best_cost = results[winner]
+                tours[-1], costs[-1] = tours[winner], best_cost
+                observer.improvement(best_cost, epoch=epoch)
+            observer.progress(epoch, max_epochs)
+            trace.append((time.time() - start_time, best_cost))
+
+    best_order = tours[-1].tolist()
+    i = best_order.index(start)
+    best_order = best_order[i:] + best_order[:i]
+    cost = instance.path_weight(best_order, closed=True)
+    observer.finish(cost=cost, epochs=epoch, kicks=epoch * workers * kicks_per_epoch)
+    return {
+        "path": instance.to_labels(best_order),
+        "cost": cost,
+        "epochs": epoch,
+        "kicks": epoch * workers * kicks_per_epoch,
+        "time": time.time() - start_time,
+        "trace": trace,
+    }
+
+def iterated_local_search_tsp(G, time_budget=10.0, workers=None, seed=0):
+    """
+    Iterated local search with the same return contract as all_nearest_neighbor, so it can be benchmarked directly.
+
+    Returns:
+    - A tuple with the start node, the best path and the weight of the (open) path.
+    """
+    instance = as_instance(G)
+    path = iterated_local_search(instance, time_budget=time_budget, workers=workers, seed=seed)["path"]
+    return path[0], path, instance.path_weight(instance.to_indices(path))
@@ -0,0 +1,369 @@
+import math
+import random
+import time
+from collections import deque
+from TspInstance import as_instance
+from NearestNeighbor import all_nearest_neighbor, DEFAULT_CANDIDATES
+from LocalSearch import ArrayTour, _try_or_opt
+from SolverObserver import NULL_OBSERVER
+
+# Lin-Kernighan style improver. An LK move is a chain of 2-opt moves that all share the start node t1:
+# the edge (t1, t2) is removed, t2 is joined to a candidate neighbor t3, the matching edge (t3, t4) is
+# removed and the tour is closed with (t4, t1); the chain continues from t4 as long as the partial gain
+# stays positive, and is rolled back to its best prefix. When no LK move starts at a node, an Or-opt
+# move (segment insertion, a special 3-opt move) is tried. Once the tour is locally optimal, the
+# remaining time budget is spent on double-bridge kicks that are kept when they lead to a better tour.
+
+# Deepest chain of 2-opt moves in one LK move
+MAX_DEPTH = 50
+
+# From this many nodes on, the tour is a two-level list, whose reversals cost O(sqrt(n)) instead of O(n)
+TWO_LEVEL_THRESHOLD = 1000
+
+
+class _Segment:
+    __slots__ = ("nodes", "reversed", "rank")
+
+    def __init__(self, nodes, rank):
+        self.nodes = nodes
+        self.reversed = False
+        self.rank = rank
+
+
+class TwoLevelTour:
+    """
+    A tour as a two-level doubly linked list: the cycle is cut into about sqrt(n) segments, every segment
+    knows its rank in the cycle and whether it is traversed backwards. A reversal splits at most two
+    segments at its ends and then only reorders and flips whole segments, so it costs O(sqrt(n)).
+    Offers the same interface as LocalSearch.ArrayTour.
+    """
+
+    def __init__(self, order):
+        self.n = len(order)
+        self.segment_of = [None] * self.n
+        self.index = [0] * self.n
+        self._build(list(order))
+
+    def _build(self, order):
+        size = max(8, math.isqrt(self.n))
+        self.segments = []
+        for rank, start in enumerate(range(0, self.n, size)):
+            self.segments.append(self._segment(order[start:start + size], rank))
+        # Splits add segments; once there are too many, the list is rebuilt with even segments
+        self.max_segments = 2 * len(self.segments) + 8
+
+    def _segment(self, nodes, rank):
+        segment = _Segment(nodes, rank)
+        for i, v in enumerate(nodes):
+            self.segment_of[v] = segment
+            self.index[v] = i
+        return segment
+
+    def _first(self, segment):
+        return segment.nodes[-1] if segment.reversed else segment.nodes[0]
+
+    def _last(self, segment):
+        return segment.nodes[0] if segment.reversed else segment.nodes[-1]
+
+    def succ(self, v):
+        segment, i = self.segment_of[v], self.index[v]
+        if segment.reversed:
+            if i > 0:
+                return segment.nodes[i - 1]
+        elif i + 1 < len(segment.nodes):
+            return segment.nodes[i + 1]
+        return self._first(self.segments[(segment.rank + 1) % len(self.segments)])
+
+    def pred(self, v):
+        segment, i = self.segment_of[v], self.index[v]
+        if not segment.reversed:
+            if i > 0:
+                return segment.nodes[i - 1]
+        elif i + 1 < len(segment.nodes):
+            return segment.nodes[i + 1]
+        return self._last(self.segments[segment.rank - 1])
+
+    def next(self, v, forward):
+        return self.succ(v) if forward else self.pred(v)
+
+    def _split_before(self, v):
+        """
+        Splits the segment of v so that v becomes the first node (in travel direction) of a segment.
+        """
+        segment, i = self.segment_of[v], self.index[v]
+        if self._first(segment) == v:
+            return
+        if segment.reversed:
+            before, after = segment.nodes[i + 1:], segment.nodes[:i + 1]
+        else:
+            before, after = segment.nodes[:i], segment.nodes[i:]
+        head, tail = self._segment(before, segment.rank), self._segment(after, segment.rank + 1)
+        head.reversed = tail.reversed = segment.reversed
+        self.segments[segment.rank:segment.rank + 1] = [head, tail]
+        for rank in range(segment.rank + 2, len(self.segments)):
+            self.segments[rank].rank = rank
+
+    def reverse(self, a, b):
+        """
+        Reverses the path that runs forward from node a to node b (or the rest of the cycle, if shorter).
+        """
+        if a == b:
+            return
+        self._split_before(a)
+        after_b = self.succ(b)
+        if after_b != a:
+            self._split_before(after_b)
+        count = len(self.segments)
+        first, last = self.segment_of[a].rank, self.segment_of[b].rank
+        length = (last - first) % count + 1
+        if length == count:
+            return  # The path is the whole cycle, reversing it leaves the tour unchanged
+        if 2 * length > count:
+            first, length = (last + 1) % count, count - length
+        ranks = [(first + offset) % count for offset in range(length)]
+        flipped = [self.segments[rank] for rank in reversed(ranks)]
+        for rank, segment in zip(ranks, flipped):
+            segment.rank = rank
+            segment.reversed = not segment.reversed
+            self.segments[rank] = segment
+        if len(self.segments) > self.max_segments:
+            self._build(self.tour())
+
+    def two_opt_move(self, x1, x2, y1, y2):
+        """
+        Replaces the tour edges (x1, x2) and (y1, y2) by (x1, y1) and (x2, y2), where x2 follows x1
+        and y2 follows y1 in the same direction of travel.
+        """
+        if self.succ(x1) != x2:
+            x1, x2, y1, y2 = y2, y1, x2, x1
+        self.reverse(x2, y1)
+
+    def tour(self, start=None):
+        """
+        Returns the tour as a list of matrix indices, rotated to begin at the given start node.
+        """
+        order = []
+        for segment in self.segments:
+            order.extend(reversed(segment.nodes) if segment.reversed else segment.nodes)
+        if start is None:
+            return order
+        i = order.index(start)
+        return order[i:] + order[:i]
+
+
+def make_tour(order):
+    """
+    Picks the tour representation by size: a plain array for small tours, a two-level list for large ones.
+    """
+    return TwoLevelTour(order) if len(order) >= TWO_LEVEL_THRESHOLD else ArrayTour(order)
+
+def _edge(u, v):
+    return (u, v) if u < v else (v, u)
+
+def _try_lk_move(D, tour, candidates, t1, max_depth=MAX_DEPTH):
+    """
+    Looks for an improving LK move that starts by removing one of the two tour edges at node t1.
+    Every step removes (t1, t2) and (t3, t4) and adds (t2, t3) and (t1, t4); (t1, t4) is the edge
+    that the next step removes again. Edges added in the chain are never removed and vice versa.
+
+    Returns:
+    - The nodes whose edges changed, or None if no improving move was found.
+    """
+    for first_forward in (True, False):
+        t2 = tour.next(t1, first_forward)
+        gain = D.item(t1, t2)
+        applied, added, removed = [], set(), {_edge(t1, t2)}
+        best_gain, best_length = 0, 0
+        for _ in range(max_depth):
+            forward = tour.succ(t1) == t2  # The direction in which t2 follows t1
+            after_t2 = tour.next(t2, forward)
+            best = None
+            for t3 in candidates[t2]:
+                joined = D.item(t2, t3)
+                if gain - joined <= 0:
+                    break  # The candidates are sorted, so the partial gain only gets worse
+                if t3 == t1 or t3 == after_t2:
+                    continue
+                t4 = tour.next(t3, not forward)
+                if _edge(t3, t4) in added or _edge(t2, t3) in removed:
+                    continue
+                value = D.item(t3, t4) - joined
+                if best is None or value > best[0]:
+                    best = (value, t3, t4)
+            if best is None:
+                break
+            _, t3, t4 = best
+            tour.two_opt_move(t2, t1, t3, t4)
+            applied.append((t1, t2, t3, t4))
+            added.add(_edge(t2, t3))
+            removed.add(_edge(t3, t4))
+            gain += best[0]
+            if gain - D.item(t4, t1) > best_gain:
+                best_gain, best_length = gain - D.item(t4, t1), len(applied)
+            t2 = t4
+        # Roll back the steps after the best closed tour of the chain
+        for a1, a2, a3, a4 in reversed(applied[best_length:]):
+            tour.two_opt_move(a1, a4, a2, a3)
+        if best_length:
+            return tuple({v for move in applied[:best_length] for v in move})
+    return None
+
+def _descend(D, candidates, tour, queue, deadline=None, max_depth=MAX_DEPTH, yield_interval=None):
+    """
+    Applies LK and Or-opt moves from the active nodes until none improves (don't-look bits).
+    A generator: yields the number of improving moves so far every yield_interval seconds, and returns it.
+    """
+    queued = [False] * tour.n
+    for v in queue:
+        queued[v] = True
+    improvements, checks = 0, 0
+    last_yield = time.time()
+    while queue:
+        checks += 1
+        if checks % 16 == 0:
+            now = time.time()
+            if deadline is not None and now > deadline:
+                break
+            if yield_interval is not None and now - last_yield >= yield_interval:
+                yield improvements
+                last_yield = time.time()
+        a = queue.popleft()
+        queued[a] = False
+        changed = _try_lk_move(D, tour, candidates, a, max_depth)
+        if changed is None:
+            changed = _try_or_opt(D, tour, candidates, a)
+        if changed is not None:
+            improvements += 1
+            for v in (a,) + tuple(changed):
+                if not queued[v]:
+                    queued[v] = True
+                    queue.append(v)
+    return improvements
+
+def double_bridge(order, rng, max_span=50):
+    """
+    Applies a double-bridge kick (A B C D -> A C B D) to a tour, with the three cut points close to
+    each other so the kick stays local and the following search only has to repair a small area.
+
+    Returns:
+    - The kicked tour and the nodes at the changed edges.
+    """
+    n = len(order)
+    rotation = rng.randrange(n)
+    order = order[rotation:] + order[:rotation]
+    span = min(n - 1, max_span)
+    first, second, third = sorted(rng.sample(range(1, span + 1), 3))
+    kicked = order[:first] + order[second:third] + order[first:second] + order[third:]
+    touched = {order[i] for i in (first - 1, first, second - 1, second, third - 1, third % n)}
+    return kicked, touched
+
+def improve(instance, tour, time_budget=None, k=DEFAULT_CANDIDATES, max_depth=MAX_DEPTH, seed=0, max_kicks=None, yield_interval=0.1,
+            observer=NULL_OBSERVER):
+    """
+    Anytime Lin-Kernighan improver: a generator that yields progressively better tours.
+
+    The tour is first improved to a local optimum; if a time budget is given, the remaining time is spent
+    on double-bridge kicks. The consumer can stop at any time by leaving the loop (or calling close()),
+    the last yielded tour is always a complete, valid tour.
+
+    Parameters:
+    - instance: A NetworkX graph or TspInstance.
+    - tour: The start tour as a list of node labels, open or closed.
+    - time_budget (optional): Seconds for the whole run. Without it, the generator stops at the first local optimum.
+    - k (optional): The length of the candidate neighbor lists.
+    - max_depth (optional): The deepest chain of 2-opt moves in one LK move.
+    - seed (optional): The seed of the kicks, runs with the same seed and budget are reproducible up to timing.
+    - max_kicks (optional): Stops after this many kicks.
+    - yield_interval (optional): Smallest number of seconds between two yields.
+    - observer (optional): A SolverObserver that gets the kicks, every new best tour and the time of the
+      first descent and of the kicks.
+
+    Yields:
+    - Dicts with the current best path (node labels, open, starting at the same node), its closed cost,
+      the elapsed seconds, the number of improving moves and kicks so far, and whether it is the final result.
+    """
+    instance = as_instance(instance)
+    start_time = time.time()
+    deadline = start_time + time_budget if time_budget is not None else None
+    order = instance.to_indices(tour)
+    if len(order) > 1 and order[0] == order[-1]:
+        order = order[:-1]
+    start = order[0] if order else None
+    D = instance.matrix
+    stats = {"improvements": 0, "kicks": 0}
+
+    def snapshot(best_order, final=False):
+        return {
+            "path": instance.to_labels(best_order),
+            "cost": instance.path_weight(best_order, closed=True),
+            "elapsed": time.time() - start_time,
+            "improvements": stats["improvements"],
+            "kicks": stats["kicks"],
+            "final": final,
+        }
+
+    observer.start("lin_kernighan", dimension=instance.dimension, k=k, max_depth=max_depth, time_budget=time_budget, seed=seed)
+    if len(order) < 8:
+        observer.finish(cost=instance.path_weight(order, closed=True), improvements=0, kicks=0)
+        yield snapshot(order, final=True)
+        return
+    with observer.section("candidates"):
+        candidates = instance.candidate_lists(k).tolist()
+
+    current = make_tour(order)
+    search = _descend(D, candidates, current, deque(current.tour()), deadline, max_depth, yield_interval)
+    while True:
+        try:
+            stats["improvements"] = next(search)
+        except StopIteration as result:
+            stats["improvements"] = result.value
+            break
+        yield snapshot(current.tour(start))
+    best_order = current.tour(start)
+    best_cost = instance.path_weight(best_order, closed=True)
+    observer.count("moves", stats["improvements"])
+    observer.improvement(best_cost, source="descent")
+    yield snapshot(best_order)
+
+    rng = random.Random(seed)
+    last_yield = time.time()
+    while deadline is not None and time.time() < deadline and (max_kicks is None or stats["kicks"] < max_kicks):
+        with observer.section("kick", sampled=True):
+            kicked, touched = double_bridge(best_order, rng)
+            current = make_tour(kicked)
+            stats["kicks"] += 1
+            for _ in _descend(D, candidates, current, deque(touched), deadline, max_depth):
+                pass
+            kicked = current.tour(start)
+            cost = instance.path_weight(kicked, closed=True)
+        observer.count("kicks")
+        if cost < best_cost:
+            best_order, best_cost = kicked, cost
+            stats["improvements"] += 1
+            observer.improvement(best_cost, kick=stats["kicks"])
+            if time.time() - last_yield >= yield_interval:
+                yield snapshot(best_order)
+                last_yield = time.time()
+    observer.finish(cost=best_cost, improvements=stats["improvements"], kicks=stats["kicks"])
+    yield snapshot(best_order, final=True)
+
+def lin_kernighan(G, path, time_budget=None, k=DEFAULT_CANDIDATES, seed=0, observer=NULL_OBSERVER) -> dict:
+    """
+    Runs improve() to the end and returns its final result.
+    """
+    result = None
+    for result in improve(G, path, time_budget=time_budget, k=k, seed=seed, observer=observer):
+        pass
+    return result
+
+def nearest_neighbor_lin_kernighan(G, time_budget=None, k=DEFAULT_CANDIDATES):
+    """
+    Multi-start nearest neighbor followed by Lin-Kernighan, with the same return contract as all_nearest_neighbor.
+
+    Returns:
+    - A tuple with the start node, the improved path and the weight of the (open) path.
+    """
+    instance = as_instance(G)
+    start_node, path, _ = all_nearest_neighbor(instance, k)
+    path = lin_kernighan(instance, path, time_budget, k)["path"]
+    return start_node, path, instance.path_weight(instance.to_indices(path))
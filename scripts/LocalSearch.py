@@ -0,0 +1,254 @@
+import time
+from collections import deque
+import numpy as np
+from TspInstance import as_instance
+from NearestNeighbor import all_nearest_neighbor, DEFAULT_CANDIDATES
+from SolverObserver import NULL_OBSERVER
+
+# Local search that improves a complete tour with 2-opt and Or-opt moves.
+# The tour is an array of matrix indices plus the inverse array (the position of every node), so the
+# successor and predecessor of a node are O(1) lookups and a move is a handful of segment reversals.
+# Only the k nearest neighbors of a node are considered as new partners, and don't-look bits (a queue of
+# active nodes) skip nodes whose surroundings did not change since their last unsuccessful search.
+
+MOVES = ("2opt", "oropt")
+
+# Longest segment that Or-opt moves to another place in the tour
+MAX_SEGMENT_LENGTH = 3
+
+
+class ArrayTour:
+    """
+    A tour as an array of matrix indices with the position of every node. Reversals always flip the
+    shorter side of the cycle, so the orientation of the stored array can change after any move.
+    """
+
+    def __init__(self, order):
+        self.order = np.array(order, dtype=np.intp)
+        self.n = len(self.order)
+        self.pos = np.empty(self.n, dtype=np.intp)
+        self.pos[self.order] = np.arange(self.n)
+
+    def succ(self, v):
+        return self.order.item((self.pos.item(v) + 1) % self.n)
+
+    def pred(self, v):
+        return self.order.item(self.pos.item(v) - 1)
+
+    def next(self, v, forward):
+        return self.succ(v) if forward else self.pred(v)
+
+    def reverse(self, a, b):
+        """
+        Reverses the path that runs forward from node a to node b (or the rest of the cycle, if shorter).
+        """
+        i, j = self.pos.item(a), self.pos.item(b)
+        length = (j - i) % self.n + 1
+        if 2 * length > self.n:
+            i, j, length = (j + 1) % self.n, (i - 1) % self.n, self.n - length
+        if length < 2:
+            return
+        if i <= j:
+            self.order[i:j + 1] = self.order[i:j + 1][::-1]
+            self.pos[self.order[i:j + 1]] = np.arange(i, j + 1)
+        else:
+            positions = (i + np.arange(length)) % self.n
+            self.order[positions] = self.order[positions[::-1]]
+            self.pos[self.order[positions]] = positions
+
+    def two_opt_move(self, x1, x2, y1, y2):
+        """
+        Replaces the tour edges (x1, x2) and (y1, y2) by (x1, y1) and (x2, y2), where x2 follows x1
+        and y2 follows y1 in the same direction of travel (either direction of the stored array).
+        """
+        if self.succ(x1) != x2:
+            x1, x2, y1, y2 = y2, y1, x2, x1
+        self.reverse(x2, y1)
+
+    def tour(self, start=None):
+        """
+        Returns the tour as a list of matrix indices, rotated to begin at the given start node.
+        """
+        order = self.order.tolist()
+        if start is None:
+            return order
+        i = order.index(start)
+        return order[i:] + order[:i]
+
+
+def _try_two_opt(D, tour, candidates, a):
+    """
+    Looks for an improving 2-opt move that gives node a one of its candidate neighbors as new partner.
+
+    Returns:
+    - The four nodes whose edges changed, or None if no improving move was found.
+    """
+    for forward in (True, False):
+        b = tour.next(a, forward)
+        removed = D.item(a, b)
+        for c in candidates[a]:
+            added = D.item(a, c)
+            if added >= removed:
+                break  # The candidates are sorted, so no later one can make the first exchange profitable
+            d = tour.next(c, forward)
+            if c == b or d == a:
+                continue
+            if added + D.item(b, d) < removed + D.item(c, d):
+                # Edges (a, b), (c, d) become (a, c), (b, d)
+                tour.two_opt_move(a, b, c, d) if forward else tour.two_opt_move(b, a, d, c)
+                return a, b, c, d
+    return None
+
+def _try_or_opt(D, tour, candidates, a):
+    """
+    Looks for an improving move of a segment of up to MAX_SEGMENT_LENGTH nodes starting at node a
+    to a place next to a candidate neighbor of its first or last node, in either orientation.
+
+    Returns:
+    - The nodes whose edges changed, or None if no improving move was found.
+    """
+    n = tour.n
+    for forward in (True, False):
+        segment = [a]
+        for _ in range(MAX_SEGMENT_LENGTH):
+            if len(segment) > n - 3:
+                break
+            s, e = segment[0], segment[-1]
+            p, q = tour.next(s, not forward), tour.next(e, forward)
+            removal_gain = D.item(p, s) + D.item(e, q) - D.item(p, q)
+            for end in (s, e):
+                for c in candidates[end]:
+                    if D.item(end, c) >= removal_gain:
+                        break
+                    if c in segment:
+                        continue
+                    # Insert between c and its neighbor on either side, with `end` next to c
+                    for x in (c, tour.next(c, not forward)):
+                        y = tour.next(x, forward)
+                        if x in segment or x == p or y == p:
+                            continue
+                        # Reversed: x e..s y, forward: x s..e y
+                        reverse = (end == s) != (x == c)
+                        added = D.item(x, e) + D.item(s, y) if reverse else D.item(x, s) + D.item(e, y)
+                        if added - D.item(x, y) < removal_gain:
+                            _or_opt_move(tour, forward, p, s, e, q, x, y, reverse)
+                            return p, s, e, q, x, y
+            segment.append(tour.next(e, forward))
+    return None
+
+def _or_opt_move(tour, forward, p, s, e, q, x, y, reverse):
+    """
+    Moves the segment s..e (between p and q) between x and y as a sequence of 2-opt moves.
+    All node pairs are given in the direction of travel used by the search.
+    """
+    def move(x1, x2, y1, y2):
+        tour.two_opt_move(x1, x2, y1, y2) if forward else tour.two_opt_move(x2, x1, y2, y1)
+
+    move(p, s, x, y)  # p x .. q e..s y
+    move(p, x, q, e)  # p q .. x e..s y
+    if not reverse:
+        move(x, e, s, y)  # p q .. x s..e y
+
+def local_search_indices(D, candidates, order, moves=MOVES, deadline=None, active=None):
+    """
+    Improves a tour given as matrix indices until no move from the candidate lists improves it.
+
+    Parameters:
+    - D: The distance matrix.
+    - candidates: The candidate neighbor lists as nested Python lists, sorted by distance.
+    - order: The tour as a sequence of matrix indices.
+    - moves (optional): The move types to use, "2opt" and/or "oropt".
+    - deadline (optional): A time.time() value after which the search stops.
+    - active (optional): The nodes to search from first; all other don't-look bits start set.
+
+    Returns:
+    - The ArrayTour and the number of improving moves applied.
+    """
+    tour = ArrayTour(order)
+    queue = deque(tour.order.tolist() if active is None else active)
+    queued = np.zeros(tour.n, dtype=bool)
+    queued[list(queue)] = True
+    improvements = 0
+    while queue:
+        if deadline is not None and improvements % 64 == 0 and time.time() > deadline:
+            break
+        a = queue.popleft()
+        queued[a] = False
+        changed = None
+        if "2opt" in moves:
+            changed = _try_two_opt(D, tour, candidates, a)
+        if changed is None and "oropt" in moves:
+            changed = _try_or_opt(D, tour, candidates, a)
+        if changed is not None:
+            improvements += 1
+            for v in (a,) + changed:
+                if not queued[v]:
+                    queued[v] = True
+                    queue.append(v)
+    return tour, improvements
+
+def local_search(G, path, k=DEFAULT_CANDIDATES, moves=MOVES, time_limit=None, observer=NULL_OBSERVER) -> dict:
+    """
+    Improves a tour from any solver with 2-opt and Or-opt moves.
+
+    Parameters:
+    - G: A NetworkX graph or TspInstance.
+    - path: The tour as a list of node labels, open or closed (first node repeated at the end).
+    - k (optional): The length of the candidate neighbor lists.
+    - moves (optional): The move types to use, "2opt" and/or "oropt".
+    - time_limit (optional): Seconds after which the search stops and returns the current tour.
+    - observer (optional): A SolverObserver that gets the number of improving moves, the start and final
+      cost and the time of the candidate lists and the search.
+
+    Returns:
+    - A dict with the improved path (node labels, open, starting at the same node), its closed cost,
+      the number of improving moves and the runtime.
+    """
+    instance = as_instance(G)
+    start_time = time.time()
+    order = instance.to_indices(path)
+    if len(order) > 1 and order[0] == order[-1]:
+        order = order[:-1]
+    unknown = set(moves) - set(MOVES)
+    if unknown:
+        raise ValueError(f"Unknown moves: {sorted(unknown)}, choose from {MOVES}")
+    deadline = start_time + time_limit if time_limit is not None else None
+    improvements = 0
+    observer.start("local_search", dimension=instance.dimension, k=k, moves=list(moves))
+    if observer.enabled:
+        observer.improvement(instance.path_weight(order, closed=True), source="start")
+    if len(order) >= 5:
+        with observer.section("candidates"):
+            candidates = instance.candidate_lists(k).tolist()
+        with observer.section("search"):
+            tour, improvements = local_search_indices(instance.matrix, candidates, order, moves, deadline)
+        order = tour.tour(start=order[0])
+    cost = instance.path_weight(order, closed=True)
+    observer.count("moves", improvements)
+    if improvements:
+        observer.improvement(cost)
+    observer.finish(cost=cost, improvements=improvements)
+    return {
+        "path": instance.to_labels(order),
+        "cost": cost,
+        "improvements": improvements,
+        "time": time.time() - start_time,
+    }
+
+def two_opt(G, path, k=DEFAULT_CANDIDATES):
+    return local_search(G, path, k, moves=("2opt",))["path"]
+
+def or_opt(G, path, k=DEFAULT_CANDIDATES):
+    return local_search(G, path, k, moves=("oropt",))["path"]
+
+def nearest_neighbor_local_search(G, k=DEFAULT_CANDIDATES):
+    """
+    Multi-start nearest neighbor followed by 2-opt + Or-opt, with the same return contract as all_nearest_neighbor.
+
+    Returns:
+    - A tuple with the start node, the improved path and the weight of the (open) path.
+    """
+    instance = as_instance(G)
+    start_node, path, _ = all_nearest_neighbor(instance, k)
+    path = local_search(instance, path, k)["path"]
+    return start_node, path, instance.path_weight(instance.to_indices(path))
@@ -0,0 +1,185 @@
+import math
+import numpy as np
+
+# Lower bounds for the branch-and-bound search. A search node is a path that starts at `start` and ends at
+# `last`; a bound estimates the cheapest way to visit the remaining nodes and return to the start.
+# Every bound works on the dense distance matrix and offers the same two calls: `root` for the first node
+# of the search, and `child` to derive a child's bound from its parent's bound state.
+
+def prim_mst(sub, return_parents=False):
+    """
+    Prim's algorithm on a dense (k, k) weight matrix, O(k^2) with one vector update per added node.
+    Only reads whole rows, so it also runs on a lazily computed matrix.
+
+    Returns:
+    - The weight of the minimum spanning tree and the degree of every node in it, plus the parent of every
+      node in the tree (node 0 is the root) if return_parents is set.
+    """
+    size = len(sub)
+    degrees = np.zeros(size, dtype=np.int64)
+    if size <= 1:
+        return (0.0, degrees, np.zeros(size, dtype=np.intp)) if return_parents else (0.0, degrees)
+    in_tree = np.zeros(size, dtype=bool)
+    in_tree[0] = True
+    closest = sub[0].astype(np.float64)
+    closest[0] = np.inf
+    parent = np.zeros(size, dtype=np.intp)
+    weight = 0.0
+    for _ in range(size - 1):
+        candidate = int(np.argmin(closest))
+        weight += closest[candidate]
+        degrees[candidate] += 1
+        degrees[parent[candidate]] += 1
+        in_tree[candidate] = True
+        closest[candidate] = np.inf
+        row = sub[candidate]
+        better = (row < closest) & ~in_tree
+        closest[better] = row[better]
+        parent[better] = candidate
+    return (weight, degrees, parent) if return_parents else (weight, degrees)
+
+def minimum_spanning_tree_weight(D, nodes):
+    """
+    Weight of the minimum spanning tree of the distance matrix restricted to the given node indices.
+    """
+    nodes = np.asarray(nodes, dtype=np.intp)
+    return prim_mst(D[np.ix_(nodes, nodes)])[0]
+
+def calculate_lower_bound(D, path, unvisited):
+    if not unvisited:
+        return 0  # Return 0 if there are no unvisited nodes to avoid min() error
+
+    unvisited = list(unvisited)
+    mst_weight = minimum_spanning_tree_weight(D, unvisited)
+    min_edge_to_unvisited = D[path[-1], unvisited].min().item()
+    min_edge_from_start = D[path[0], unvisited].min().item()
+    return mst_weight + min_edge_to_unvisited + min_edge_from_start
+
+class MstBound:
+    """
+    The classic bound: a minimum spanning tree over the unvisited nodes, plus the cheapest edges that
+    connect it to both ends of the path. Results are cached per (last node, unvisited set).
+    """
+    name = "mst"
+
+    def __init__(self, D, cache_size=50000):
+        self.D = np.asarray(D)
+        self.integral = np.issubdtype(self.D.dtype, np.integer)
+        self.cache_size = cache_size
+        self.cache = {}
+        self.hits = 0
+
+    def _cached(self, path, unvisited):
+        key = (path[-1], frozenset(unvisited))
+        value = self.cache.get(key)
+        if value is not None:
+            self.hits += 1
+        return key, value
+
+    def _store(self, key, value):
+        if len(self.cache) >= self.cache_size:
+            del self.cache[next(iter(self.cache))]  # Evict the oldest entry
+        self.cache[key] = value
+
+    def _round(self, value):
+        # With integral weights every tour costs an integer, so the bound can be rounded up
+        return math.ceil(value - 1e-6) if self.integral else value
+
+    def root(self, start, unvisited):
+        return self.child([start], unvisited, None)
+
+    def child(self, path, unvisited, parent_state, upper_bound=float('inf')):
+        """
+        Parameters:
+        - path: The path of the search node, as matrix indices.
+        - unvisited: The set of nodes that are not on the path.
+        - parent_state: The bound state of the parent node (unused by this bound).
+        - upper_bound (optional): The remaining budget below which the node is interesting.
+
+        Returns:
+        - The lower bound on the remaining cost and the bound state to hand down to the children.
+        """
+        key, value = self._cached(path, unvisited)
+        if value is None:
+            value = self._round(calculate_lower_bound(self.D, path, unvisited))
+            self._store(key, value)
+        return value, None
+
+class OneTreeBound(MstBound):
+    """
+    The Held-Karp bound: a 1-tree style relaxation (spanning tree over the unvisited nodes plus the edges
+    to both path ends) whose node penalties are optimized by subgradient ascent. The penalties of a child
+    start from those of its parent, so a few iterations per node are enough to keep the bound tight.
+    """
+    name = "one_tree"
+
+    def __init__(self, D, root_iterations=100, child_iterations=5, cache_size=50000):
+        super().__init__(D, cache_size)
+        self.D = self.D.astype(np.float64)
+        self.root_iterations = root_iterations
+        self.child_iterations = child_iterations
+
+    def root(self, start, unvisited, upper_bound=float('inf')):
+        penalties = np.zeros(len(self.D), dtype=np.float64)
+        return self._optimize([start], unvisited, penalties, self.root_iterations, upper_bound)
+
+    def child(self, path, unvisited, parent_state, upper_bound=float('inf')):
+        key, value = self._cached(path, unvisited)
+        if value is not None:
+            return value
+        penalties = np.zeros(len(self.D), dtype=np.float64) if parent_state is None else parent_state
+        value = self._optimize(path, unvisited, penalties, self.child_iterations, upper_bound)
+        self._store(key, value)
+        return value
+
+    def _relaxation(self, nodes, start, last, penalties):
+        """
+        Solves the relaxation for the given penalties.
+
+        Returns:
+        - The penalized relaxation value and the degree of every unvisited node in it.
+        """
+        pi = penalties[nodes]
+        sub = self.D[np.ix_(nodes, nodes)] + pi[:, None] + pi[None, :]
+        weight, degrees = prim_mst(sub)
+        from_start = self.D[start, nodes] + pi
+        if start == last:
+            # Root of the search: the start needs two distinct edges into the tree
+            first, second = np.argpartition(from_start, 1)[:2] if len(nodes) > 1 else (0, 0)
+            weight += from_start[first] + from_start[second]
+        else:
+            to_last = self.D[last, nodes] + pi
+            first, second = int(np.argmin(from_start)), int(np.argmin(to_last))
+            weight += from_start[first] + to_last[second]
+        degrees[first] += 1
+        degrees[second] += 1
+        return weight - 2.0 * pi.sum(), degrees
+
+    def _optimize(self, path, unvisited, penalties, iterations, upper_bound):
+        if not unvisited:
+            return 0, penalties
+        nodes = np.fromiter(unvisited, dtype=np.intp, count=len(unvisited))
+        penalties = penalties.copy()
+        best = -np.inf
+        step_scale = 2.0
+        for _ in range(max(iterations, 1)):
+            value, degrees = self._relaxation(nodes, path[0], path[-1], penalties)
+            best = max(best, value)
+            subgradient = degrees - 2
+            norm = float(subgradient @ subgradient)
+            if norm == 0 or best >= upper_bound:
+                break  # The relaxation is a Hamiltonian path (the bound is exact) or the node can be pruned
+            target = upper_bound if upper_bound < float('inf') else 1.05 * value
+            penalties[nodes] += step_scale * (target - value) / norm * subgradient
+            step_scale *= 0.9
+        return self._round(best), penalties
+
+BOUNDS = {bound.name: bound for bound in (MstBound, OneTreeBound)}
+
+def make_bound(name, D, **options):
+    """
+    Creates a lower bound by name ("mst" or "one_tree").
+    """
+    if name not in BOUNDS:
+        raise ValueError(f"Unknown lower bound: {name}, choose from {sorted(BOUNDS)}")
+    return BOUNDS[name](D, **options)
@@ -1,38 +1,114 @@
-import networkx as nx
+import numpy as np
 import TsplibNwxUtils as util
+from concurrent.futures import ProcessPoolExecutor
+from TspInstance import as_instance
 
-def nearest_neighbor_fixed(G, start_node):
-    path = [start_node]
-    total_weight = 0
-    visited = set([start_node])
-
-    while len(visited) < len(G.nodes):
-        current_node = path[-1]
-        possible_edges = [(n, G[current_node][n]['weight']) for n in G.neighbors(current_node) if n not in visited]
-        if not possible_edges:
-            break  # No unvisited neighbors, exit loop
-        next_node, weight = min(possible_edges, key=lambda x: x[1])
-        path.append(next_node)
-        total_weight += weight
-        visited.add(next_node)
-
-    return path, total_weight
-  
-def all_nearest_neighbor(G):
-  best_path = []
-  best_weight = float('inf')
-  best_starting_node = None
-
-  for node in G.nodes():
-      path, weight = nearest_neighbor_fixed(G, node)
-      if weight < best_weight:
-          best_path = path
-          best_weight = weight
-          best_starting_node = node
-
-  return best_starting_node, best_path, best_weight
+# Number of nearest neighbors per node that are checked before falling back to a scan of the whole row
+DEFAULT_CANDIDATES = 10
+
+# Default number of start nodes of the multi-start nearest neighbor on coordinate instances, which are
+# meant for sizes where building a tour from every node (O(n^2) steps) is too slow
+COORDINATE_MAX_STARTS = 64
+
+def nearest_neighbor_tours(G, starts, k=DEFAULT_CANDIDATES):
+    """
+    Builds the nearest neighbor tours for many start nodes at once.
+
+    All tours advance in lockstep: every step looks up the k nearest neighbors of the current nodes and
+    takes the first one that is not visited yet. A neighbor is only trusted if it is strictly closer than
+    the farthest one in its list (so no node outside the list can be as close); otherwise, or if all
+    neighbors are visited, the instance finds the nearest unvisited node (a scan of the whole matrix row
+    with the visited nodes masked out). The result is the same tour as the plain row scan, including the
+    tie-breaking towards the lower index.
+
+    Parameters:
+    - G: A NetworkX graph or TspInstance.
+    - starts: The start nodes as matrix indices.
+    - k (optional): The length of the candidate lists.
+
+    Returns:
+    - An (len(starts), n) array with the tours as matrix indices and an array with their (open) weights.
+    """
+    instance = as_instance(G)
+    D = instance.matrix
+    n = instance.dimension
+    starts = np.asarray(starts, dtype=np.intp)
+    candidates = instance.candidate_lists(k)
+    candidate_weights = D[np.arange(n)[:, None], candidates] if candidates.shape[1] else np.empty((n, 0))
+    trusted = candidate_weights < candidate_weights[:, -1:] if candidates.shape[1] else np.empty((n, 0), dtype=bool)
+    accumulator = np.int64 if np.issubdtype(D.dtype, np.integer) else np.float64
+
+    paths = np.empty((len(starts), n), dtype=np.intp)
+    weights = np.zeros(len(starts), dtype=accumulator)
+    batch_size = max(1, (1 << 22) // max(n, 1))  # Starts per batch, bounds the visited masks
+    for batch_start in range(0, len(starts), batch_size):
+        current = starts[batch_start:batch_start + batch_size].copy()
+        rows = np.arange(len(current))
+        visited = np.zeros((len(current), n), dtype=bool)
+        visited[rows, current] = True
+        path = paths[batch_start:batch_start + len(current)]
+        path[:, 0] = current
+        for step in range(1, n):
+            options = candidates[current]
+            usable = trusted[current] & ~visited[rows[:, None], options]
+            found = usable.any(axis=1)
+            next_nodes = options[rows, usable.argmax(axis=1)] if options.shape[1] else np.empty(len(rows), dtype=np.intp)
+            fallback = np.flatnonzero(~found)
+            if len(fallback):
+                next_nodes[fallback] = instance.nearest_unvisited(current[fallback], visited[fallback])
+            weights[batch_start:batch_start + len(current)] += D[current, next_nodes]
+            visited[rows, next_nodes] = True
+            path[:, step] = next_nodes
+            current = next_nodes
+    return paths, weights
+
+def nearest_neighbor_fixed(G, start_node, k=DEFAULT_CANDIDATES):
+    instance = as_instance(G)
+    paths, weights = nearest_neighbor_tours(instance, [instance.index[start_node]], k)
+    return instance.to_labels(paths[0]), weights[0].item()
+
+def _nearest_neighbor_chunk(instance, starts, k):
+    paths, weights = nearest_neighbor_tours(instance, starts, k)
+    best = int(np.argmin(weights))
+    return starts[best], paths[best], weights[best].item()
+
+def all_nearest_neighbor(G, k=DEFAULT_CANDIDATES, max_starts=None, max_workers=None):
+  """
+  Multi-start nearest neighbor: builds the tour from every start node and keeps the shortest.
+
+  Parameters:
+  - G: A NetworkX graph or TspInstance.
+  - k (optional): The length of the candidate lists, shared by all start nodes.
+  - max_starts (optional): Limits the number of start nodes (evenly spread over the nodes), for large instances.
+    Defaults to all nodes, and to COORDINATE_MAX_STARTS on a CoordinateInstance.
+  - max_workers (optional): If greater than 1, the start nodes are split across that many processes.
+
+  Returns:
+  - A tuple with the best start node, its path (node labels) and the weight of the (open) path.
+  """
+  instance = as_instance(G)
+  if instance.dimension == 0:
+      return None, [], 0
+  starts = np.arange(instance.dimension)
+  if max_starts is None and getattr(instance, "coords", None) is not None:
+      max_starts = COORDINATE_MAX_STARTS
+  if max_starts is not None and max_starts < len(starts):
+      starts = np.unique(np.linspace(0, instance.dimension - 1, max_starts).astype(np.intp))
+
+  if max_workers is not None and max_workers > 1 and len(starts) > 1:
+      chunks = [chunk for chunk in np.array_split(starts, max_workers) if len(chunk)]
+      instance.candidate_lists(k)  # Computed once here and shipped to the workers with the instance
+      with ProcessPoolExecutor(max_workers=max_workers) as executor:
+          results = list(executor.map(_nearest_neighbor_chunk, [instance] * len(chunks), chunks, [k] * len(chunks)))
+  else:
+      results = [_nearest_neighbor_chunk(instance, starts, k)]
+
+  # Chunks are in start order, so the first minimum is the same one a sequential run keeps
+  best_start, best_path, best_weight = min(results, key=lambda result: result[2])
+  return instance.labels[best_start], instance.to_labels(best_path), best_weight
 
 if __name__ == "__main__":
+    import networkx as nx
    
     filename = "../networkx_tsp_files/ulysses16.edges"
     edges = util.parse_edges_file(filename)
@@ -0,0 +1,223 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+from InstanceGenerator import KINDS, generate_tsp_file, instance_name
+from CoordinateInstance import CoordinateInstance
+from TspInstance import TspInstance
+from TspFileParser import calculate_distance_matrix
+from NearestNeighbor import nearest_neighbor_tours, all_nearest_neighbor, DEFAULT_CANDIDATES
+from Construction import greedy_edge_indices
+from LocalSearch import local_search_indices
+
+# Scalability sweep over synthetic instances: for every n, the pipeline runs stage by stage (parse,
+# dense distance matrix, candidate lists, construction, improvement) and every stage is timed on its own
+# and then run once more under tracemalloc for its peak memory (tracemalloc slows pure Python code down,
+# so the two are separate runs). A stage that took longer than the stage budget is not run for larger n.
+# Fitting log(time) and log(memory) against log(n) gives the empirical complexity exponent of every
+# stage, which exposes accidental O(n^2) or O(n^3) paths.
+
+DEFAULT_SIZES = (10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000)
+
+# Seconds a stage may take before it is skipped for the larger sizes
+DEFAULT_STAGE_BUDGET = 60.0
+
+# Runs shorter than this are dominated by overhead and clock resolution and are left out of the fits
+MIN_FIT_TIME = 1e-3
+
+
+def _parse(context):
+    context["instance"] = CoordinateInstance.from_tsp_file(context["filename"])
+
+def _matrix(context):
+    instance = context["instance"]
+    context["dense"] = TspInstance(calculate_distance_matrix(instance.coords, instance.edge_weight_type), instance.labels)
+
+def _candidates(context):
+    context["candidates"] = context["instance"].candidate_lists(DEFAULT_CANDIDATES)
+
+def _reset_candidates(context):
+    context["instance"].clear_cache()
+
+def _nearest_neighbor(context):
+    nearest_neighbor_tours(context["instance"], [0], DEFAULT_CANDIDATES)
+
+def _all_nearest_neighbor(context):
+    all_nearest_neighbor(context["dense"], DEFAULT_CANDIDATES)
+
+def _greedy_edge(context):
+    context["tour"] = greedy_edge_indices(context["instance"], DEFAULT_CANDIDATES)
+
+def _local_search(context):
+    local_search_indices(context["instance"].matrix, context["candidates"].tolist(), context["tour"])
+
+# (name, stage, reset to run before a repeated run, largest n, stages whose results it uses)
+STAGES = (
+    ("parse", _parse, None, None, ()),
+    ("distance_matrix", _matrix, None, 5000, ("parse",)),
+    ("candidate_lists", _candidates, _reset_candidates, None, ("parse",)),
+    ("nearest_neighbor", _nearest_neighbor, None, None, ("parse", "candidate_lists")),
+    ("all_nearest_neighbor", _all_nearest_neighbor, None, 2000, ("parse", "distance_matrix")),
+    ("greedy_edge", _greedy_edge, None, None, ("parse", "candidate_lists")),
+    ("local_search", _local_search, None, None, ("parse", "candidate_lists", "greedy_edge")),
+)
+
+
+def run_stage(stage, reset, context, measure_memory=True) -> dict:
+    """
+    Runs one stage timed and, if requested, once more under tracemalloc.
+
+    Returns:
+    - A dict with the wall time in seconds and the peak traced memory in bytes (None if not measured).
+    """
+    if reset is not None:
+        reset(context)
+    start = time.perf_counter()
+    stage(context)
+    seconds = time.perf_counter() - start
+    peak = None
+    if measure_memory:
+        if reset is not None:
+            reset(context)
+        tracemalloc.start()
+        try:
+            stage(context)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"time": seconds, "peak_memory": peak}
+
+def fit_exponent(sizes, values, min_value=None):
+    """
+    Fits values ~ c * n^exponent by least squares in log-log space.
+
+    Returns:
+    - The exponent, or None if fewer than three usable points are left.
+    """
+    points = [(n, v) for n, v in zip(sizes, values) if v is not None and v > 0 and (min_value is None or v >= min_value)]
+    if len(points) < 3:
+        return None
+    slope, _ = np.polyfit(np.log([n for n, _ in points]), np.log([v for _, v in points]), 1)
+    return float(slope)
+
+def run_sweep(kind="uniform", sizes=DEFAULT_SIZES, seed=0, stage_budget=DEFAULT_STAGE_BUDGET, measure_memory=True,
+              instance_folder="../generated_tsp_files", stages=None) -> dict:
+    """
+    Runs all stages for every size on generated instances of one kind.
+
+    Parameters:
+    - kind (optional): The kind of generated instances.
+    - sizes (optional): The numbers of nodes, ascending.
+    - seed (optional): The seed of the generated instances.
+    - stage_budget (optional): Seconds after which a stage is skipped for all larger sizes.
+    - measure_memory (optional): Also measures the peak memory of every stage (a second run under tracemalloc).
+    - instance_folder (optional): Where the generated .tsp files are written (and reused).
+    - stages (optional): The names of the stages to report, defaults to all.
+
+    Returns:
+    - A dict with the measurements per stage and size and the fitted exponents per stage.
+    """
+    results = {name: {"sizes": [], "time": [], "peak_memory": []} for name, _, _, _, _ in STAGES}
+    dependencies = {name: set(requires) for name, _, _, _, requires in STAGES}
+    exhausted = set()
+    for n in sorted(sizes):
+        filename = os.path.join(instance_folder, instance_name(kind, n, seed) + ".tsp")
+        if not os.path.exists(filename):
+            generate_tsp_file(kind, n, seed, instance_folder)
+        reported = {name for name, _, _, max_n, _ in STAGES
+                    if name not in exhausted and (max_n is None or n <= max_n) and (stages is None or name in stages)}
+        if not reported:
+            break
+        # Stages that are not reported still run (untimed) when a reported stage needs their results
+        required = set(reported).union(*(dependencies[name] for name in reported))
+        context = {"filename": filename}
+        for name, stage, reset, _, _ in STAGES:
+            if name not in required:
+                continue
+            if name not in reported:
+                stage(context)
+                continue
+            measurement = run_stage(stage, reset, context, measure_memory)
+            results[name]["sizes"].append(n)
+            results[name]["time"].append(measurement["time"])
+            results[name]["peak_memory"].append(measurement["peak_memory"])
+            memory = f", peak {measurement['peak_memory'] / 1e6:.1f} MB" if measurement["peak_memory"] is not None else ""
+            print(f"n={n:<7} {name:<22} {measurement['time']:10.4f}s{memory}")
+            if measurement["time"] > stage_budget:
+                exhausted.add(name)
+    for name in results:
+        stage = results[name]
+        stage["time_exponent"] = fit_exponent(stage["sizes"], stage["time"], MIN_FIT_TIME)
+        stage["memory_exponent"] = fit_exponent(stage["sizes"], stage["peak_memory"])
+    return {"kind": kind, "seed": seed, "stage_budget": stage_budget, "stages": results}
+
+def plot_sweep(sweep, filename) -> None:
+    """
+    Plots runtime and peak memory against n (log-log) for every stage and saves the figure.
+    """
+    import matplotlib.pyplot as plt
+    figure, (time_axis, memory_axis) = plt.subplots(1, 2, figsize=(14, 6))
+    for name, stage in sweep["stages"].items():
+        if not stage["sizes"]:
+            continue
+        exponent = stage["time_exponent"]
+        time_axis.plot(stage["sizes"], stage["time"], marker="o", label=f"{name} (n^{exponent:.2f})" if exponent is not None else name)
+        memory = [(n, m) for n, m in zip(stage["sizes"], stage["peak_memory"]) if m]
+        if memory:
+            exponent = stage["memory_exponent"]
+            memory_axis.plot(*zip(*memory), marker="o", label=f"{name} (n^{exponent:.2f})" if exponent is not None else name)
+    for axis, label in ((time_axis, "Runtime [s]"), (memory_axis, "Peak memory [bytes]")):
+        axis.set_xscale("log")
+        axis.set_yscale("log")
+        axis.set_xlabel("n")
+        axis.set_ylabel(label)
+        axis.grid(True, which="both", alpha=0.3)
+        if axis.get_legend_handles_labels()[0]:
+            axis.legend(fontsize="small")
+    figure.suptitle(f"Scalability on {sweep['kind']} instances (seed {sweep['seed']})")
+    figure.tight_layout()
+    figure.savefig(filename)
+    plt.close(figure)
+
+def main(argv=None):
+    """
+    Runs the scalability sweep from the command line, e.g.
+    python ScalabilityBenchmark.py --kind clustered --sizes 100 1000 10000 --max-exponent 2.5
+    """
+    parser = argparse.ArgumentParser(description="Measure how runtime and memory of every stage grow with n.")
+    parser.add_argument("--kind", choices=KINDS, default="uniform", help="Kind of generated instances")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="Numbers of nodes")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated instances")
+    parser.add_argument("--stages", nargs="+", choices=[name for name, *_ in STAGES], default=None, help="Stages to report")
+    parser.add_argument("--stage-budget", type=float, default=DEFAULT_STAGE_BUDGET, help="Seconds after which a stage stops growing")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory runs")
+    parser.add_argument("--instances", default="../generated_tsp_files", help="Folder for the generated .tsp files")
+    parser.add_argument("--output", default="./benchmark_results", help="Folder for the JSON results and the plot")
+    parser.add_argument("--max-exponent", type=float, default=None, help="Exit with 1 if a stage's time exponent is larger")
+    args = parser.parse_args(argv)
+
+    sweep = run_sweep(args.kind, args.sizes, args.seed, args.stage_budget, not args.no_memory, args.instances, args.stages)
+    os.makedirs(args.output, exist_ok=True)
+    base = os.path.join(args.output, f"scalability_{args.kind}" + datetime.datetime.now().strftime("_%Y-%m-%d_%H-%M-%S"))
+    with open(base + ".json", "w") as f:
+        json.dump(sweep, f, indent=2)
+    plot_sweep(sweep, base + ".png")
+    print(f"Results exported to {base}.json and {base}.png")
+
+    too_steep = []
+    for name, stage in sweep["stages"].items():
+        if stage["sizes"]:
+            exponents = [f"{label} n^{value:.2f}" for label, value in (("time", stage["time_exponent"]), ("memory", stage["memory_exponent"])) if value is not None]
+            print(f"{name:<22} {', '.join(exponents) or 'too few points to fit'}")
+            if args.max_exponent is not None and stage["time_exponent"] is not None and stage["time_exponent"] > args.max_exponent:
+                too_steep.append(name)
+    if too_steep:
+        print(f"Time exponent above {args.max_exponent}: {', '.join(too_steep)}")
+    return 1 if too_steep else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from Timing import percentile
+from SolveServer import DEFAULT_PORT
+
+# Client and load generator for SolveServer.py. Every virtual user keeps one keep-alive connection and
+# sends its next request as soon as the previous one is answered (closed loop), so the concurrency is
+# the number of requests in flight. The requests cycle through the instance and solver mix in a seeded
+# random order. The report gives the throughput and the latency percentiles seen by the client, next to
+# the solve time, queue time and cache hit rate the server reported for the same requests.
+
+
+class SolveConnection:
+    """
+    One keep-alive HTTP connection to the solve server.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None):
+        self.host, self.port, self.unix_socket = host, port, unix_socket
+        self.reader = self.writer = None
+
+    async def connect(self):
+        if self.unix_socket is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unix_socket)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, body=None) -> tuple:
+        """
+        Sends one request, reconnecting if the server closed the connection.
+
+        Returns:
+        - The HTTP status and the parsed JSON response.
+        """
+        if self.writer is None or self.writer.is_closing():
+            await self.connect()
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n")
+        self.writer.write(head.encode("latin-1") + payload)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        response = json.loads(await self.reader.readexactly(int(headers.get("content-length") or 0)) or b"{}")
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, response
+
+    async def solve(self, instance, solver="nearest_neighbor", time_budget=None, seed=None) -> tuple:
+        return await self.request("POST", "/solve", {"instance": instance, "solver": solver, "time_budget": time_budget, "seed": seed})
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.writer = None
+
+def latency_summary(latencies) -> dict:
+    """
+    Returns the count, mean and the p50, p90, p95, p99 and maximum of latencies in seconds.
+    """
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"count": 0}
+    return {"count": len(ordered), "mean": sum(ordered) / len(ordered), "p50": percentile(ordered, 50), "p90": percentile(ordered, 90),
+            "p95": percentile(ordered, 95), "p99": percentile(ordered, 99), "max": ordered[-1]}
+
+async def run_load(mix, total=None, duration=None, concurrency=4, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None,
+                   time_budget=None, seed=0) -> dict:
+    """
+    Sends solve requests with a fixed number of requests in flight.
+
+    Parameters:
+    - mix: A list of (instance, solver) pairs the requests are drawn from.
+    - total (optional): The number of requests to send.
+    - duration (optional): Seconds after which no new request is sent (one of total and duration is needed).
+    - concurrency (optional): The number of virtual users, each with one request in flight.
+    - host, port, unix_socket (optional): The address of the server.
+    - time_budget (optional): The time budget of every solve.
+    - seed (optional): The seed of the request order.
+
+    Returns:
+    - A dict with the throughput, the client latencies, the server timings and the status counts.
+    """
+    if total is None and duration is None:
+        raise ValueError("Either total or duration is needed")
+    rng = random.Random(seed)
+    latencies, solve_times, queue_times, statuses, hits = [], [], [], {}, 0
+    sent = 0
+    start = time.perf_counter()
+
+    def next_request():
+        nonlocal sent
+        if (total is not None and sent >= total) or (duration is not None and time.perf_counter() - start >= duration):
+            return None
+        sent += 1
+        return rng.choice(mix)
+
+    async def user():
+        nonlocal hits
+        connection = SolveConnection(host, port, unix_socket)
+        try:
+            while (request := next_request()) is not None:
+                instance, solver = request
+                request_start = time.perf_counter()
+                try:
+                    status, response = await connection.solve(instance, solver, time_budget)
+                except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    status, response = 0, {}
+                    await connection.close()
+                latencies.append(time.perf_counter() - request_start)
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    solve_times.append(response["timings"]["solve"])
+                    queue_times.append(response["timings"]["queue"])
+                    hits += response["cache_hit"]
+        finally:
+            await connection.close()
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "statuses": statuses,
+        "latency": latency_summary(latencies),
+        "server_solve": latency_summary(solve_times),
+        "server_queue": latency_summary(queue_times),
+        "cache_hit_rate": hits / len(solve_times) if solve_times else None,
+    }
+
+def print_report(report) -> None:
+    print(f"{report['requests']} requests in {report['seconds']:.2f}s: {report['throughput']:.1f} requests/s, "
+          f"statuses {report['statuses']}, cache hit rate " + (f"{report['cache_hit_rate']:.1%}" if report["cache_hit_rate"] is not None else "-"))
+    for name in ("latency", "server_solve", "server_queue"):
+        summary = report[name]
+        if summary["count"]:
+            print(f"{name:<13} mean {summary['mean'] * 1e3:8.2f} ms  " + "  ".join(f"{key} {summary[key] * 1e3:8.2f} ms" for key in ("p50", "p90", "p95", "p99", "max")))
+
+def main(argv=None):
+    """
+    Runs a load test against a running solve server, e.g.
+    python SolveClient.py --instances ulysses16 berlin52 --solvers nearest_neighbor greedy_edge --requests 1000 --concurrency 8
+    """
+    parser = argparse.ArgumentParser(description="Send solve requests to SolveServer.py and report throughput and latency.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address of the server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port of the server")
+    parser.add_argument("--unix", default=None, help="Unix socket of the server instead of a port")
+    parser.add_argument("--instances", nargs="+", required=True, help="Instance names of the request mix")
+    parser.add_argument("--solvers", nargs="+", default=["nearest_neighbor"], help="Solver names of the request mix")
+    parser.add_argument("--requests", type=int, default=None, help="Number of requests to send")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to send requests for")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight")
+    parser.add_argument("--time-budget", type=float, default=None, help="Time budget of every solve")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the request order")
+    parser.add_argument("--output", default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+
+    mix = [(instance, solver) for instance in args.instances for solver in args.solvers]
+    report = asyncio.run(run_load(mix, args.requests, args.duration, args.concurrency, args.host, args.port, args.unix,
+                                  args.time_budget, args.seed))
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if set(report["statuses"]) <= {200} else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
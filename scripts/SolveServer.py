@@ -0,0 +1,459 @@
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import weakref
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from BenchmarkRunner import SOLVERS, INSTANCE_SUFFIXES, resolve_solver, extract_path, load_solver_instance, solver_kwargs
+from NearestNeighbor import DEFAULT_CANDIDATES
+from TourEvaluation import check_tour, open_tour
+from Timing import summarize, percentile
+
+# Long-running local solve service. An asyncio front end speaks a minimal HTTP/1.1 with JSON bodies
+# (keep-alive, on localhost or a Unix socket) and hands every solve to a worker process:
+#   POST /solve  {"instance": "ulysses16", "solver": "lin_kernighan", "time_budget": 1.0, "seed": 0}
+#   GET  /stats  request counts, latency percentiles and the cache of every worker (as of its last reply)
+#   GET  /health
+# Every worker is a single-process pool with its own LRU cache of loaded instances (the distance matrix,
+# memory-mapped from the binary cache when there is one, plus the candidate lists computed on load). A
+# request goes to the least busy worker; among equally busy ones a worker that already served the
+# instance is preferred, then its home worker (a hash of the instance name). So a lone request finds its
+# instance cached, while a hot instance spreads over every idle worker, each of which loads it into its
+# own cache once, instead of queueing behind one process. The cache memory cap is split evenly
+# between the workers; after every solve the size of the instance is measured again (solvers add
+# candidate lists for other k) and the least recently used instances are dropped until it fits.
+# Only solvers from BenchmarkRunner.SOLVERS can be requested. The time budget is passed to solvers that
+# take a time_budget or time_limit parameter, and the server enforces it for every solver: a worker whose
+# solve runs BUDGET_GRACE seconds past its budget is killed with its process group and replaced, the
+# request gets 504 and the requests queued behind it run again on the new worker. /stats is answered from
+# what the workers reported with their last reply, so it never waits behind a solve.
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_MB = 1024
+
+# Requests that may wait for a worker before new ones are rejected with 503
+DEFAULT_MAX_PENDING = 256
+
+# Number of recent request latencies the statistics are computed from
+LATENCY_WINDOW = 10000
+
+# Largest accepted request body in bytes
+MAX_BODY = 1 << 20
+
+# Seconds a solve may run past its time budget (solvers that take the budget return a little after it)
+BUDGET_GRACE = 1.0
+
+# Seconds between two checks of the running solves against their budgets
+WATCH_INTERVAL = 0.1
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+                500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+# State of a worker process, set up once by the pool initializer
+_worker_cache = None
+_worker_clock = None  # Shared with the server: process id, job id and deadline (0 when idle) of the running solve
+
+
+class LruInstanceCache:
+    """
+    Loaded instances by name, least recently used first out once their total size exceeds the cap.
+    """
+
+    def __init__(self, max_bytes, instance_folder, source_folder, k=DEFAULT_CANDIDATES):
+        """
+        Parameters:
+        - max_bytes: The memory cap of the cached matrices and candidate lists.
+        - instance_folder: The folder with the .edges files (and their binary caches).
+        - source_folder: The folder with the .tsp files the binary caches are checked against.
+        - k (optional): The length of the candidate lists computed when an instance is loaded.
+        """
+        self.max_bytes = max_bytes
+        self.instance_folder, self.source_folder, self.k = instance_folder, source_folder, k
+        self.entries = collections.OrderedDict()  # key -> (instance, bytes), most recently used last
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def filename(self, name) -> str:
+        if not name or os.path.basename(name) != name or name.startswith("."):
+            raise ValueError(f"Invalid instance name: {name!r}")
+        for suffix in INSTANCE_SUFFIXES:
+            filename = os.path.join(self.instance_folder, name + suffix)
+            if os.path.exists(filename):
+                return filename
+        raise FileNotFoundError(f"Unknown instance: {name}")
+
+    @staticmethod
+    def key(name, solver=None) -> str:
+        """
+        Returns the cache key of an instance as the solver needs it; solvers marked with needs_coordinates
+        get a CoordinateInstance, which is cached apart from the dense instance of the same name.
+        """
+        return name + " (coordinates)" if getattr(solver, "needs_coordinates", False) else name
+
+    def get(self, name, solver=None):
+        """
+        Returns the instance (as the solver needs it), whether it was cached and the seconds spent loading it.
+        """
+        key = self.key(name, solver)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return self.entries[key][0], True, 0.0
+        start = time.perf_counter()
+        instance = load_solver_instance(solver, self.filename(name), os.path.join(self.source_folder, name + ".tsp"))
+        instance.candidate_lists(self.k)
+        seconds = time.perf_counter() - start
+        self.stats["misses"] += 1
+        self.entries[key] = (instance, 0)
+        self.update(key)
+        return instance, False, seconds
+
+    def update(self, key) -> None:
+        """
+        Measures an instance again and evicts the least recently used others until the cache fits.
+        The instance itself stays, even if it alone exceeds the cap, until the next one is loaded.
+        """
+        instance, old_bytes = self.entries[key]
+        size = instance.memory_bytes()
+        self.entries[key] = (instance, size)
+        self.bytes += size - old_bytes
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            evicted, (_, evicted_bytes) = next(iter(self.entries.items()))
+            if evicted == key:
+                break
+            del self.entries[evicted]
+            self.bytes -= evicted_bytes
+            self.stats["evictions"] += 1
+
+    def describe(self) -> dict:
+        return {**self.stats, "instances": list(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+def _init_worker(max_bytes, instance_folder, source_folder, clock):
+    global _worker_cache, _worker_clock
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Interrupts are handled by the server, which stops the workers
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()  # Own process group, so an overrun also stops the solver's own worker processes
+    _worker_cache = LruInstanceCache(max_bytes, instance_folder, source_folder)
+    _worker_clock = clock
+    clock[0] = os.getpid()
+
+def _solve(request):
+    """
+    Solves one request in the worker process.
+
+    Returns:
+    - A dict with the tour (node labels, open), its closed length, whether the instance was cached, the
+      load, solve and total seconds in the worker and the state of the worker's cache.
+    """
+    start = time.perf_counter()
+    name = request["instance"]
+    solver = resolve_solver(request["solver"])
+    instance, hit, load_time = _worker_cache.get(name, solver)
+    kwargs = solver_kwargs(solver, request.get("seed"), request.get("time_budget"))
+    solve_start = time.perf_counter()
+    if request.get("time_budget") is not None:
+        with _worker_clock.get_lock():
+            _worker_clock[1], _worker_clock[2] = request["job"], time.time() + request["time_budget"] + BUDGET_GRACE
+    try:
+        result = solver(instance, **kwargs)
+    finally:
+        _worker_clock[2] = 0.0
+    solve_time = time.perf_counter() - solve_start
+    order = open_tour(instance.to_indices(extract_path(result)))
+    check_tour(order, instance.dimension)
+    _worker_cache.update(_worker_cache.key(name, solver))
+    return {
+        "tour": instance.to_labels(order),
+        "length": instance.path_weight(order, closed=True),
+        "cache_hit": hit,
+        "timings": {"load": load_time, "solve": solve_time, "worker": time.perf_counter() - start},
+        "cache": _worker_cache.describe(),
+    }
+
+
+class SolveServer:
+    """
+    The asyncio front end: parses requests, routes them to the workers and keeps the statistics.
+    """
+
+    def __init__(self, workers=None, cache_bytes=DEFAULT_CACHE_MB << 20, instance_folder="../networkx_tsp_files",
+                 source_folder="../tsp_files", max_pending=DEFAULT_MAX_PENDING):
+        """
+        Parameters:
+        - workers (optional): The number of worker processes, defaults to the number of CPUs.
+        - cache_bytes (optional): The memory cap of all instance caches together.
+        - instance_folder (optional): The folder with the .edges files.
+        - source_folder (optional): The folder with the .tsp files.
+        - max_pending (optional): Requests that may wait for a worker before new ones get 503.
+        """
+        workers = workers or os.cpu_count()
+        self.worker_args = (cache_bytes // workers, instance_folder, source_folder)
+        self.clocks = [None] * workers  # The shared clock of every worker, see _worker_clock
+        self.caches = [None] * workers  # The cache of every worker as of its last reply
+        self.executors = [self._start_worker(worker) for worker in range(workers)]
+        self.busy = [0] * workers  # Requests in flight per worker
+        self.holders = {}  # Instance name -> workers that loaded it (a hint: they may have evicted it since)
+        self.job_ids = itertools.count(1)
+        self.overrun = set()  # Jobs whose worker was killed for overrunning their time budget
+        self.stopped = weakref.WeakSet()  # Executors killed by the server, whose queued requests are run again
+        self.max_pending = max_pending
+        self.pending = 0
+        self.started_at = time.time()
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def _start_worker(self, worker):
+        self.clocks[worker] = multiprocessing.Array('d', 3)
+        self.caches[worker] = LruInstanceCache(*self.worker_args).describe()
+        return ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=self.worker_args + (self.clocks[worker],))
+
+    def replace_worker(self, worker, executor) -> None:
+        """
+        Replaces a dead or killed worker by a fresh one with an empty cache, unless that already happened.
+        """
+        if self.executors[worker] is not executor:
+            return
+        executor.shutdown(wait=False)
+        self.executors[worker] = self._start_worker(worker)
+        for holders in self.holders.values():
+            holders.discard(worker)
+
+    async def watch(self) -> None:
+        """
+        Kills and replaces every worker whose solve runs BUDGET_GRACE seconds past its time budget.
+        """
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            for worker, clock in enumerate(self.clocks):
+                with clock.get_lock():
+                    pid, job, deadline = clock[:]
+                if not deadline or time.time() <= deadline:
+                    continue
+                self.overrun.add(int(job))
+                executor = self.executors[worker]
+                self.stopped.add(executor)
+                try:
+                    if hasattr(os, "killpg"):
+                        os.killpg(int(pid), signal.SIGKILL)
+                    else:
+                        os.kill(int(pid), signal.SIGTERM)
+                except (ProcessLookupError, PermissionError):
+                    pass
+                self.replace_worker(worker, executor)
+
+    def worker_for(self, name) -> int:
+        """
+        Returns the home worker of the instance (a stable hash, the same in every run).
+        """
+        return zlib.crc32(name.encode()) % len(self.executors)
+
+    def choose_worker(self, name) -> int:
+        """
+        Returns the least busy worker, preferring workers that loaded the instance and then its home worker.
+        """
+        home = self.worker_for(name)
+        holders = self.holders.get(name, ())
+        return min(range(len(self.executors)), key=lambda worker: (self.busy[worker], worker not in holders, worker != home))
+
+    async def solve(self, request) -> tuple:
+        """
+        Validates a solve request and runs it on the worker picked by choose_worker.
+
+        Returns:
+        - The HTTP status and the response body.
+        """
+        if not isinstance(request, dict) or not isinstance(request.get("instance"), str):
+            return 400, {"error": "The request needs an instance name"}
+        solver = request.get("solver", "nearest_neighbor")
+        if solver not in SOLVERS:
+            return 400, {"error": f"Unknown solver: {solver}, choose from {', '.join(SOLVERS)}"}
+        budget = request.get("time_budget")
+        if budget is not None and (not isinstance(budget, (int, float)) or budget < 0):
+            return 400, {"error": "time_budget must be a non-negative number of seconds"}
+        if self.pending >= self.max_pending:
+            self.counts["rejected"] += 1
+            return 503, {"error": f"Too many pending requests ({self.pending})"}
+
+        job = {"instance": request["instance"], "solver": solver, "time_budget": budget, "seed": request.get("seed"), "job": next(self.job_ids)}
+        start = time.perf_counter()
+        while True:
+            worker = self.choose_worker(job["instance"])
+            executor = self.executors[worker]
+            self.pending += 1
+            self.busy[worker] += 1
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(executor, _solve, job)
+                break
+            except (FileNotFoundError, ValueError) as e:
+                self.counts["errors"] += 1
+                return (404 if isinstance(e, FileNotFoundError) else 400), {"error": str(e)}
+            except BrokenProcessPool:
+                # The worker died (killed for its memory use, or by watch); the next request gets a fresh one with an empty cache
+                self.replace_worker(worker, executor)
+                if job["job"] in self.overrun:
+                    self.overrun.discard(job["job"])
+                    self.counts["timeouts"] += 1
+                    return 504, {"error": f"The solve overran its time budget of {budget}s and was stopped"}
+                if executor in self.stopped:
+                    continue  # Queued behind a solve that overran its budget: run it on the new worker
+                self.counts["errors"] += 1
+                return 500, {"error": "The worker process died"}
+            except Exception as e:
+                self.counts["errors"] += 1
+                return 500, {"error": f"{type(e).__name__}: {e}"}
+            finally:
+                self.pending -= 1
+                self.busy[worker] -= 1
+        self.overrun.discard(job["job"])  # It may have finished just as it was found overrunning
+        if self.executors[worker] is executor:
+            self.caches[worker] = result["cache"]
+        del result["cache"]
+        self.holders.setdefault(job["instance"], set()).add(worker)
+        total = time.perf_counter() - start
+        self.counts["solved"] += 1
+        self.counts["cache_hits" if result["cache_hit"] else "cache_misses"] += 1
+        self.latencies.append(total)
+        result["timings"]["queue"] = max(0.0, total - result["timings"]["worker"])
+        result["timings"]["total"] = total
+        return 200, {"status": "ok", "instance": job["instance"], "solver": solver, "worker": worker, **result}
+
+    def stats(self) -> dict:
+        latencies = summarize([seconds * 1e9 for seconds in self.latencies])
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            latencies.update(p50=percentile(ordered, 50), p90=percentile(ordered, 90), p99=percentile(ordered, 99))
+        return {"uptime": time.time() - self.started_at, "pending": self.pending, "busy": list(self.busy), "counts": dict(self.counts),
+                "latency": latencies, "workers": list(self.caches)}
+
+    async def handle(self, method, path, body) -> tuple:
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            return (200, self.stats()) if method == "GET" else (405, {"error": "Use GET"})
+        if path == "/solve":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            try:
+                request = json.loads(body or b"{}")
+            except json.JSONDecodeError as e:
+                return 400, {"error": f"Invalid JSON: {e}"}
+            return await self.solve(request)
+        return 404, {"error": f"Unknown path: {path}"}
+
+    async def serve_connection(self, reader, writer):
+        """
+        Serves the requests of one connection until the client closes it or asks to.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await _write_response(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await _write_response(writer, 413, {"error": f"Body larger than {MAX_BODY} bytes"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, response = await self.handle(method, path.split("?", 1)[0], body)
+                await _write_response(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def preload(self, names) -> None:
+        """
+        Loads instances into the caches of their home workers before the first request.
+        """
+        futures = {name: self.executors[self.worker_for(name)].submit(_warm, name) for name in names}
+        for name, future in futures.items():
+            self.caches[self.worker_for(name)] = future.result()
+            self.holders.setdefault(name, set()).add(self.worker_for(name))
+
+    def close(self) -> None:
+        for executor in self.executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def _warm(name):
+    _worker_cache.get(name)
+    return _worker_cache.describe()
+
+async def _write_response(writer, status, body, keep_alive=True):
+    payload = json.dumps(body).encode()
+    head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + payload)
+    await writer.drain()
+
+async def serve(server, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None):
+    """
+    Serves until SIGINT or SIGTERM, on a Unix socket if one is given and on host:port otherwise.
+    """
+    if unix_socket is not None:
+        listener = await asyncio.start_unix_server(server.serve_connection, path=unix_socket)
+        address = unix_socket
+    else:
+        listener = await asyncio.start_server(server.serve_connection, host, port)
+        address = f"http://{host}:{port}"
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    print(f"Solving on {address} with {len(server.executors)} workers")
+    watcher = asyncio.create_task(server.watch())
+    async with listener:
+        await stop.wait()
+    watcher.cancel()
+    if unix_socket is not None and os.path.exists(unix_socket):
+        os.remove(unix_socket)
+
+def main(argv=None):
+    """
+    Runs the solve server from the command line, e.g.
+    python SolveServer.py --port 8765 --workers 4 --cache-mb 2048 --preload ulysses16 berlin52
+    """
+    parser = argparse.ArgumentParser(description="Serve TSP solves from worker processes with cached instances.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket instead of a port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--cache-mb", type=int, default=DEFAULT_CACHE_MB, help="Memory cap of the instance caches in MB")
+    parser.add_argument("--instances", default="../networkx_tsp_files", help="Folder with the .edges files (TspFileParser.py output)")
+    parser.add_argument("--sources", default="../tsp_files", help="Folder with the .tsp files (for the matrix cache)")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help="Waiting requests before new ones get 503")
+    parser.add_argument("--preload", nargs="*", default=[], help="Instances to load before serving")
+    args = parser.parse_args(argv)
+
+    server = SolveServer(args.workers, args.cache_mb << 20, args.instances, args.sources, args.max_pending)
+    try:
+        server.preload(args.preload)
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    finally:
+        server.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+# Instrumentation surface of the solvers. A solver takes an observer and reports to it:
+# - counters (nodes expanded and pruned, tours evaluated, kicks, ...) with count()
+# - incumbent improvements with improvement(), stored as timestamped events (the convergence curve)
+# - other events (interrupts, phase changes) with event(), and the share of the work done with progress()
+# - the time spent in sections with section(); hot sections are sampled, only every sample_every-th
+#   entry is timed and the total is extrapolated from the samples
+# SolverObserver itself is the no-op sink: every hook does nothing and its enabled flag is False, so a
+# solver that nobody listens to pays one attribute lookup per hook, and hooks inside hot loops are
+# guarded with `if observer.enabled`. The recording sinks keep everything in memory and hand a snapshot
+# to emit() at most once per emit interval (and once at the end), so printing or writing never runs
+# more often than that, however often the solver reports.
+
+# Smallest number of seconds between two emissions of a sink
+DEFAULT_EMIT_INTERVAL = 1.0
+
+# Every how many entries a sampled section is timed
+DEFAULT_SAMPLE_EVERY = 64
+
+_NO_SECTION = nullcontext()
+
+
+class SolverObserver:
+    """
+    The observer interface of the solvers and the no-op sink.
+    """
+    enabled = False
+
+    def start(self, solver, **info) -> None:
+        """
+        Called once when a solver starts, with its name and parameters.
+        """
+
+    def count(self, name, amount=1) -> None:
+        """
+        Adds amount to the counter name.
+        """
+
+    def improvement(self, cost, **info) -> None:
+        """
+        Reports a new incumbent with its cost.
+        """
+
+    def event(self, name, **info) -> None:
+        """
+        Reports anything else that happened, e.g. an interrupt.
+        """
+
+    def progress(self, done, total=None) -> None:
+        """
+        Reports how many of the total work units (shards, subtrees, epochs) are done.
+        """
+
+    def section(self, name, sampled=False):
+        """
+        Returns a context manager that times the code inside it as the section name.
+        Sampled sections only time every sample_every-th entry.
+        """
+        return _NO_SECTION
+
+    def finish(self, **result) -> None:
+        """
+        Called once when the solver returns, with a summary of its result.
+        """
+
+NULL_OBSERVER = SolverObserver()
+
+def make_observer(observer=None, progress=False, **bar_options) -> SolverObserver:
+    """
+    Returns the given observer, or a TqdmObserver (with the bar options, e.g. desc and unit) if progress
+    is True and the no-op observer otherwise. Lets every solver keep its progress flag next to the observer.
+    """
+    if observer is not None:
+        return observer
+    return TqdmObserver(**bar_options) if progress else NULL_OBSERVER
+
+
+class _Section:
+    """
+    Times the entries of one section; a sampled section only times every sample_every-th entry.
+    """
+    __slots__ = ("calls", "timed", "seconds", "sample_every", "_start")
+
+    def __init__(self, sample_every):
+        self.calls, self.timed, self.seconds = 0, 0, 0.0
+        self.sample_every = sample_every
+        self._start = None
+
+    def __enter__(self):
+        if self.calls % self.sample_every == 0:
+            self._start = time.perf_counter()
+        self.calls += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._start is not None:
+            self.seconds += time.perf_counter() - self._start
+            self.timed += 1
+            self._start = None
+        return False
+
+    def estimate(self) -> float:
+        return self.seconds * self.calls / self.timed if self.timed else 0.0
+
+
+class MetricsObserver(SolverObserver):
+    """
+    Records counters, events and section timings in memory and emits rate-limited snapshots.
+    Subclasses decide where a snapshot goes by overriding emit(); this class only records,
+    e.g. to read the convergence curve of a run afterwards.
+    """
+    enabled = True
+
+    def __init__(self, emit_interval=DEFAULT_EMIT_INTERVAL, sample_every=DEFAULT_SAMPLE_EVERY):
+        """
+        Parameters:
+        - emit_interval (optional): Smallest number of seconds between two emissions.
+        - sample_every (optional): Every how many entries a sampled section is timed.
+        """
+        self.emit_interval = emit_interval
+        self.sample_every = max(1, sample_every)
+        self._reset(None, {})
+
+    def _reset(self, solver, info):
+        self.solver, self.info = solver, info
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._last_emit = self._start
+        self.counters = {}
+        self.events = []
+        self.best_cost = None
+        self.done, self.total = 0, None
+        self.sections = {}
+        self.result = None
+        self._emitted_events = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def start(self, solver, **info):
+        self._reset(solver, info)
+        self.event("start", **info)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+        self._maybe_emit()
+
+    def improvement(self, cost, **info):
+        self.best_cost = cost
+        self.event("improvement", cost=cost, **info)
+
+    def event(self, name, **info):
+        self.events.append({"event": name, "elapsed": self.elapsed(), "time": time.time(), **info})
+        self._maybe_emit()
+
+    def progress(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        self._maybe_emit()
+
+    def section(self, name, sampled=False):
+        if name not in self.sections:
+            self.sections[name] = _Section(self.sample_every if sampled else 1)
+        return self.sections[name]
+
+    def finish(self, **result):
+        self.result = result
+        self.event("finish", **{key: value for key, value in result.items() if isinstance(value, (int, float, str, bool))})
+        self.emit(self.snapshot(), final=True)
+
+    def convergence(self) -> list:
+        """
+        Returns the (elapsed seconds, cost) pairs of all incumbent improvements.
+        """
+        return [(event["elapsed"], event["cost"]) for event in self.events if event["event"] == "improvement"]
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current state: counters, best cost, progress and the estimated seconds, entries and
+        timed entries of every section.
+        """
+        return {
+            "solver": self.solver,
+            "elapsed": self.elapsed(),
+            "counters": dict(self.counters),
+            "best_cost": self.best_cost,
+            "done": self.done,
+            "total": self.total,
+            "improvements": sum(event["event"] == "improvement" for event in self.events),
+            "sections": {name: {"calls": section.calls, "timed": section.timed, "seconds": section.estimate()}
+                         for name, section in self.sections.items()},
+        }
+
+    def new_events(self) -> list:
+        """
+        Returns the events since the last call.
+        """
+        events = self.events[self._emitted_events:]
+        self._emitted_events = len(self.events)
+        return events
+
+    def _maybe_emit(self):
+        now = time.perf_counter()
+        if now - self._last_emit >= self.emit_interval:
+            self._last_emit = now
+            self.emit(self.snapshot(), final=False)
+
+    def emit(self, snapshot, final) -> None:
+        """
+        Hands a snapshot to the sink. Called at most once per emit interval and once with final=True.
+        """
+
+
+class TqdmObserver(MetricsObserver):
+    """
+    Shows a tqdm progress bar with the best cost and the counters as postfix.
+    """
+
+    def __init__(self, desc=None, unit="it", emit_interval=0.1, sample_every=DEFAULT_SAMPLE_EVERY, disable=False):
+        super().__init__(emit_interval, sample_every)
+        self.desc, self.unit, self.disable = desc, unit, disable
+        self._bar = None
+
+    def start(self, solver, **info):
+        from tqdm import tqdm  # Only needed when a bar is shown
+        if self._bar is not None:
+            self._bar.close()
+        self._bar = tqdm(desc=self.desc or solver, unit=self.unit, dynamic_ncols=True, disable=self.disable)
+        super().start(solver, **info)
+
+    def event(self, name, **info):
+        super().event(name, **info)
+        if self._bar is not None and name not in ("start", "improvement", "finish"):
+            self._bar.write(f"{self.solver}: {name} " + " ".join(f"{key}={value}" for key, value in info.items()))
+
+    def progress(self, done, total=None):
+        if self._bar is not None:
+            if total is not None and total != self._bar.total:
+                self._bar.total = total
+            self._bar.n = done
+        super().progress(done, total)
+
+    def emit(self, snapshot, final):
+        if self._bar is None:
+            return
+        postfix = {"best_cost": snapshot["best_cost"]} if snapshot["best_cost"] is not None else {}
+        self._bar.set_postfix(postfix | snapshot["counters"], refresh=False)
+        self._bar.refresh()
+        if final:
+            self._bar.close()
+            self._bar = None
+
+
+class JsonLogObserver(MetricsObserver):
+    """
+    Writes structured JSON lines: one snapshot per emission with the events since the previous one.
+    """
+
+    def __init__(self, output=None, emit_interval=DEFAULT_EMIT_INTERVAL, sample_every=DEFAULT_SAMPLE_EVERY):
+        """
+        Parameters:
+        - output (optional): A file name (appended to) or a text stream, defaults to stderr.
+        """
+        super().__init__(emit_interval, sample_every)
+        self.output = output if output is not None else sys.stderr
+
+    def start(self, solver, **info):
+        super().start(solver, **info)
+        self.emit(self.snapshot(), final=False)
+
+    def emit(self, snapshot, final):
+        line = json.dumps({"type": "final" if final else "snapshot", "time": time.time(), **snapshot,
+                           "events": self.new_events()}, default=str) + "\n"
+        if isinstance(self.output, (str, os.PathLike)):
+            with open(self.output, "a") as f:
+                f.write(line)
+        else:
+            self.output.write(line)
+            self.output.flush()
+
+
+class PrometheusObserver(MetricsObserver):
+    """
+    Renders the metrics in the Prometheus text exposition format and, if a file name is given, writes
+    them there on every emission (atomically, for the node exporter's textfile collector).
+    """
+
+    def __init__(self, filename=None, prefix="tsp_solver", emit_interval=DEFAULT_EMIT_INTERVAL, sample_every=DEFAULT_SAMPLE_EVERY):
+        super().__init__(emit_interval, sample_every)
+        self.filename, self.prefix = filename, prefix
+
+    def render(self, snapshot=None) -> str:
+        """
+        Returns the metrics of a snapshot (defaults to the current state) as Prometheus text.
+        """
+        snapshot = snapshot or self.snapshot()
+        solver = _label_value(snapshot["solver"] or "")
+        lines = []
+
+        def metric(name, kind, samples):
+            lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join([f'solver="{solver}"'] + [f'{key}="{_label_value(label)}"' for key, label in labels.items()])
+                lines.append(f"{self.prefix}_{name}{{{label_text}}} {_number(value)}")
+
+        metric("elapsed_seconds", "gauge", [({}, snapshot["elapsed"])])
+        for name, value in snapshot["counters"].items():
+            metric(f"{_metric_name(name)}_total", "counter", [({}, value)])
+        metric("improvements_total", "counter", [({}, snapshot["improvements"])])
+        if snapshot["best_cost"] is not None:
+            metric("best_cost", "gauge", [({}, snapshot["best_cost"])])
+        if snapshot["total"]:
+            metric("progress_ratio", "gauge", [({}, snapshot["done"] / snapshot["total"])])
+        if snapshot["sections"]:
+            sections = snapshot["sections"].items()
+            metric("section_seconds_total", "counter", [({"section": name}, section["seconds"]) for name, section in sections])
+            metric("section_calls_total", "counter", [({"section": name}, section["calls"]) for name, section in sections])
+        return "\n".join(lines) + "\n"
+
+    def emit(self, snapshot, final):
+        if self.filename is None:
+            return
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w") as f:
+            f.write(self.render(snapshot))
+        os.replace(tmp_filename, self.filename)
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() or c == "_" else "_" for c in name)
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value):
+    if isinstance(value, float) and value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if isinstance(value, float) else str(value)
@@ -0,0 +1,229 @@
+import itertools
+import numpy as np
+
+# Uniform grid over the node coordinates for k-nearest-neighbor queries without a distance matrix.
+# Points are bucketed into cells of about POINTS_PER_CELL points; a query scans the cube of cells around
+# the query point and grows the cube until the k-th nearest point found is closer than any point outside
+# of it can be. This works for every norm that is at least the Chebyshev distance (L1, L2, Linf).
+# Only occupied cells are stored (sorted by cell id), so clustered inputs can use cells much smaller than
+# their bounding box would suggest without allocating the empty space between the clusters.
+
+POINTS_PER_CELL = 2
+
+# Largest number of query points of one cell that are answered together
+QUERY_GROUP_SIZE = 16
+
+# Bounds the number of distances computed at once by k_nearest
+BATCH_ELEMENTS = 1 << 22
+
+# Refinement steps of the cell size for unevenly spread points
+MAX_REFINEMENTS = 8
+
+
+class GridIndex:
+    """
+    A d-dimensional uniform grid index over a fixed set of points.
+    """
+
+    def __init__(self, points, points_per_cell=POINTS_PER_CELL):
+        """
+        Parameters:
+        - points: An (n, d) array of point coordinates.
+        - points_per_cell (optional): The average number of points per cell the grid is sized for.
+        """
+        self.points = np.asarray(points, dtype=np.float64)
+        n, dimensions = self.points.shape
+        self.low = self.points.min(axis=0) if n else np.zeros(dimensions)
+        self.extent = (self.points.max(axis=0) - self.low) if n else np.zeros(dimensions)
+        spread = self.extent[self.extent > 0]
+        if not len(spread):
+            self._build(1.0)
+            return
+        # Start with cells that hold points_per_cell points if the points filled their bounding box, then
+        # shrink the cells while the average point shares its cell with many more points than that
+        volume = np.prod(spread)
+        cell_size = float((volume * points_per_cell / n) ** (1.0 / len(spread)))
+        self._build(cell_size)
+        for _ in range(MAX_REFINEMENTS):
+            counts = self.cell_end - self.cell_start
+            crowding = float((counts.astype(np.float64) ** 2).sum() / n)
+            if crowding <= 4 * points_per_cell:
+                break
+            cell_size *= (points_per_cell / crowding) ** (1.0 / len(spread))
+            if np.prod(np.ceil(self.extent / cell_size) + 1, dtype=np.float64) > 2.0 ** 62:
+                break
+            self._build(cell_size)
+
+    def _build(self, cell_size):
+        self.cell_size = cell_size
+        self.shape = np.maximum(np.ceil(self.extent / cell_size).astype(np.int64), 1)
+        self.strides = np.cumprod(np.concatenate(([1], self.shape[:0:-1])))[::-1]
+        self.cells = self.cell_coordinates(self.points)
+        cell_ids = self.cells @ self.strides
+        self.order = np.argsort(cell_ids, kind='stable')
+        sorted_ids = cell_ids[self.order]
+        self.cell_ids, self.cell_start = np.unique(sorted_ids, return_index=True)
+        self.cell_end = np.append(self.cell_start[1:], len(sorted_ids))
+
+    def cell_coordinates(self, points) -> np.ndarray:
+        """
+        Returns the integer grid cell of every point, clipped to the grid.
+        """
+        cells = np.floor((np.asarray(points, dtype=np.float64) - self.low) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.shape - 1)
+
+    def _cell_ranges(self, cells):
+        """
+        Returns the start and end positions (in self.order) of the points in the given cells; empty for cells
+        that are unoccupied or outside the grid.
+        """
+        valid = np.all((cells >= 0) & (cells < self.shape), axis=-1)
+        ids = np.where(valid, cells @ self.strides, -1)
+        slots = np.minimum(np.searchsorted(self.cell_ids, ids), len(self.cell_ids) - 1)
+        found = valid & (self.cell_ids[slots] == ids)
+        return np.where(found, self.cell_start[slots], 0), np.where(found, self.cell_end[slots], 0)
+
+    def points_in_cube(self, center, radius) -> np.ndarray:
+        """
+        Returns the indices of all points in the cells at most radius cells away from the given cell.
+        """
+        offsets = np.array(list(itertools.product(range(-radius, radius + 1), repeat=len(self.shape))), dtype=np.int64)
+        starts, ends = self._cell_ranges(center + offsets)
+        return self.order[_concatenate_ranges(starts, ends)]
+
+    def k_nearest(self, k, norm=2) -> np.ndarray:
+        """
+        Finds the k nearest other points of every indexed point.
+
+        Parameters:
+        - k: The number of neighbors per point.
+        - norm (optional): The norm to measure with: 1, 2 or np.inf.
+
+        Returns:
+        - An (n, k) array of point indices, every row sorted by distance (ties by index).
+        """
+        n, dimensions = self.points.shape
+        k = max(0, min(k, n - 1))
+        neighbors = np.empty((n, k), dtype=np.intp)
+        if k == 0:
+            return neighbors
+        # Queries are groups of up to QUERY_GROUP_SIZE points of one cell, which share their candidates.
+        # Groups are answered together with padded arrays. A group whose k-th neighbors are not provably
+        # inside its cube is retried with a cube just large enough to contain the k-th neighbors found so
+        # far, and once a cube would have more cells than are occupied, all points become candidates.
+        counts = self.cell_end - self.cell_start
+        groups_per_cell = -(-counts // QUERY_GROUP_SIZE)
+        first_group = np.cumsum(groups_per_cell) - groups_per_cell
+        group_cells = np.repeat(np.arange(len(counts)), groups_per_cell)
+        group_starts = self.cell_start[group_cells] + QUERY_GROUP_SIZE * (np.arange(len(group_cells)) - first_group[group_cells])
+        group_ends = np.minimum(group_starts + QUERY_GROUP_SIZE, self.cell_end[group_cells])
+        group_centers = self.cells[self.order[group_starts]]
+        radii = np.ones(len(group_cells), dtype=np.int64)
+        pending = np.arange(len(group_cells))
+        while len(pending):
+            retry = []
+            for radius in np.unique(radii[pending]).tolist():
+                groups = pending[radii[pending] == radius]
+                exhaustive = (2 * radius + 1) ** dimensions >= len(self.cell_ids)
+                if exhaustive:
+                    offsets = None
+                    batch_size = max(1, BATCH_ELEMENTS // (QUERY_GROUP_SIZE * n))
+                else:
+                    offsets = np.array(list(itertools.product(range(-radius, radius + 1), repeat=dimensions)), dtype=np.int64)
+                    batch_size = max(1, BATCH_ELEMENTS // (QUERY_GROUP_SIZE * len(offsets) * int(counts.max())))
+                for batch_start in range(0, len(groups), batch_size):
+                    batch = groups[batch_start:batch_start + batch_size]
+                    if exhaustive:
+                        candidate_points = np.broadcast_to(np.arange(n), (len(batch), n))
+                    else:
+                        starts, ends = self._cell_ranges(group_centers[batch][:, None, :] + offsets[None, :, :])
+                        candidates = _padded_ranges(starts, ends)
+                        candidate_points = np.where(candidates >= 0, self.order[candidates], -1)
+                    members = _padded_ranges(group_starts[batch], group_ends[batch])
+                    member_points = np.where(members >= 0, self.order[members], -1)
+                    difference = self.points[member_points][:, :, None, :] - self.points[candidate_points][:, None, :, :]
+                    distances = np.linalg.norm(difference, ord=norm, axis=3)
+                    distances[np.broadcast_to((candidate_points < 0)[:, None, :], distances.shape)] = np.inf
+                    distances[member_points[:, :, None] == candidate_points[:, None, :]] = np.inf
+                    if distances.shape[2] >= k:
+                        kth = np.partition(distances, k - 1, axis=2)[:, :, k - 1]
+                    else:
+                        kth = np.full(distances.shape[:2], np.inf)
+                    kth[member_points < 0] = 0
+                    # Every point outside the cube is at least radius cells away from the group's cell
+                    done = np.all(kth < radius * self.cell_size, axis=1) | exhaustive
+                    rows = np.flatnonzero(done)
+                    if len(rows):
+                        ties = np.broadcast_to(candidate_points[rows][:, None, :], distances[rows].shape)
+                        order = np.lexsort((ties, distances[rows]), axis=2)[:, :, :k]
+                        nearest = np.take_along_axis(ties, order, axis=2)
+                        valid_members = member_points[rows] >= 0
+                        neighbors[member_points[rows][valid_members]] = nearest[valid_members]
+                    # The k-th neighbor found so far bounds the true one, so the next cube settles the group
+                    worst = kth[~done].max(axis=1)
+                    needed = np.where(np.isfinite(worst), np.floor(np.minimum(worst, 2.0 ** 52) / self.cell_size) + 1, 2 * radius)
+                    radii[batch[~done]] = np.maximum(needed.astype(np.int64), radius + 1)
+                    retry.append(batch[~done])
+            pending = np.concatenate(retry)
+        return neighbors
+
+    def nearest(self, i, excluded, norm=2):
+        """
+        Finds the points closest to point i among those that are not excluded, by scanning growing cubes of cells.
+
+        Parameters:
+        - i: The index of the query point.
+        - excluded: A boolean array, True for points that must not be returned (including i itself).
+        - norm (optional): The norm to measure with: 1, 2 or np.inf.
+
+        Returns:
+        - The indices of the non-excluded points within the proven search radius, which include the nearest
+          one, or an empty array if no point is left.
+        """
+        center = self.cells[i]
+        dimensions = len(self.shape)
+        radius = 1
+        while (2 * radius + 1) ** dimensions < len(self.cell_ids):
+            candidates = self.points_in_cube(center, radius)
+            candidates = candidates[~excluded[candidates]]
+            if not len(candidates):
+                radius *= 2
+                continue
+            distances = np.linalg.norm(self.points[candidates] - self.points[i], ord=norm, axis=1)
+            inside = distances < radius * self.cell_size
+            if inside.any():
+                return candidates[inside]
+            radius = max(radius + 1, int(np.floor(min(distances.min(), 2.0 ** 52) / self.cell_size)) + 1)
+        # The cube would cover more cells than are occupied: every point is a candidate
+        return np.flatnonzero(~excluded)
+
+def _concatenate_ranges(starts, ends) -> np.ndarray:
+    """
+    Concatenates the ranges starts[i]:ends[i] without a Python loop.
+    """
+    starts, ends = starts.ravel(), ends.ravel()
+    counts = ends - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts) + np.arange(total)
+
+def _padded_ranges(starts, ends) -> np.ndarray:
+    """
+    Lays out the union of the ranges in every row of starts/ends as one row of a padded array (-1 = padding).
+
+    Parameters:
+    - starts, ends: Arrays of shape (b,) or (b, r) with the range bounds of every row.
+
+    Returns:
+    - A (b, longest row) array of positions.
+    """
+    starts, ends = starts.reshape(len(starts), -1), ends.reshape(len(ends), -1)
+    counts = ends - starts
+    row_totals = counts.sum(axis=1)
+    padded = np.full((len(starts), max(int(row_totals.max(initial=0)), 1)), -1, dtype=np.intp)
+    positions = _concatenate_ranges(starts, ends)
+    rows = np.repeat(np.arange(len(starts)), row_totals)
+    columns = np.arange(len(positions)) - np.repeat(np.cumsum(row_totals) - row_totals, row_totals)
+    padded[rows, columns] = positions
+    return padded
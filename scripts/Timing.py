@@ -0,0 +1,83 @@
+import gc
+import math
+import os
+import statistics
+import time
+
+# Repeated timing for the benchmarks. A measurement runs the function a few times without recording
+# (warmup: lazy imports, memory allocation, page cache and other first-call costs), then records every repeat with
+# the wall clock (perf_counter_ns) and the CPU time of this process plus its finished child processes
+# (process_time_ns and os.times), so solvers with worker pools are not undercounted. The garbage
+# collector runs before each repeat and is paused during it, like in timeit.
+
+DEFAULT_WARMUP = 1
+DEFAULT_REPEATS = 5
+
+
+def _children_cpu_ns():
+    times = os.times()
+    return int((times.children_user + times.children_system) * 1e9)
+
+def percentile(sorted_values, q):
+    """
+    Returns the nearest-rank q-th percentile (0 < q <= 100) of ascending values, so it is always one of them.
+    """
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values) / 100) - 1))]
+
+def summarize(samples_ns) -> dict:
+    """
+    Summarizes timing samples given in nanoseconds.
+
+    Returns:
+    - A dict with count, min, median, p95, mean, stddev and max, all in seconds (stddev 0 for a single sample).
+    """
+    seconds = sorted(sample / 1e9 for sample in samples_ns)
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "min": seconds[0],
+        "median": statistics.median(seconds),
+        "p95": percentile(seconds, 95),
+        "mean": statistics.fmean(seconds),
+        "stddev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+        "max": seconds[-1],
+    }
+
+def measure(function, *args, warmup=DEFAULT_WARMUP, repeats=DEFAULT_REPEATS, setup=None, **kwargs):
+    """
+    Times a function over several repeats.
+
+    Parameters:
+    - function: The function to time, called as function(*args, **kwargs).
+    - warmup (optional): The number of unrecorded calls before the measurement.
+    - repeats (optional): The number of recorded calls (at least 1).
+    - setup (optional): Called untimed before every call, e.g. to drop caches the previous call filled.
+
+    Returns:
+    - The result of the last call and a dict with the "wall" and "cpu" summaries (see summarize).
+    """
+    result = None
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        result = function(*args, **kwargs)
+    wall, cpu = [], []
+    gc_enabled = gc.isenabled()
+    for _ in range(max(1, repeats)):
+        if setup is not None:
+            setup()
+        gc.collect()
+        gc.disable()
+        try:
+            cpu_start, children_start = time.process_time_ns(), _children_cpu_ns()
+            wall_start = time.perf_counter_ns()
+            result = function(*args, **kwargs)
+            wall_end = time.perf_counter_ns()
+            cpu_end, children_end = time.process_time_ns(), _children_cpu_ns()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        wall.append(wall_end - wall_start)
+        cpu.append(cpu_end - cpu_start + children_end - children_start)
+    return result, {"wall": summarize(wall), "cpu": summarize(cpu)}
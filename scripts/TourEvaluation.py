@@ -0,0 +1,147 @@
+import numpy as np
+
+# Scores and validates tours given as matrix indices, one tour (1-D) or a batch of tours (2-D, one per row),
+# with one fancy-indexed gather over the distance matrix: the edges of every tour are the pairs
+# (tour[i], tour[i + 1]), plus (tour[-1], tour[0]) when the tour is closed. A tour lists every node once;
+# whether the edge back to the start counts is always chosen with the closed parameter, never guessed
+# from the indices. Validation marks every node a tour visits in a (batch, n) table in the same pass, so
+# tours with missing, duplicate or out-of-range nodes are found without sorting.
+
+# Tour entries per chunk of a batch, bounds the temporary arrays of the gather and the validation
+BATCH_ELEMENTS = 1 << 22
+
+
+def _accumulator(matrix):
+    return np.int64 if np.issubdtype(matrix.dtype, np.integer) else np.float64
+
+def _chunks(count, width):
+    size = max(1, BATCH_ELEMENTS // max(width, 1))
+    for start in range(0, count, size):
+        yield slice(start, min(start + size, count))
+
+def _gather(matrix, tours, closed):
+    successors = np.roll(tours, -1, axis=1) if closed else tours[:, 1:]
+    predecessors = tours[:, :successors.shape[1]]
+    if isinstance(matrix, np.ndarray) and matrix.flags.c_contiguous:
+        # One take over the flat matrix is cheaper than indexing with a pair of index arrays
+        weights = matrix.ravel().take(predecessors * matrix.shape[1] + successors)
+    else:
+        weights = matrix[predecessors, successors]
+    return weights.sum(axis=1, dtype=_accumulator(matrix))
+
+def _visits_all(tours, dimension):
+    if tours.shape[1] != dimension:
+        return np.zeros(len(tours), dtype=bool)
+    inside = ((tours >= 0) & (tours < dimension)).all(axis=1)
+    seen = np.zeros((len(tours), dimension), dtype=bool)
+    seen[np.arange(len(tours))[:, None], np.clip(tours, 0, dimension - 1)] = True
+    # n in-range entries that cover all n nodes hold no duplicates
+    return inside & seen.all(axis=1)
+
+def evaluate_tours(matrix, tours, closed=True, validate=True):
+    """
+    Scores a batch of tours and checks that every one of them is a permutation of the nodes.
+
+    Parameters:
+    - matrix: The (n, n) distance matrix, or any matrix that supports len() and index array pairs.
+    - tours: A (batch, length) array of matrix indices, one tour per row.
+    - closed (optional): If True, the edge from the last back to the first node of every tour is added.
+    - validate (optional): If True, every tour is also checked for missing, duplicate and out-of-range nodes.
+
+    Returns:
+    - The lengths as an int64 (integral matrix) or float64 array and a boolean array that is True for
+      every valid tour (None without validation). Out-of-range nodes are clipped for the gather, so the
+      length of an invalid tour is meaningless.
+    """
+    if not hasattr(matrix, "dtype"):
+        matrix = np.asarray(matrix)  # A lazy matrix (CoordinateInstance) is indexed as it is, never materialized
+    tours = np.asarray(tours, dtype=np.intp)
+    if tours.ndim != 2:
+        raise ValueError(f"Tours must be a 2-D array with one tour per row, got shape {tours.shape}")
+    dimension = len(matrix)
+    lengths = np.zeros(len(tours), dtype=_accumulator(matrix))
+    valid = np.empty(len(tours), dtype=bool) if validate else None
+    if tours.shape[1] == 0 or dimension == 0:
+        if validate:
+            valid[:] = tours.shape[1] == dimension
+        return lengths, valid
+    for rows in _chunks(len(tours), tours.shape[1]):
+        chunk = tours[rows]
+        if validate:
+            valid[rows] = _visits_all(chunk, dimension)
+            chunk = np.clip(chunk, 0, dimension - 1)
+        lengths[rows] = _gather(matrix, chunk, closed)
+    return lengths, valid
+
+def tour_lengths(matrix, tours, closed=True):
+    """
+    Scores one tour or a batch of tours without validating them.
+
+    Parameters:
+    - matrix: The (n, n) distance matrix.
+    - tours: A sequence of matrix indices, or a (batch, length) array with one tour per row.
+    - closed (optional): If True, the edge from the last back to the first node is added.
+
+    Returns:
+    - The length as a Python int or float for a single tour, an array of lengths for a batch.
+    """
+    tours = np.asarray(tours, dtype=np.intp)
+    lengths, _ = evaluate_tours(matrix, tours.reshape(1, -1) if tours.ndim == 1 else tours, closed, validate=False)
+    return lengths[0].item() if tours.ndim == 1 else lengths
+
+def tour_errors(tour, dimension) -> dict:
+    """
+    Lists what keeps a single tour from being a permutation of range(dimension).
+
+    Returns:
+    - A dict with the sorted "missing", "duplicate" and "out_of_range" nodes (all empty for a valid tour).
+    """
+    tour = np.asarray(tour, dtype=np.intp).ravel()
+    inside = (tour >= 0) & (tour < dimension)
+    counts = np.bincount(tour[inside], minlength=dimension)
+    return {
+        "missing": np.flatnonzero(counts == 0).tolist(),
+        "duplicate": np.flatnonzero(counts > 1).tolist(),
+        "out_of_range": sorted(set(tour[~inside].tolist())),
+    }
+
+def check_tour(tour, dimension) -> None:
+    """
+    Raises a ValueError naming the missing, duplicate and out-of-range nodes if the tour (matrix indices)
+    does not visit every node exactly once.
+    """
+    tour = np.asarray(tour, dtype=np.intp).reshape(1, -1)
+    if _visits_all(tour, dimension)[0]:
+        return
+    errors = tour_errors(tour, dimension)
+    details = ", ".join(f"{kind.replace('_', ' ')} nodes {nodes[:10]}" + (" ..." if len(nodes) > 10 else "")
+                        for kind, nodes in errors.items() if nodes)
+    raise ValueError(f"Invalid tour of {tour.shape[1]} nodes for dimension {dimension}: {details}")
+
+def open_tour(tour) -> list:
+    """
+    Returns a tour without the repetition of its first node at the end, for callers that accept tours
+    in both the open and the closed form (the benchmark harnesses normalize every solver result with it).
+    """
+    tour = list(tour)
+    return tour[:-1] if len(tour) > 1 and tour[0] == tour[-1] else tour
+
+def path_length(G, path, closed=False):
+    """
+    Sums the edge weights along a path of node labels.
+
+    Parameters:
+    - G: A NetworkX graph with weighted edges, or a TspInstance.
+    - path: A list of node labels, scored as given (a path that repeats its first node at the end already
+      contains the edge back to the start, see open_tour).
+    - closed (optional): If True, the edge from the last back to the first node is added.
+
+    Returns:
+    - The total weight.
+    """
+    if len(path) == 0:
+        return 0
+    if not hasattr(G, "matrix"):
+        import networkx as nx  # Already loaded by whoever built the graph
+        return nx.path_weight(G, list(path) + [path[0]] if closed and len(path) > 1 else list(path), "weight")
+    return tour_lengths(G.matrix, G.to_indices(path), closed)
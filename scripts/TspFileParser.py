@@ -1,49 +1,145 @@
 import os
+import re
+import sys
+import bz2
+import gzip
 import math
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from TspInstance import TspInstance
+from InstanceCache import file_fingerprint, is_cache_fresh, load_cache_header, save_instance_cache, update_cache_source
+
+# Plain and compressed TSPLIB files that main converts
+TSP_SUFFIXES = (".tsp", ".tsp.gz", ".tsp.bz2")
+
+# Name of the file in the output folder that records which sources the .edges files were built from
+MANIFEST_FILENAME = "manifest.json"
+
+# Number of edges formatted at once by the .edges writers
+EDGE_BLOCK_SIZE = 1 << 20
+
+# Size of the blocks read from the file while bulk-parsing numeric sections
+READ_CHUNK_SIZE = 1 << 20
+
+def open_tsplib_file(filename, mode='rt'):
+    """
+    Opens a TSPLIB-related text file, transparently handling .gz and .bz2 compression.
+
+    Parameters:
+    - filename: The name of the file.
+    - mode (optional): The file mode, 'rt' or 'wt'.
+
+    Returns:
+    - A text file object.
+    """
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode, compresslevel=6)
+    if filename.endswith(".bz2"):
+        return bz2.open(filename, mode)
+    return open(filename, mode)
+
+def explicit_weight_count(edge_weight_format, dimension) -> int:
+    """
+    Returns the number of values an EDGE_WEIGHT_SECTION holds for the given format and dimension.
+    """
+    if edge_weight_format == "FULL_MATRIX":
+        return dimension * dimension
+    elif edge_weight_format in ("UPPER_ROW", "LOWER_ROW", "UPPER_COL", "LOWER_COL"):
+        return dimension * (dimension - 1) // 2
+    elif edge_weight_format in ("UPPER_DIAG_ROW", "LOWER_DIAG_ROW", "UPPER_DIAG_COL", "LOWER_DIAG_COL"):
+        return dimension * (dimension + 1) // 2
+    raise ValueError(f"Unsupported edge weight format: {edge_weight_format}")
+
+def _read_line(f, pending) -> tuple:
+    """
+    Reads the next line, taking text left over from a bulk read into account first.
+    """
+    if pending:
+        newline = pending.find("\n")
+        if newline >= 0:
+            return pending[:newline + 1], pending[newline + 1:]
+        return pending + f.readline(), ""
+    return f.readline(), ""
+
+def _read_numbers(f, count, pending) -> tuple:
+    """
+    Bulk-parses the next count whitespace-separated numbers into a preallocated array.
+    The file is read in fixed-size chunks, so only one chunk of text is held at a time.
+
+    Returns:
+    - The array of numbers and the text following the last number that was consumed.
+    """
+    values = np.empty(count, dtype=np.float64)
+    filled = 0
+    text = pending
+    while filled < count:
+        chunk = f.read(READ_CHUNK_SIZE)
+        text += chunk
+        carry = ""
+        if chunk and not text[-1].isspace():
+            # Keep a token that may be cut off at the chunk boundary for the next round
+            cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"), text.rfind("\r"))
+            text, carry = text[:cut + 1], text[cut + 1:]
+        tokens = text.split()
+        taken = min(len(tokens), count - filled)
+        values[filled:filled + taken] = np.array(tokens[:taken], dtype=np.float64)
+        filled += taken
+        if taken < len(tokens):
+            # The section ended inside this chunk: hand the unparsed rest back to the line reader
+            last = next(itertools.islice(re.finditer(r"\S+", text), taken - 1, None)) if taken else None
+            return values, text[last.end() if last else 0:] + carry
+        text = carry
+        if not chunk and filled < count:
+            raise ValueError(f"Unexpected end of file after {filled} of {count} values")
+    return values, text
 
 def parse_tsp_file(filename) -> tuple:
     """
     Parses a TSP file and extracts node coordinates, edge weight type, edge weight format, explicit distances, and dimension.
+    The header is read line by line, the numeric sections are parsed in bulk straight into arrays,
+    so the file is never held in memory as a whole. Files ending in .gz or .bz2 are decompressed on the fly.
 
     Parameters:
     - filename: The name of the file to be parsed.
 
     Returns:
-    - A tuple containing node coordinates (dict), edge weight type (str), edge weight format (str), explicit distances (list), and dimension (int).
-    """
-    with open(filename, 'r') as f:
-        content = f.readlines()
-    edge_weight_type, edge_weight_format = "", ""
-    node_coords, explicit_distances = {}, []
-    reading_section = None
-    dimension = 0
-
-    for line in content:
-        if "EDGE_WEIGHT_TYPE" in line:
-            edge_weight_type = line.split(":")[1].strip()
-        elif "EDGE_WEIGHT_FORMAT" in line:
-            edge_weight_format = line.split(":")[1].strip()
-        elif "DIMENSION" in line:
-            dimension = int(line.split(":")[1].strip())
-        elif line.strip() == "NODE_COORD_SECTION":
-            reading_section = "NODE_COORD"
-        elif line.strip() == "EDGE_WEIGHT_SECTION":
-            reading_section = "EDGE_WEIGHT"
-        elif line.strip() == "EOF":
-            break
-        elif reading_section == "NODE_COORD" and edge_weight_type != "EXPLICIT":
-            parts = line.strip().split()
-            if len(parts) == 3:
-                try:
-                    node_id, x, y = int(parts[0]), float(parts[1]), float(parts[2])
-                    node_coords[node_id] = (x, y)
-                except ValueError:
-                    print(f"Skipping invalid line: {line.strip()}")
-        elif reading_section == "EDGE_WEIGHT" and edge_weight_type == "EXPLICIT":
-            try:
-                explicit_distances.extend(map(float, line.strip().split()))
-            except ValueError:
-                print(f"Skipping invalid line: {line.strip()}")
+    - A tuple containing node coordinates (dict), edge weight type (str), edge weight format (str), explicit distances (np.ndarray), and dimension (int).
+    """
+    specification = {}
+    node_coords, explicit_distances = {}, np.empty(0, dtype=np.float64)
+    pending = ""
+
+    with open_tsplib_file(filename) as f:
+        while True:
+            line, pending = _read_line(f, pending)
+            if not line:
+                break
+            line = line.strip()
+            keyword = line.rstrip(":").strip()
+            if keyword == "EOF":
+                break
+            elif keyword == "NODE_COORD_SECTION":
+                dimension = int(specification.get("DIMENSION", 0))
+                width = 4 if specification.get("NODE_COORD_TYPE") == "THREED_COORDS" else 3
+                values, pending = _read_numbers(f, width * dimension, pending)
+                values = values.reshape(dimension, width)
+                node_coords = dict(zip(values[:, 0].astype(np.int64).tolist(), map(tuple, values[:, 1:3].tolist())))
+            elif keyword == "EDGE_WEIGHT_SECTION":
+                dimension = int(specification.get("DIMENSION", 0))
+                count = explicit_weight_count(specification.get("EDGE_WEIGHT_FORMAT", ""), dimension)
+                explicit_distances, pending = _read_numbers(f, count, pending)
+            elif ":" in line:
+                key, value = line.split(":", 1)
+                specification[key.strip()] = value.strip()
+            # Everything else (other sections, blank lines) is not needed and skipped
+
+    edge_weight_type = specification.get("EDGE_WEIGHT_TYPE", "")
+    edge_weight_format = specification.get("EDGE_WEIGHT_FORMAT", "")
+    dimension = int(specification.get("DIMENSION", 0))
     return node_coords, edge_weight_type, edge_weight_format, explicit_distances, dimension
 
 def euclidean_distance(x1, y1, x2, y2) -> int:
@@ -105,9 +201,50 @@ def att_distance(x1, y1, x2, y2) -> int:
     tij = round(rij + 0.5)
     return tij
 
+# Explicit formats that store one triangle of the symmetric matrix, mapped to the np.tri diagonal offset
+# of the triangle their values fill in row-major order. A column-wise upper triangle is read in the same
+# order as a row-wise lower triangle (and vice versa), so the *_COL formats reuse the *_ROW layouts.
+LOWER_TRIANGLE_FORMATS = {"LOWER_ROW": -1, "UPPER_COL": -1, "LOWER_DIAG_ROW": 0, "UPPER_DIAG_COL": 0}
+UPPER_TRIANGLE_FORMATS = {"UPPER_ROW": -1, "LOWER_COL": -1, "UPPER_DIAG_ROW": 0, "LOWER_DIAG_COL": 0}
+
+def explicit_distance_matrix(explicit_distances, edge_weight_format, dimension, dtype=np.float64) -> np.ndarray:
+    """
+    Unpacks the flat EDGE_WEIGHT_SECTION values of any TSPLIB explicit format into a dense symmetric matrix.
+    The values are scattered into their triangle with a boolean mask and mirrored, without a per-element loop.
+
+    Parameters:
+    - explicit_distances: The flat explicit distances, as returned by parse_tsp_file.
+    - edge_weight_format: The EDGE_WEIGHT_FORMAT of the instance.
+    - dimension: The dimension of the TSP instance.
+    - dtype (optional): The dtype of the returned matrix.
+
+    Returns:
+    - An (n, n) symmetric distance matrix with a zero diagonal.
+    """
+    values = np.asarray(explicit_distances, dtype=dtype)
+    expected = explicit_weight_count(edge_weight_format, dimension)
+    if len(values) != expected:
+        raise ValueError(f"{edge_weight_format} with dimension {dimension} needs {expected} values, got {len(values)}")
+
+    matrix = np.zeros((dimension, dimension), dtype=dtype)
+    if edge_weight_format == "FULL_MATRIX":
+        # Like the edge list always did, the upper triangle is authoritative
+        matrix[:] = values.reshape(dimension, dimension)
+        triangle = np.tri(dimension, k=-1, dtype=bool).T
+    elif edge_weight_format in LOWER_TRIANGLE_FORMATS:
+        triangle = np.tri(dimension, k=LOWER_TRIANGLE_FORMATS[edge_weight_format], dtype=bool)
+        matrix[triangle] = values
+    else:
+        triangle = np.tri(dimension, k=UPPER_TRIANGLE_FORMATS[edge_weight_format], dtype=bool).T
+        matrix[triangle] = values
+    matrix.T[triangle] = matrix[triangle]
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
 def parse_explicit_distances(explicit_distances, edge_weight_format, dimension) -> list:
     """
     Parses explicit distances based on the format and dimension specified, organizing them into a list of tuples.
+    All TSPLIB explicit formats are supported; the edges are listed in the order they are stored in the file.
     
     Parameters:
     - explicit_distances: A list of explicit distances.
@@ -117,20 +254,106 @@ def parse_explicit_distances(explicit_distances, edge_weight_format, dimension)
     Returns:
     - A list of tuples containing the distances between nodes.
     """
+    matrix = explicit_distance_matrix(explicit_distances, edge_weight_format, dimension)
+    node_ids = list(range(1, dimension + 1))
     distances = []
-    if edge_weight_format == "FULL_MATRIX":
-        for i in range(dimension):
-            for j in range(i + 1, dimension):
-                distances.append((i+1, j+1, explicit_distances[i * dimension + j]))
-    elif edge_weight_format == "LOWER_DIAG_ROW":
-        index = 0
-        for i in range(dimension):
-            for j in range(i + 1):
-                if i != j:
-                    distances.append((j+1, i+1, explicit_distances[index]))
-                index += 1
+    if edge_weight_format in LOWER_TRIANGLE_FORMATS:
+        for i in range(1, dimension):
+            distances.extend(zip(node_ids[:i], [node_ids[i]] * i, matrix[i, :i].tolist()))
+    else:
+        for i in range(dimension - 1):
+            distances.extend(zip([node_ids[i]] * (dimension - i - 1), node_ids[i + 1:], matrix[i, i + 1:].tolist()))
     return distances
 
+def _geo_radians(degrees) -> np.ndarray:
+    """
+    Vectorized version of the degree/minute to radian conversion used by geo_distance.
+    """
+    PI = 3.141592
+    deg = np.trunc(degrees)
+    min = degrees - deg
+    return PI * (deg + 5.0 * min / 3.0) / 180.0
+
+def paired_distances(coords_a, coords_b, edge_weight_type) -> np.ndarray:
+    """
+    Calculates the distances between the points of coords_a and coords_b element by element (with NumPy broadcasting).
+    The TSPLIB rounding rules are the same as in euclidean_distance, geo_distance and att_distance,
+    so the results are bit-identical to the scalar functions.
+
+    Parameters:
+    - coords_a: An array of shape (..., 2) with the coordinates of the first points.
+    - coords_b: An array of shape (..., 2) with the coordinates of the second points, broadcastable against coords_a.
+    - edge_weight_type: One of EUC_2D, CEIL_2D, MAN_2D, MAX_2D, GEO or ATT.
+
+    Returns:
+    - A float array of integral distances in the broadcast shape.
+    """
+    coords_a = np.asarray(coords_a, dtype=np.float64)
+    coords_b = np.asarray(coords_b, dtype=np.float64)
+    if edge_weight_type == "GEO":
+        lat1, lon1 = _geo_radians(coords_a[..., 0]), _geo_radians(coords_a[..., 1])
+        lat2, lon2 = _geo_radians(coords_b[..., 0]), _geo_radians(coords_b[..., 1])
+        RRR = 6378.388
+        q1 = np.cos(lon1 - lon2)
+        q2 = np.cos(lat1 - lat2)
+        q3 = np.cos(lat1 + lat2)
+        # Clipping only matters for coincident points, where rounding can push the argument past 1
+        arc = np.arccos(np.clip(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1.0, 1.0))
+        return np.trunc(RRR * arc + 1.0)
+
+    dx = coords_a[..., 0] - coords_b[..., 0]
+    dy = coords_a[..., 1] - coords_b[..., 1]
+    if edge_weight_type == "EUC_2D":
+        return np.rint(np.sqrt(dx * dx + dy * dy))
+    elif edge_weight_type == "CEIL_2D":
+        return np.ceil(np.sqrt(dx * dx + dy * dy))
+    elif edge_weight_type == "ATT":
+        return np.rint(np.sqrt((dx * dx + dy * dy) / 10.0) + 0.5)
+    elif edge_weight_type == "MAN_2D":
+        return np.rint(np.abs(dx) + np.abs(dy))
+    elif edge_weight_type == "MAX_2D":
+        return np.maximum(np.rint(np.abs(dx)), np.rint(np.abs(dy)))
+    raise ValueError(f"Unsupported edge weight type: {edge_weight_type}")
+
+def pairwise_distances(coords_a, coords_b, edge_weight_type) -> np.ndarray:
+    """
+    Calculates the distances between every point in coords_a and every point in coords_b.
+
+    Parameters:
+    - coords_a: An array of shape (m, 2) with the coordinates of the first set of points.
+    - coords_b: An array of shape (k, 2) with the coordinates of the second set of points.
+    - edge_weight_type: One of EUC_2D, CEIL_2D, MAN_2D, MAX_2D, GEO or ATT.
+
+    Returns:
+    - An (m, k) float array of integral distances.
+    """
+    coords_a = np.asarray(coords_a, dtype=np.float64)
+    coords_b = np.asarray(coords_b, dtype=np.float64)
+    return paired_distances(coords_a[:, None, :], coords_b[None, :, :], edge_weight_type)
+
+def calculate_distance_matrix(coords, edge_weight_type, dtype=np.int32) -> np.ndarray:
+    """
+    Calculates the full symmetric distance matrix for a set of node coordinates in batched NumPy passes.
+    Rows are processed in blocks, so the temporary float arrays stay small even for large instances.
+
+    Parameters:
+    - coords: An array of shape (n, 2) with the node coordinates, in node order.
+    - edge_weight_type: One of EUC_2D, CEIL_2D, MAN_2D, MAX_2D, GEO or ATT.
+    - dtype (optional): The dtype of the returned matrix.
+
+    Returns:
+    - An (n, n) distance matrix with a zero diagonal.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    dimension = len(coords)
+    matrix = np.empty((dimension, dimension), dtype=dtype)
+    block_rows = max(1, (1 << 21) // max(dimension, 1))
+    for start in range(0, dimension, block_rows):
+        stop = min(start + block_rows, dimension)
+        matrix[start:stop] = pairwise_distances(coords[start:stop], coords, edge_weight_type)
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
 def calculate_distances(node_coords, edge_weight_type) -> list:
     """
     Calculates the distances between nodes based on the specified edge weight type.
@@ -142,46 +365,278 @@ def calculate_distances(node_coords, edge_weight_type) -> list:
     Returns:
     - A list of tuples containing the distances between nodes.
     """
+    node_ids = sorted(node_coords)
+    coords = np.array([node_coords[node_id] for node_id in node_ids], dtype=np.float64)
+    matrix = calculate_distance_matrix(coords, edge_weight_type)
     distances = []
-    for i, (x1, y1) in node_coords.items():
-        for j, (x2, y2) in node_coords.items():
-            if i < j:
-                if edge_weight_type == "EUC_2D":
-                    dist = euclidean_distance(x1, y1, x2, y2)
-                elif edge_weight_type == "GEO":
-                    dist = geo_distance(x1, y1, x2, y2)
-                elif edge_weight_type == "ATT":
-                    dist = att_distance(x1, y1, x2, y2)
-                distances.append((i, j, dist))
+    for i, node_id in enumerate(node_ids):
+        distances.extend(zip([node_id] * (len(node_ids) - i - 1), node_ids[i + 1:], matrix[i, i + 1:].tolist()))
     return distances
 
+def _digit_columns(values) -> tuple:
+    """
+    Spells out non-negative integers as right-aligned, zero-padded ASCII digits, one row per value.
+    Loops over digit positions, never over values.
+
+    Returns:
+    - The (m, width) uint8 digit table and a mask of the same shape that drops the leading zeros.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    width = len(str(int(values.max()))) if len(values) else 1
+    digits = np.empty((len(values), width), dtype=np.uint8)
+    significant = np.empty((len(values), width), dtype=bool)
+    remaining = values.astype(np.uint32) if width < 10 else values
+    for column in range(width - 1, -1, -1):
+        significant[:, column] = remaining > 0
+        remaining, digits[:, column] = np.divmod(remaining, 10)
+    significant[:, -1] = True  # A zero still needs its one digit
+    digits += ord("0")
+    return digits, significant
+
+def format_edge_block(first, second, weights) -> bytes:
+    """
+    Formats a block of edges as "node1\tnode2\tweight\n" lines in a handful of vectorized passes.
+    Every line is laid out in a fixed-width byte table and the padding is dropped with one boolean mask.
+    Integral float weights keep their trailing ".0", so the output matches formatting every edge with f"{weight}".
+
+    Parameters:
+    - first, second: Integer arrays with the node labels of the edges.
+    - weights: An array with the edge weights.
+
+    Returns:
+    - The ASCII-encoded lines.
+    """
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    weights = np.asarray(weights)
+    is_float = np.issubdtype(weights.dtype, np.floating)
+    if len(weights) == 0:
+        return b""
+    if (first.min() < 0 or second.min() < 0 or weights.min() < 0 or
+            (is_float and not (np.all(weights == np.rint(weights)) and np.abs(weights).max() < 1e16))):
+        # Negative numbers and fractional weights are rare enough to go through str()
+        return "".join(map("{}\t{}\t{}\n".format, first.tolist(), second.tolist(), weights.tolist())).encode("ascii")
+
+    fields = [_digit_columns(first), b"\t", _digit_columns(second), b"\t", _digit_columns(weights.astype(np.int64)),
+              b".0\n" if is_float else b"\n"]
+    width = sum(len(field) if isinstance(field, bytes) else field[0].shape[1] for field in fields)
+    table = np.empty((len(weights), width), dtype=np.uint8)
+    keep = np.ones((len(weights), width), dtype=bool)
+    column = 0
+    for field in fields:
+        if isinstance(field, bytes):
+            table[:, column:column + len(field)] = np.frombuffer(field, dtype=np.uint8)
+            column += len(field)
+        else:
+            digits, significant = field
+            table[:, column:column + digits.shape[1]] = digits
+            keep[:, column:column + digits.shape[1]] = significant
+            column += digits.shape[1]
+    return table[keep].tobytes()
+
 def save_edge_file(distances, output_filename) -> None:
     """
-    Saves a list of distances to a file.
+    Saves a list of distances to a file. Lines are formatted in blocks; a .gz or .bz2 filename is compressed.
     
     Parameters:
     - distances: A list of tuples containing the distances between nodes.
     - output_filename: The name of the file to be saved.
     """
-    with open(output_filename, 'w') as f:
-        for i, j, dist in distances:
-            f.write(f"{i}\t{j}\t{dist}\n")
+    with open_tsplib_file(output_filename, 'wb') as f:
+        for start in range(0, len(distances), EDGE_BLOCK_SIZE):
+            block = distances[start:start + EDGE_BLOCK_SIZE]
+            first, second, weights = zip(*block)
+            f.write(format_edge_block(first, second, np.array(weights)))
+
+def save_distance_matrix(matrix, output_filename, node_ids=None, lower=False) -> None:
+    """
+    Saves the upper triangle of a distance matrix as an .edges file without building a list of edges.
+    Blocks of rows are formatted at once; a .gz or .bz2 filename is compressed.
+
+    Parameters:
+    - matrix: A symmetric (n, n) distance matrix.
+    - output_filename: The name of the file to be saved.
+    - node_ids (optional): Integer node labels in matrix order, defaults to 1..n.
+    - lower (optional): If True, list the edges by their larger node, in the order lower-triangular formats store them.
+    """
+    dimension = len(matrix)
+    node_ids = np.arange(1, dimension + 1) if node_ids is None else np.asarray(node_ids, dtype=np.int64)
+    block_rows = max(1, EDGE_BLOCK_SIZE // max(dimension, 1))
+    with open_tsplib_file(output_filename, 'wb') as f:
+        for start in range(0, dimension, block_rows):
+            stop = min(start + block_rows, dimension)
+            if lower:
+                rows, cols = np.nonzero(np.tri(stop - start, dimension, k=start - 1, dtype=bool))
+                first, second = node_ids[cols], node_ids[rows + start]
+            else:
+                rows, cols = np.nonzero(~np.tri(stop - start, dimension, k=start, dtype=bool))
+                first, second = node_ids[rows + start], node_ids[cols]
+            f.write(format_edge_block(first, second, matrix[rows + start, cols]))
+
+def build_distance_matrix(node_coords, edge_weight_type, edge_weight_format, explicit_distances, dimension) -> tuple:
+    """
+    Builds the distance matrix of a parsed .tsp file, whatever its edge weight type.
+
+    Parameters:
+    - The values returned by parse_tsp_file.
+
+    Returns:
+    - A tuple with the distance matrix and the node labels in matrix order.
+    """
+    if edge_weight_type == "EXPLICIT":
+        return explicit_distance_matrix(explicit_distances, edge_weight_format, dimension), list(range(1, dimension + 1))
+    node_ids = sorted(node_coords)
+    coords = np.array([node_coords[node_id] for node_id in node_ids], dtype=np.float64)
+    return calculate_distance_matrix(coords, edge_weight_type), node_ids
 
-def main():
-    input_folder = "../tsp_files/"
-    output_folder = "../networkx_tsp_files/"
+def convert_tsp_file(filepath, output_folder, write_cache=False, compress=False) -> dict:
+    """
+    Converts a single .tsp file into an .edges file, and optionally its binary matrix cache.
+    This is the unit of work the converter distributes across processes.
+
+    Parameters:
+    - filepath: The .tsp file to convert.
+    - output_folder: The folder the .edges file is written to.
+    - write_cache (optional): If True, also write the binary matrix cache next to the .edges file.
+    - compress (optional): If True, write a gzip-compressed .edges.gz file.
+
+    Returns:
+    - A dict with the source fingerprint, the output file, the dimension, the edge count and the time taken.
+    """
+    start_time = time.perf_counter()
+    source = file_fingerprint(filepath, with_hash=True)
+    node_coords, edge_weight_type, edge_weight_format, explicit_distances, dimension = parse_tsp_file(filepath)
+    matrix, node_ids = build_distance_matrix(node_coords, edge_weight_type, edge_weight_format, explicit_distances, dimension)
+    tsp_file = os.path.basename(filepath)
+    output_filename = os.path.join(output_folder, tsp_file[:tsp_file.rindex(".tsp")] + (".edges.gz" if compress else ".edges"))
+    lower = edge_weight_type == "EXPLICIT" and edge_weight_format in LOWER_TRIANGLE_FORMATS
+    save_distance_matrix(matrix, output_filename, node_ids, lower=lower)
+    if write_cache:
+        save_instance_cache(TspInstance.from_matrix(matrix, node_ids), output_filename, source_filename=filepath)
+    return {
+        "source": source,
+        "output": output_filename,
+        "cache": write_cache,
+        "dimension": len(node_ids),
+        "edges": len(node_ids) * (len(node_ids) - 1) // 2,
+        "seconds": time.perf_counter() - start_time,
+    }
+
+def load_manifest(output_folder) -> dict:
+    """
+    Loads the converter manifest of an output folder, which maps every converted .tsp file to the
+    fingerprint of the source it was built from and the name of its output file in the output folder.
+    """
+    manifest_filename = os.path.join(output_folder, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_filename):
+        return {}
+    with open(manifest_filename, 'r') as f:
+        return json.load(f)
+
+def save_manifest(manifest, output_folder) -> None:
+    """
+    Writes the converter manifest of an output folder.
+    """
+    manifest_filename = os.path.join(output_folder, MANIFEST_FILENAME)
+    with open(manifest_filename + ".tmp", 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_filename + ".tmp", manifest_filename)
+
+def is_up_to_date(entry, filepath, output_folder, write_cache=False, compress=False) -> bool:
+    """
+    Checks a manifest entry against the current source file and the outputs on disk.
+    Size and modification time are compared first; the source is only hashed if they changed.
+
+    Parameters:
+    - entry: The manifest entry of the file, or None.
+    - filepath: The .tsp file.
+    - output_folder: The folder of the manifest and the outputs; the manifest records output file names only.
+    - write_cache (optional): If True, the binary matrix cache has to exist and be fresh as well.
+    - compress (optional): If True, the output has to be a compressed .edges.gz file.
+
+    Returns:
+    - True if the file does not need to be converted again.
+    """
+    if not entry:
+        return False
+    # Older manifests recorded the path relative to the working directory; only its file name is used
+    output_filename = os.path.join(output_folder, os.path.basename(entry["output"]))
+    if not os.path.exists(output_filename) or (write_cache and not entry["cache"]):
+        return False
+    if output_filename.endswith(".gz") != compress:
+        return False
+    recorded = entry["source"]
+    current = file_fingerprint(filepath)
+    if current["size"] != recorded["size"] or current["mtime_ns"] != recorded["mtime_ns"]:
+        current = file_fingerprint(filepath, with_hash=True)
+        if current["sha256"] != recorded["sha256"]:
+            return False
+        # Same content: the manifest and the cache header (checked by mtime when loading) both get the new fingerprint
+        entry["source"].update(size=current["size"], mtime_ns=current["mtime_ns"])
+        if entry["cache"]:
+            update_cache_source(output_filename, current)
+    if write_cache:
+        header = load_cache_header(output_filename)
+        return header is not None and is_cache_fresh(header, output_filename, filepath)
+    return True
+
+def main(argv=None):
+    """
+    Converts every .tsp file of the input folder into an .edges file in the output folder.
+    Files are converted in parallel across a process pool, and files whose source did not change
+    since the last run (according to the manifest in the output folder) are skipped.
+
+    Parameters:
+    - argv (optional): The command line arguments, defaults to sys.argv[1:].
+    """
+    parser = argparse.ArgumentParser(description="Convert TSPLIB .tsp files into NetworkX-style .edges files.")
+    parser.add_argument("--input", default="../tsp_files/", help="Folder with the .tsp files")
+    parser.add_argument("--output", default="../networkx_tsp_files/", help="Folder for the .edges files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--cache", action="store_true", help="Also write the binary matrix cache for every file")
+    parser.add_argument("--compress", action="store_true", help="Write gzip-compressed .edges.gz files")
+    parser.add_argument("--force", action="store_true", help="Convert all files, even if they are up to date")
+    args = parser.parse_args(argv)
+
+    input_folder, output_folder = args.input, args.output
     os.makedirs(output_folder, exist_ok=True)
-    
-    for tsp_file in os.listdir(input_folder):
-        if tsp_file.endswith(".tsp"):
+    manifest = load_manifest(output_folder)
+
+    pending, skipped = [], 0
+    for tsp_file in sorted(os.listdir(input_folder)):
+        if tsp_file.endswith(TSP_SUFFIXES):
             filepath = os.path.join(input_folder, tsp_file)
-            node_coords, edge_weight_type, edge_weight_format, explicit_distances, dimension = parse_tsp_file(filepath)
-            if edge_weight_type == "EXPLICIT":
-                distances = parse_explicit_distances(explicit_distances, edge_weight_format, dimension)
+            if not args.force and is_up_to_date(manifest.get(tsp_file), filepath, output_folder, args.cache, args.compress):
+                skipped += 1
             else:
-                distances = calculate_distances(node_coords, edge_weight_type)
-            output_filename = os.path.join(output_folder, tsp_file.replace(".tsp", ".edges"))
-            save_edge_file(distances, output_filename)
+                pending.append((tsp_file, filepath))
+
+    start_time = time.perf_counter()
+    converted, failed, total_edges, total_bytes = 0, 0, 0, 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {executor.submit(convert_tsp_file, filepath, output_folder, args.cache, args.compress): tsp_file for tsp_file, filepath in pending}
+            for future in as_completed(futures):
+                tsp_file = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"{tsp_file}: failed ({e})")
+                    continue
+                # Outputs are recorded by file name (they are always in the output folder), so the converter can run from any directory
+                manifest[tsp_file] = dict(result, output=os.path.basename(result["output"]))
+                converted += 1
+                total_edges += result["edges"]
+                total_bytes += result["source"]["size"]
+                print(f"{tsp_file}: {result['dimension']} nodes, {result['edges']} edges in {result['seconds']:.3f}s "
+                      f"({result['edges'] / max(result['seconds'], 1e-9):,.0f} edges/s)")
+    save_manifest(manifest, output_folder)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Converted {converted}, skipped {skipped} up-to-date, {failed} failed in {elapsed:.2f}s "
+          f"({total_edges / max(elapsed, 1e-9):,.0f} edges/s, {total_bytes / 1e6 / max(elapsed, 1e-9):.2f} MB/s of source)")
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import numpy as np
+from TourEvaluation import tour_lengths
+
+class TspInstance:
+    """
+    A compact, array-backed TSP instance: a dense symmetric distance matrix with 0-based indices
+    and the mapping between those indices and the original node labels.
+
+    Solvers work on the indices and read weights with O(1) array lookups; labels only appear
+    at the boundaries (parsing, results, drawing).
+    """
+
+    def __init__(self, matrix, labels=None):
+        """
+        Parameters:
+        - matrix: A square (n, n) distance matrix.
+        - labels (optional): The node label for every matrix index. Defaults to 1..n like TSPLIB.
+        """
+        matrix = np.asarray(matrix)
+        if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+            raise ValueError(f"Distance matrix must be square, got shape {matrix.shape}")
+        self.matrix = matrix
+        self.labels = list(labels) if labels is not None else list(range(1, len(matrix) + 1))
+        if len(self.labels) != len(matrix):
+            raise ValueError(f"Got {len(self.labels)} labels for a matrix of dimension {len(matrix)}")
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self._candidates = {}
+
+    @property
+    def dimension(self) -> int:
+        return len(self.labels)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __repr__(self) -> str:
+        return f"TspInstance(dimension={self.dimension}, dtype={self.matrix.dtype})"
+
+    def weight(self, u, v):
+        """
+        Returns the weight of the edge between the nodes labelled u and v.
+        """
+        return self.matrix.item(self.index[u], self.index[v])
+
+    def path_weight(self, indices, closed=False):
+        """
+        Sums the weights along a path given as matrix indices in one array gather.
+
+        Parameters:
+        - indices: A sequence of matrix indices.
+        - closed (optional): If True, the edge from the last back to the first index is added.
+
+        Returns:
+        - The total weight as a Python int or float.
+        """
+        return tour_lengths(self.matrix, indices, closed)
+
+    def candidate_lists(self, k) -> np.ndarray:
+        """
+        Returns the k nearest neighbors of every node, computed once per k and cached on the instance.
+
+        Parameters:
+        - k: The number of neighbors per node (at most dimension - 1).
+
+        Returns:
+        - An (n, k) array of matrix indices; row i is sorted by distance from i, ties by index.
+        """
+        k = max(0, min(k, self.dimension - 1))
+        if k not in self._candidates:
+            n = self.dimension
+            candidates = np.empty((n, k), dtype=np.intp)
+            block_size = max(1, (1 << 22) // max(n, 1))  # Rows per block, bounds the temporary arrays
+            for start in range(0, n if k else 0, block_size):
+                rows = np.arange(start, min(start + block_size, n))
+                block = self.matrix[rows].astype(np.float64)
+                block[np.arange(len(rows)), rows] = np.inf  # A node is not its own neighbor
+                nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+                distances = np.take_along_axis(block, nearest, axis=1)
+                order = np.lexsort((nearest, distances), axis=1)
+                candidates[rows] = np.take_along_axis(nearest, order, axis=1)
+            self._candidates[k] = candidates
+        return self._candidates[k]
+
+    def clear_cache(self) -> None:
+        """
+        Drops the cached candidate lists, so the next solver computes them again (used by the benchmarks).
+        """
+        self._candidates.clear()
+
+    def memory_bytes(self) -> int:
+        """
+        Returns the bytes held by the distance matrix and the cached candidate lists (used by the solve server's cache).
+        """
+        return self.matrix.nbytes + sum(candidates.nbytes for candidates in self._candidates.values())
+
+    def nearest_unvisited(self, rows, visited) -> np.ndarray:
+        """
+        Returns the closest unvisited node of every given node, ties broken towards the lower index.
+
+        Parameters:
+        - rows: The matrix indices of the nodes.
+        - visited: A (len(rows), n) boolean array with the visited nodes of every row.
+        """
+        return np.argmin(np.where(visited, np.inf, self.matrix[rows]), axis=1)
+
+    def to_indices(self, path) -> list:
+        """
+        Translates a sequence of node labels into matrix indices.
+        """
+        return [self.index[label] for label in path]
+
+    def to_labels(self, indices) -> list:
+        """
+        Translates a sequence of matrix indices into node labels.
+        """
+        return [self.labels[i] for i in indices]
+
+    @classmethod
+    def from_matrix(cls, matrix, labels=None, dtype=None):
+        """
+        Builds an instance from a dense distance matrix, narrowing it to the smallest suitable dtype.
+
+        Parameters:
+        - matrix: A square (n, n) distance matrix.
+        - labels (optional): The node labels in index order. Defaults to 1..n.
+        - dtype (optional): The matrix dtype. Defaults to int32 for integral weights and float32 otherwise.
+
+        Returns:
+        - A TspInstance.
+        """
+        matrix = np.asarray(matrix)
+        if dtype is None:
+            dtype = _smallest_dtype(matrix.ravel())
+        return cls(matrix.astype(dtype, copy=False), labels)
+
+    @classmethod
+    def from_edges(cls, edges, labels=None, dtype=None):
+        """
+        Builds an instance from a list of weighted edges (node1, node2, weight), e.g. from parse_edges_file.
+
+        Parameters:
+        - edges: An iterable of (node1, node2, weight) tuples, or an (m, 3) array as returned by load_edges_array.
+        - labels (optional): The node labels in index order. Defaults to the sorted labels found in the edges.
+        - dtype (optional): The matrix dtype. Defaults to int32 for integral weights and float32 otherwise.
+
+        Returns:
+        - A TspInstance.
+        """
+        if isinstance(edges, np.ndarray) and labels is None:
+            # Integer labels straight from a file: map them to indices with a sorted lookup instead of a dict
+            endpoints = edges[:, :2].astype(np.int64)
+            low = endpoints.min(initial=0)
+            present = np.zeros(endpoints.max(initial=0) - low + 1, dtype=bool)
+            present[endpoints - low] = True
+            if present.all():
+                # Contiguous labels like TSPLIB's 1..n are just shifted indices
+                sorted_labels = np.arange(low, low + len(present))
+                rows, cols = (endpoints - low).T
+            else:
+                sorted_labels = np.flatnonzero(present) + low
+                rows, cols = np.searchsorted(sorted_labels, endpoints).T
+            weights = edges[:, 2].astype(np.float64)
+            labels = sorted_labels.tolist()
+        else:
+            edges = edges.tolist() if isinstance(edges, np.ndarray) else list(edges)
+            if labels is None:
+                labels = sorted({u for u, _, _ in edges} | {v for _, v, _ in edges})
+            index = {label: i for i, label in enumerate(labels)}
+            rows = np.fromiter((index[u] for u, _, _ in edges), dtype=np.intp, count=len(edges))
+            cols = np.fromiter((index[v] for _, v, _ in edges), dtype=np.intp, count=len(edges))
+            weights = np.fromiter((w for _, _, w in edges), dtype=np.float64, count=len(edges))
+        if dtype is None:
+            dtype = _smallest_dtype(weights)
+        matrix = np.zeros((len(labels), len(labels)), dtype=dtype)
+        matrix[rows, cols] = weights
+        matrix[cols, rows] = weights
+        return cls(matrix, labels)
+
+    @classmethod
+    def from_graph(cls, G, dtype=None):
+        """
+        Builds an instance from a complete weighted NetworkX graph.
+
+        Parameters:
+        - G: A NetworkX graph with a 'weight' attribute on every edge.
+        - dtype (optional): The matrix dtype. Defaults to int32 for integral weights and float32 otherwise.
+
+        Returns:
+        - A TspInstance whose indices follow the node order of G.
+        """
+        dimension = G.number_of_nodes()
+        if G.number_of_edges() != dimension * (dimension - 1) // 2:
+            raise ValueError("TspInstance needs a complete graph")
+        return cls.from_edges(G.edges(data='weight'), labels=list(G.nodes), dtype=dtype)
+
+    def to_graph(self) -> "nx.Graph":
+        """
+        Converts the instance back into a complete weighted NetworkX graph.
+        """
+        import networkx as nx  # Only the graph conversions need NetworkX
+        G = nx.Graph()
+        G.add_nodes_from(self.labels)
+        for i, u in enumerate(self.labels):
+            G.add_weighted_edges_from(zip([u] * (self.dimension - i - 1), self.labels[i + 1:], self.matrix[i, i + 1:].tolist()))
+        return G
+
+def _smallest_dtype(weights) -> np.dtype:
+    """
+    Picks int32 when all weights are integral and fit, float32 otherwise.
+    """
+    if len(weights) == 0 or (np.all(weights == np.rint(weights)) and np.abs(weights).max() <= np.iinfo(np.int32).max):
+        return np.int32
+    return np.float32
+
+def as_instance(G) -> TspInstance:
+    """
+    Returns G unchanged if it already is a TspInstance, otherwise converts the NetworkX graph.
+    Lets every solver accept both input types.
+    """
+    if isinstance(G, TspInstance):
+        return G
+    return TspInstance.from_graph(G)
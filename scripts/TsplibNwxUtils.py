@@ -1,5 +1,8 @@
-import networkx as nx
-import matplotlib.pyplot as plt
+import numpy as np
+from TspFileParser import open_tsplib_file
+from TspInstance import TspInstance
+from InstanceCache import load_instance_cache
+from TourEvaluation import path_length
 
 def parse_edges_file(filename) -> list:
     """Parse an .edges file and return a list of edges with weights.
@@ -9,13 +12,36 @@ def parse_edges_file(filename) -> list:
     Returns:
     - A list of edges, where each edge is a tuple (node1, node2, weight).
     """
-    edges = []
-    with open(filename, 'r') as file:
-        for line in file:
-            node1, node2, weight = line.strip().split()
-            edges.append((int(node1), int(node2), float(weight)))
-    return edges
+    edges = load_edges_array(filename)
+    return list(zip(edges[:, 0].astype(np.int64).tolist(), edges[:, 1].astype(np.int64).tolist(), edges[:, 2].tolist()))
+
+def load_edges_array(filename) -> np.ndarray:
+    """Load an .edges file (optionally .gz or .bz2 compressed) into an array with NumPy's C text parser.
+    Parameters:
+    - filename: The name of the .edges file to load.
+
+    Returns:
+    - A float array of shape (m, 3) with one (node1, node2, weight) row per edge.
+    """
+    with open_tsplib_file(filename) as file:
+        return np.loadtxt(file, dtype=np.float64, ndmin=2).reshape(-1, 3)
   
+def load_instance(filename, source_filename=None) -> TspInstance:
+    """
+    Load an .edges file as a TspInstance, memory-mapping its binary cache when there is a fresh one.
+
+    Parameters:
+    - filename: The name of the .edges file.
+    - source_filename (optional): The .tsp file the cache is checked against.
+
+    Returns:
+    - A TspInstance.
+    """
+    instance = load_instance_cache(filename, source_filename)
+    if instance is None:
+        instance = TspInstance.from_edges(load_edges_array(filename))
+    return instance
+
 def parse_opt_tour_file(filename) -> list:
     """
     Parse an optimal tour file (.opt.tour) and return the sequence of nodes in the tour.
@@ -53,6 +79,8 @@ def draw_graph(G, pos, title='Graph Visualization', path=None, edge_labels=False
     - edge_labels (optional): If True, display edge weights.
     - onlyShowPath (optional): If True, only the path is rendered.
     """
+    import matplotlib.pyplot as plt  # Plotting libraries are only loaded when something is drawn
+    import networkx as nx
     plt.figure(figsize=(10, 8))
     plt.tight_layout()
     plt.title(title)
@@ -84,21 +112,13 @@ def calculate_path_length(G, path):
     Calculate the total length of a path in a weighted graph.
 
     Parameters:
-    - G: A NetworkX graph with weighted edges.
+    - G: A NetworkX graph with weighted edges, or a TspInstance.
     - path: A list of node IDs representing the path.
 
     Returns:
-    - The total length of the path.
+    - The total length of the path (see TourEvaluation.path_length).
     """
-    path_length = 0
-    # Iterate through pairs of consecutive nodes in the path
-    for i in range(len(path) - 1):
-        node1, node2 = path[i], path[i + 1]
-        # Sum up the edge weights between consecutive nodes
-        edge_weight = G[node1][node2]['weight']
-        path_length += edge_weight
-    
-    return path_length
+    return path_length(G, path)
 
 def close_path(G, path):
     """
@@ -106,25 +126,23 @@ def close_path(G, path):
     to form a closed loop representing a round trip.
 
     Parameters:
-    - G: The NetworkX graph.
+    - G: The NetworkX graph or TspInstance.
     - path: A list of nodes representing the path.
     
     Returns:
     - A list of nodes representing the closed path.
     """
     if path[0] != path[-1]:  # Check if path is not already closed
-        # Calculate the weight of the edge from the last node back to the first
-        weight = G[path[-1]][path[0]]['weight'] if G.has_edge(path[-1], path[0]) else 0
         # Add the first node at the end of the path to close the loop
         closed_path = path + [path[0]]
     else:
         closed_path = path  # Path is already closed
-        weight = 0  # No additional weight required to close the path
 
     return closed_path
 
 
 if __name__ == "__main__":
+    import networkx as nx
     opt_tour_filename = "../tour_files/ulysses16.opt.tour"
     optimal_path = parse_opt_tour_file(opt_tour_filename)
     filename = "../networkx_tsp_files/ulysses16.edges"